@@ -18,15 +18,39 @@
 
 from futurist._futures import Future  # noqa
 from futurist._futures import GreenFuture  # noqa
+from futurist._futures import ResultStream  # noqa
 
 from futurist._futures import CancelledError  # noqa
 from futurist._futures import TimeoutError  # noqa
+from futurist._futures import BrokenProcessPool  # noqa
 
+from futurist._futures import Executor  # noqa
+
+from futurist._futures import AffinityProcessPoolExecutor  # noqa
+from futurist._futures import AsyncioExecutor  # noqa
+from futurist._futures import BatchingExecutor  # noqa
+from futurist._futures import BulkheadExecutor  # noqa
+from futurist._futures import BulkheadLane  # noqa
+from futurist._futures import CachingExecutor  # noqa
+from futurist._futures import FairThreadPoolExecutor  # noqa
 from futurist._futures import GreenThreadPoolExecutor  # noqa
 from futurist._futures import ProcessPoolExecutor  # noqa
+from futurist._futures import ScheduledExecutor  # noqa
+from futurist._futures import SingleFlightExecutor  # noqa
 from futurist._futures import SynchronousExecutor  # noqa
 from futurist._futures import ThreadPoolExecutor  # noqa
 
 from futurist._futures import RejectedSubmission  # noqa
+from futurist._futures import RunInCaller  # noqa
 
+from futurist._futures import BatchStatistics  # noqa
+from futurist._futures import CacheStatistics  # noqa
 from futurist._futures import ExecutorStatistics  # noqa
+from futurist._futures import SharedStatistics  # noqa
+from futurist._futures import SingleFlightStatistics  # noqa
+from futurist._futures import TenantStatistics  # noqa
+
+from futurist._watchdog import StuckWork  # noqa
+from futurist._watchdog import Watchdog  # noqa
+
+from futurist._profiler import SamplingProfiler  # noqa
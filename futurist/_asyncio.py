@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import inspect
+import threading
+import weakref
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+ASYNCIO_AVAILABLE = asyncio is not None
+
+_bridges = weakref.WeakKeyDictionary()
+_bridges_lock = threading.Lock()
+
+
+class LoopBridge(object):
+    """Runs callbacks (posted from any thread) in an event loop.
+
+    Callbacks that get posted before the loop gets around to running the
+    previously posted ones are run together, so the loop is only woken up
+    (via ``call_soon_threadsafe``) once per batch instead of once per
+    callback.
+    """
+
+    def __init__(self, loop):
+        # Bridges are kept (weakly) keyed by their loop, so they must not
+        # keep their loop alive themselves.
+        self._loop = weakref.ref(loop)
+        self._lock = threading.Lock()
+        self._callbacks = collections.deque()
+        self._scheduled = False
+
+    def post(self, callback, *args):
+        with self._lock:
+            self._callbacks.append((callback, args))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        loop = self._loop()
+        try:
+            if loop is None:
+                raise RuntimeError("Event loop is gone")
+            loop.call_soon_threadsafe(self._run_callbacks)
+        except RuntimeError:
+            # The loop got closed, nothing is going to run these...
+            with self._lock:
+                self._callbacks.clear()
+                self._scheduled = False
+
+    def _run_callbacks(self):
+        with self._lock:
+            callbacks = self._callbacks
+            self._callbacks = collections.deque()
+            self._scheduled = False
+        while callbacks:
+            callback, args = callbacks.popleft()
+            callback(*args)
+
+
+def get_loop(loop=None):
+    if not ASYNCIO_AVAILABLE:
+        raise RuntimeError('Asyncio is needed to wait on futures in an'
+                           ' event loop')
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    return loop
+
+
+def get_bridge(loop):
+    with _bridges_lock:
+        try:
+            return _bridges[loop]
+        except KeyError:
+            bridge = _bridges[loop] = LoopBridge(loop)
+            return bridge
+
+
+def _copy_state(fut, loop_fut):
+    if loop_fut.done():
+        return
+    if fut.cancelled():
+        loop_fut.cancel()
+        return
+    exc = fut.exception()
+    if exc is not None:
+        loop_fut.set_exception(exc)
+    else:
+        loop_fut.set_result(fut.result())
+
+
+def wrap_future(fut, loop=None):
+    loop = get_loop(loop)
+    bridge = get_bridge(loop)
+    loop_fut = loop.create_future()
+
+    def on_loop_done(loop_fut):
+        if loop_fut.cancelled():
+            fut.cancel()
+
+    loop_fut.add_done_callback(on_loop_done)
+    fut.add_done_callback(lambda fut: bridge.post(_copy_state,
+                                                  fut, loop_fut))
+    return loop_fut
+
+
+class LoopThread(threading.Thread):
+    """Thread that runs an event loop (until told to stop)."""
+
+    def __init__(self, name=None):
+        super(LoopThread, self).__init__(name=name)
+        self.daemon = True
+        self.loop = asyncio.new_event_loop()
+        self.bridge = get_bridge(self.loop)
+        self.running = 0
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            try:
+                self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            finally:
+                self.loop.close()
+                with _bridges_lock:
+                    _bridges.pop(self.loop, None)
+
+    def stop(self):
+        self.bridge.post(self.loop.stop)
+
+
+def start_work(work, loop, on_finished):
+    """Starts running a work item (whose function is a coroutine function).
+
+    Must be called in the thread running the loop; ``on_finished`` is called
+    (in that thread) once the work item is done (or was never started, if
+    its future was cancelled). Functions that return something that is not
+    awaitable are treated as plain functions (what they return is the
+    result).
+    """
+    if not work.future.set_running_or_notify_cancel():
+        on_finished(work)
+        return
+    try:
+        result = work.fn(*work.args, **work.kwargs)
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result, loop=loop)
+        else:
+            task = None
+    except BaseException:
+        try:
+            work.fail()
+        finally:
+            on_finished(work)
+        return
+    if task is None:
+        try:
+            work.future.set_result(result)
+        finally:
+            on_finished(work)
+        return
+
+    def on_task_done(task):
+        try:
+            if task.cancelled():
+                # The task itself got cancelled (the future was already
+                # running, so it can not be).
+                work.future.set_exception(asyncio.CancelledError())
+            elif task.exception() is not None:
+                work.future.set_exception(task.exception())
+            else:
+                work.future.set_result(task.result())
+        finally:
+            on_finished(work)
+
+    task.add_done_callback(on_task_done)
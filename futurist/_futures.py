@@ -14,35 +14,51 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import functools
 import threading
+import time
 
 from concurrent import futures as _futures
-from concurrent.futures import process as _process
 import six
 
-from six.moves import queue as compat_queue
 
+from futurist import _asyncio
 from futurist import _green
+from futurist import _process
+from futurist import _shared
 from futurist import _thread
+from futurist import _timer
 from futurist import _utils
 
 
 TimeoutError = _futures.TimeoutError
 CancelledError = _futures.CancelledError
+BrokenProcessPool = _process.BrokenProcessPool
 
 
 class RejectedSubmission(Exception):
     """Exception raised when a submitted call is rejected (for some reason)."""
 
 
+class RunInCaller(RejectedSubmission):
+    """Raised (by a rejection callback) to run a submission in the caller.
+
+    Executors that support it run the submitted call synchronously in the
+    thread that submitted it (instead of queuing it), others treat it like
+    any other rejection.
+    """
+
+
 # NOTE(harlowja): Allows for simpler access to this type...
 Future = _futures.Future
 
 
 class _Gatherer(object):
-    def __init__(self, submit_func, lock_factory, start_before_submit=False):
+    def __init__(self, submit_func, lock_factory, start_before_submit=False,
+                 caller_future_cls=None):
         self._submit_func = submit_func
+        self._caller_future_cls = caller_future_cls or Future
         self._stats_lock = lock_factory()
         self._stats = ExecutorStatistics()
         self._start_before_submit = start_before_submit
@@ -55,12 +71,13 @@ class _Gatherer(object):
         with self._stats_lock:
             self._stats = ExecutorStatistics()
 
-    def _capture_stats(self, started_at, fut):
+    def _capture_stats(self, started_at, fut, caller_run=False):
         """Capture statistics
 
         :param started_at: when the activity the future has performed
                            was started at
         :param fut: future object
+        :param caller_run: whether the activity was run by the caller
         """
         # If time somehow goes backwards, make sure we cap it at 0.0 instead
         # of having negative elapsed time...
@@ -76,6 +93,7 @@ class _Gatherer(object):
                                                         self._stats.executed,
                                                         self._stats.runtime,
                                                         self._stats.cancelled)
+            caller_runs = self._stats.caller_runs
             if fut.cancelled():
                 cancelled += 1
             else:
@@ -83,24 +101,243 @@ class _Gatherer(object):
                 if fut.exception() is not None:
                     failures += 1
                 runtime += elapsed
+                if caller_run:
+                    caller_runs += 1
             self._stats = ExecutorStatistics(failures=failures,
                                              executed=executed,
                                              runtime=runtime,
-                                             cancelled=cancelled)
+                                             cancelled=cancelled,
+                                             caller_runs=caller_runs)
 
     def submit(self, fn, *args, **kwargs):
         """Submit work to be executed and capture statistics."""
+        return self.submit_using(self._submit_func, fn, *args, **kwargs)
+
+    def submit_using(self, submit_func, fn, *args, **kwargs):
+        """Submit work (using a given submit function) and capture stats."""
         if self._start_before_submit:
             started_at = _utils.now()
-        fut = self._submit_func(fn, *args, **kwargs)
+        fut = submit_func(fn, *args, **kwargs)
         if not self._start_before_submit:
             started_at = _utils.now()
         fut.add_done_callback(functools.partial(self._capture_stats,
                                                 started_at))
         return fut
 
+    def submit_in_caller(self, fn, *args, **kwargs):
+        """Run work in the caller (like a submission) and capture stats."""
+        started_at = _utils.now()
+        fut = self._caller_future_cls()
+        _utils.WorkItem(fut, fn, args, kwargs).run()
+        self._capture_stats(started_at, fut, caller_run=True)
+        return fut
+
+
+class ResultStream(object):
+    """Iterator over the items a submitted generator produces.
+
+    Items become available (in chunks) as the generator produces them,
+    at most ``max_chunks`` chunks are buffered (not yet consumed) at any
+    point in time; when that many are buffered the generator is paused
+    until the consumer catches up. Iterating re-raises any exception the
+    generator raised.
+
+    It should be iterated over by a single consumer.
+    """
+
+    def __init__(self, threading, max_chunks,
+                 on_consumed=None, on_cancel=None):
+        """Initializes a result stream.
+
+        :param threading: threading (locks, conditions...) implementation
+                          the producer and the consumer use
+        :param max_chunks: how many chunks can be buffered
+        :type max_chunks: int
+        :param on_consumed: callback (given this stream) that is called
+                            each time a chunk has been consumed
+        :type on_consumed: callback
+        :param on_cancel: callback (given this stream) that is called when
+                          it gets cancelled while being produced
+        :type on_cancel: callback
+        """
+        if max_chunks <= 0:
+            raise ValueError("Max chunks must be greater than zero")
+        self._cond = threading.condition_object()
+        self._chunks = collections.deque()
+        self._max_chunks = max_chunks
+        self._items = iter(())
+        self._future = None
+        self._finished = False
+        self._cancelled = False
+        self._on_consumed = on_consumed
+        self._on_cancel = on_cancel
+
+    @property
+    def future(self):
+        """Future that completes once the generator has finished.
+
+        Its result is how many items the generator produced.
+        """
+        return self._future
+
+    def attach(self, future):
+        """Attaches the future of whatever is producing the items."""
+        self._future = future
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def put_chunk(self, chunk):
+        """Adds a chunk, blocking while full.
+
+        :returns: whether the chunk was added (it will not be if this
+                  stream was cancelled, in which case the producer should
+                  stop producing)
+        :rtype: boolean
+        """
+        with self._cond:
+            while (len(self._chunks) >= self._max_chunks and
+                    not self._cancelled):
+                self._cond.wait()
+            if self._cancelled:
+                return False
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+            return True
+
+    def cancel(self):
+        """Stops the generator (and drops anything buffered)."""
+        with self._cond:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            self._chunks.clear()
+            self._cond.notify_all()
+        future = self._future
+        if (future is not None and not future.cancel() and
+                self._on_cancel is not None):
+            self._on_cancel(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            for item in self._items:
+                return item
+            with self._cond:
+                while not (self._chunks or self._finished or
+                           self._cancelled):
+                    self._cond.wait()
+                if self._cancelled:
+                    raise CancelledError()
+                if self._chunks:
+                    chunk = self._chunks.popleft()
+                    self._cond.notify_all()
+                else:
+                    chunk = None
+            if chunk is None:
+                exc = self._future.exception()
+                if exc is not None:
+                    raise exc
+                raise StopIteration()
+            if self._on_consumed is not None:
+                self._on_consumed(self)
+            self._items = iter(chunk)
+
+    next = __next__
+
+
+def _produce_chunks(stream, chunk_size, fn, *args, **kwargs):
+    """Puts the items an iterable produces into a stream (in chunks)."""
+    produced = 0
+    chunk = []
+    iterator = iter(fn(*args, **kwargs))
+    try:
+        for item in iterator:
+            chunk.append(item)
+            produced += 1
+            if len(chunk) >= chunk_size:
+                if not stream.put_chunk(chunk):
+                    return produced
+                chunk = []
+        return produced
+    finally:
+        try:
+            # Hand over what was produced (even when it then failed).
+            if chunk:
+                stream.put_chunk(chunk)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+
+def _submit_stream(executor, fn, args, kwargs):
+    chunk_size = kwargs.pop('stream_chunk_size', 1)
+    max_chunks = kwargs.pop('stream_max_chunks', 64)
+    stream = ResultStream(executor.threading, max_chunks)
+    stream.attach(executor.submit(_produce_chunks, stream,
+                                  chunk_size, fn, *args, **kwargs))
+    return stream
+
+
+class Executor(_futures.Executor):
+    """Base of the futurist executors.
+
+    Adds to what the standard executors provide (see
+    https://docs.python.org/dev/library/concurrent.futures.html) what all
+    futurist executors have in common.
+    """
+
+    #: Locks, conditions (and so on) that work with the executors workers.
+    threading = _thread.Threading()
+
+    def submit_after(self, deps, fn, *args, **kwargs):
+        """Submit some work once the futures it depends on have completed.
 
-class ThreadPoolExecutor(_futures.Executor):
+        The results of the dependencies are passed (in the same order) as
+        the first positional arguments; if any of them fails (or is
+        cancelled) the work is never submitted and the returned future
+        fails (or is cancelled) the same way. No worker is used while
+        waiting on the dependencies.
+
+        :param deps: futures that must complete before submitting
+        :type deps: list
+        :returns: future of the result of the work
+        """
+        return _submit_after(
+            self, deps,
+            lambda results: self.submit(fn, *(results + list(args)),
+                                        **kwargs))
+
+
+class _HelpingFuture(Future):
+    """Future that (when waited on by a pool worker) runs its own work.
+
+    It is only helped along when waited on without a timeout (running the
+    work inline could otherwise take longer than the waiter asked for).
+    """
+
+    def __init__(self):
+        super(_HelpingFuture, self).__init__()
+        self._work = None
+
+    def result(self, timeout=None):
+        if timeout is None and self._work is not None and not self.done():
+            self._work.help()
+        return super(_HelpingFuture, self).result(timeout=timeout)
+
+    def exception(self, timeout=None):
+        if timeout is None and self._work is not None and not self.done():
+            self._work.help()
+        return super(_HelpingFuture, self).exception(timeout=timeout)
+
+
+class ThreadPoolExecutor(Executor):
     """Executor that uses a thread pool to execute calls asynchronously.
 
     It gathers statistics about the submissions executed for post-analysis...
@@ -110,7 +347,8 @@ class ThreadPoolExecutor(_futures.Executor):
 
     threading = _thread.Threading()
 
-    def __init__(self, max_workers=None, check_and_reject=None):
+    def __init__(self, max_workers=None, check_and_reject=None,
+                 help_while_waiting=False, watchdog=None):
         """Initializes a thread pool executor.
 
         :param max_workers: maximum number of workers that can be
@@ -127,13 +365,28 @@ class ThreadPoolExecutor(_futures.Executor):
                                  exception if it wants to have this submission
                                  rejected.
         :type check_and_reject: callback
+        :param help_while_waiting: when a worker of this executor waits
+                                   (without a timeout) on the result (or
+                                   exception) of a future this executor
+                                   returned (whose work no worker has
+                                   started yet) it runs that work itself
+                                   instead of blocking, so that submitting
+                                   (and waiting on) work from inside of
+                                   submitted work can not deadlock the
+                                   executor.
+        :type help_while_waiting: bool
+        :param watchdog: watchdog that watches (and reports) submitted work
+                         that gets stuck running
+        :type watchdog: :py:class:`.Watchdog`
         """
         if max_workers is None:
             max_workers = _utils.get_optimal_thread_count()
         if max_workers <= 0:
             raise ValueError("Max workers must be greater than zero")
         self._max_workers = max_workers
-        self._work_queue = compat_queue.Queue()
+        self._work_queue = _thread.WorkQueue()
+        self._help_while_waiting = help_while_waiting
+        self._watchdog = watchdog
         self._shutdown_lock = threading.RLock()
         self._shutdown = False
         self._workers = []
@@ -174,9 +427,17 @@ class ThreadPoolExecutor(_futures.Executor):
                 _thread.join_thread(w)
 
     def _submit(self, fn, *args, **kwargs):
-        f = Future()
+        if self._watchdog is not None:
+            fn = self._watchdog.wrap(fn)
+        if self._help_while_waiting:
+            f = _HelpingFuture()
+            f._work = work = _thread.HelpingWorkItem(f, fn, args, kwargs,
+                                                     self._work_queue)
+        else:
+            f = Future()
+            work = _utils.WorkItem(f, fn, args, kwargs)
         self._maybe_spin_up()
-        self._work_queue.put(_utils.WorkItem(f, fn, args, kwargs))
+        self._work_queue.put(work)
         return f
 
     def submit(self, fn, *args, **kwargs):
@@ -185,11 +446,340 @@ class ThreadPoolExecutor(_futures.Executor):
             if self._shutdown:
                 raise RuntimeError('Can not schedule new futures'
                                    ' after being shutdown')
-            self._check_and_reject(self, self._work_queue.qsize())
-            return self._gatherer.submit(fn, *args, **kwargs)
+            try:
+                self._check_and_reject(self, self._work_queue.qsize())
+            except RunInCaller:
+                pass
+            else:
+                return self._gatherer.submit(fn, *args, **kwargs)
+        # Outside of the lock, so that other submissions are not blocked
+        # while this one runs.
+        if self._watchdog is not None:
+            fn = self._watchdog.wrap(fn)
+        return self._gatherer.submit_in_caller(fn, *args, **kwargs)
+
+    def submit_stream(self, fn, *args, **kwargs):
+        """Submit a generator function whose items get streamed back.
+
+        :param stream_chunk_size: how many items are handed over at a time
+                                  (passed as a keyword argument, it is
+                                  **not** passed to ``fn``); defaults to 1
+        :param stream_max_chunks: how many chunks can be buffered before the
+                                  generator gets paused (passed as a keyword
+                                  argument, it is **not** passed to
+                                  ``fn``); defaults to 64
+        :returns: stream of the items the generator produces
+        :rtype: :py:class:`.ResultStream`
+        """
+        return _submit_stream(self, fn, args, kwargs)
+
+
+#: Named tuple of the statistics about a tenant of a
+#: :py:class:`.FairThreadPoolExecutor` (the wait times are how long its work
+#: waited in its backlog before a worker took it).
+TenantStatistics = collections.namedtuple(
+    'TenantStatistics', 'dispatched backlog wait_time max_wait_time')
 
 
-class ProcessPoolExecutor(_process.ProcessPoolExecutor):
+class FairThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool executor that is fair across tenants.
+
+    Each tenant gets its own backlog, and workers take work from those
+    using (weighted) deficit round robin; so a tenant that submits lots of
+    work does not delay (the work of) the other tenants. Work submitted
+    without a tenant belongs to the ``None`` tenant.
+    """
+
+    def __init__(self, max_workers=None, check_and_reject=None,
+                 help_while_waiting=False, watchdog=None):
+        super(FairThreadPoolExecutor, self).__init__(
+            max_workers=max_workers, check_and_reject=check_and_reject,
+            help_while_waiting=help_while_waiting, watchdog=watchdog)
+        self._work_queue = _thread.FairWorkQueue()
+        self._tenant_checks = {}
+
+    def add_tenant(self, name, weight=1, check_and_reject=None):
+        """Adds (or changes) a tenant.
+
+        Tenants that were not added get a weight of one (and are checked by
+        the ``check_and_reject`` callback of the executor) when submitted
+        for, and are only kept track of while they have work queued (after
+        that only the statistics of the most recent of them are kept).
+
+        :param name: name of the tenant
+        :param weight: how many work items the tenant gets to hand out per
+                       turn (compared to the other tenants)
+        :type weight: number
+        :param check_and_reject: a callback function that will be provided
+                                 two position arguments, the first argument
+                                 will be this executor instance, and the second
+                                 will be the number of currently queued work
+                                 items in the backlog of the tenant; the
+                                 callback should raise a
+                                 :py:class:`.RejectedSubmission` exception if
+                                 it wants to have this submission rejected
+                                 (see :py:mod:`futurist.rejection`).
+        :type check_and_reject: callback
+        """
+        if weight <= 0:
+            raise ValueError("Weight must be greater than zero")
+        with self._shutdown_lock:
+            if check_and_reject is None:
+                self._tenant_checks.pop(name, None)
+            else:
+                self._tenant_checks[name] = check_and_reject
+            self._work_queue.add_tenant(name, weight=weight)
+
+    @property
+    def tenant_statistics(self):
+        """:class:`.TenantStatistics` (keyed by name) of the tenants."""
+        return dict((name, TenantStatistics(dispatched, backlog,
+                                            wait_time, max_wait_time))
+                    for (name, dispatched, backlog,
+                         wait_time, max_wait_time)
+                    in self._work_queue.statistics())
+
+    def _submit_for(self, tenant, fn, *args, **kwargs):
+        if self._watchdog is not None:
+            fn = self._watchdog.wrap(fn)
+        if self._help_while_waiting:
+            f = _HelpingFuture()
+            f._work = work = _thread.HelpingWorkItem(f, fn, args, kwargs,
+                                                     self._work_queue)
+        else:
+            f = Future()
+            work = _utils.WorkItem(f, fn, args, kwargs)
+        self._maybe_spin_up()
+        self._work_queue.put_for(tenant, work)
+        return f
+
+    def submit_for(self, tenant, fn, *args, **kwargs):
+        """Submit some work (of a tenant) to be executed."""
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            check_and_reject = self._tenant_checks.get(
+                tenant, self._check_and_reject)
+            try:
+                check_and_reject(self, self._work_queue.qsize(tenant))
+            except RunInCaller:
+                pass
+            else:
+                return self._gatherer.submit_using(
+                    functools.partial(self._submit_for, tenant),
+                    fn, *args, **kwargs)
+        # Outside of the lock, so that other submissions are not blocked
+        # while this one runs.
+        if self._watchdog is not None:
+            fn = self._watchdog.wrap(fn)
+        return self._gatherer.submit_in_caller(fn, *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work (of the ``None`` tenant) to be executed."""
+        return self.submit_for(None, fn, *args, **kwargs)
+
+
+class BulkheadLane(Executor):
+    """Executor (view) that submits to a lane of a bulkhead executor.
+
+    Shutting it down does nothing (shut down the bulkhead executor that it
+    is a lane of instead).
+    """
+
+    threading = _thread.Threading()
+
+    def __init__(self, bulkhead, name):
+        self._bulkhead = bulkhead
+        self._name = name
+
+    @property
+    def name(self):
+        """The name of the lane."""
+        return self._name
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the lanes executions."""
+        return self._bulkhead.lane_statistics[self._name]
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return self._bulkhead.alive
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work to be executed (in this lane)."""
+        return self._bulkhead.submit_to(self._name, fn, *args, **kwargs)
+
+
+class BulkheadExecutor(Executor):
+    """Executor that isolates workloads (in named lanes) on one thread pool.
+
+    Each lane is guaranteed a minimum number of workers and is capped at a
+    maximum number of workers; the workers that are not reserved are shared
+    by all of the lanes, and the reserved ones that a lane is not using are
+    kept for it (so a lane saturating the pool never delays a lane that has
+    a reservation). Work submitted to the executor itself goes to its
+    default lane (named ``None``, it has no reservation).
+
+    It gathers statistics about the submissions executed (per lane) for
+    post-analysis...
+    """
+
+    threading = _thread.Threading()
+
+    def __init__(self, max_workers=None):
+        """Initializes a bulkhead executor.
+
+        :param max_workers: maximum number of workers (shared by all of the
+                            lanes) that can be simultaneously active at the
+                            same time.
+        :type max_workers: int
+        """
+        if max_workers is None:
+            max_workers = _utils.get_optimal_thread_count()
+        if max_workers <= 0:
+            raise ValueError("Max workers must be greater than zero")
+        self._max_workers = max_workers
+        self._work_queue = _thread.LaneWorkQueue(max_workers)
+        self._lanes = collections.OrderedDict()
+        self._reserved = 0
+        self._shutdown_lock = threading.RLock()
+        self._shutdown = False
+        self._workers = []
+        self.add_lane(None)
+
+    def add_lane(self, name, min_workers=0, max_workers=None,
+                 check_and_reject=None):
+        """Adds a lane.
+
+        :param name: unique name of the lane
+        :param min_workers: how many workers the lane is guaranteed (the
+                            sum of these over all lanes can not be more
+                            than the maximum number of workers)
+        :type min_workers: int
+        :param max_workers: maximum number of workers the lane can use
+                            (when not provided it can use all of them)
+        :type max_workers: int
+        :param check_and_reject: a callback function that will be provided
+                                 two position arguments, the first argument
+                                 will be the lane (a
+                                 :py:class:`.BulkheadLane`), and the second
+                                 will be the number of currently queued work
+                                 items in the lanes backlog; the callback
+                                 should raise a :py:class:`.RejectedSubmission`
+                                 exception if it wants to have this submission
+                                 rejected.
+        :type check_and_reject: callback
+        :returns: the lane (that can be submitted to like an executor)
+        :rtype: :py:class:`.BulkheadLane`
+        """
+        if max_workers is None:
+            max_workers = self._max_workers
+        if min_workers < 0:
+            raise ValueError("Min workers must be greater than or equal"
+                             " to zero")
+        if max_workers <= 0 or max_workers < min_workers:
+            raise ValueError("Max workers must be greater than zero (and"
+                             " greater than or equal to min workers)")
+        with self._shutdown_lock:
+            if name in self._lanes:
+                raise ValueError("Lane %r already exists" % (name,))
+            if self._reserved + min_workers > self._max_workers:
+                raise ValueError("Lanes can not reserve more than %s"
+                                 " workers" % self._max_workers)
+            self._reserved += min_workers
+            self._work_queue.add_lane(name, min_workers,
+                                      min(max_workers, self._max_workers))
+            lane = BulkheadLane(self, name)
+            gatherer = _Gatherer(functools.partial(self._submit, name),
+                                 self.threading.lock_object)
+            self._lanes[name] = (lane, gatherer,
+                                 check_and_reject or (lambda e, waiting: None))
+            return lane
+
+    def lane(self, name):
+        """Returns a (previously added) lane.
+
+        :rtype: :py:class:`.BulkheadLane`
+        """
+        return self._lanes[name][0]
+
+    @property
+    def lane_statistics(self):
+        """:class:`.ExecutorStatistics` (keyed by lane name) of the lanes."""
+        return collections.OrderedDict(
+            (name, gatherer.statistics)
+            for name, (_lane, gatherer, _check) in self._lanes.items())
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the executors executions."""
+        stats = list(self.lane_statistics.values())
+        return ExecutorStatistics(
+            failures=sum(s.failures for s in stats),
+            executed=sum(s.executed for s in stats),
+            runtime=sum(s.runtime for s in stats),
+            cancelled=sum(s.cancelled for s in stats),
+            caller_runs=sum(s.caller_runs for s in stats))
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return not self._shutdown
+
+    def _maybe_spin_up(self):
+        """Spin up a worker if needed."""
+        if len(self._workers) < self._max_workers:
+            w = _thread.ThreadWorker.create_and_register(
+                self, self._work_queue)
+            # Always save it before we start (so that even if we fail
+            # starting it we can correctly join on it).
+            self._workers.append(w)
+            w.start()
+
+    def shutdown(self, wait=True):
+        with self._shutdown_lock:
+            if not self._shutdown:
+                self._shutdown = True
+                for w in self._workers:
+                    w.stop()
+        if wait:
+            for w in self._workers:
+                _thread.join_thread(w)
+
+    def _submit(self, name, fn, *args, **kwargs):
+        f = Future()
+        work = _thread.LaneWorkItem(f, fn, args, kwargs, name,
+                                    self._work_queue)
+        self._maybe_spin_up()
+        self._work_queue.put(work)
+        return f
+
+    def submit_to(self, name, fn, *args, **kwargs):
+        """Submit some work to be run in a lane (and gather statistics)."""
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            lane, gatherer, check_and_reject = self._lanes[name]
+            try:
+                check_and_reject(lane, self._work_queue.qsize(name))
+            except RunInCaller:
+                pass
+            else:
+                return gatherer.submit(fn, *args, **kwargs)
+        # Outside of the lock, so that other submissions are not blocked
+        # while this one runs.
+        return gatherer.submit_in_caller(fn, *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work (to the default lane) to be executed."""
+        return self.submit_to(None, fn, *args, **kwargs)
+
+
+class ProcessPoolExecutor(Executor):
     """Executor that uses a process pool to execute calls asynchronously.
 
     It gathers statistics about the submissions executed for post-analysis...
@@ -199,35 +789,236 @@ class ProcessPoolExecutor(_process.ProcessPoolExecutor):
 
     threading = _thread.Threading()
 
-    def __init__(self, max_workers=None):
+    def __init__(self, max_workers=None, mp_context=None,
+                 preload_modules=None, prestart=False,
+                 callable_cache_size=None, shared_statistics=None):
+        """Initializes a process pool executor.
+
+        :param max_workers: maximum number of child processes that can be
+                            simultaneously active at the same time, further
+                            submitted work will be queued up when this limit
+                            is reached.
+        :type max_workers: int
+        :param mp_context: multiprocessing context (or the name of a start
+                           method, one of ``'fork'``, ``'spawn'`` or
+                           ``'forkserver'``) used to create child processes,
+                           when not provided the platform default is used.
+        :param preload_modules: names of modules that each child imports
+                                before it accepts any work; when the
+                                ``'forkserver'`` start method is used these
+                                are imported **once** in the fork server
+                                (so that children are forked with them
+                                already loaded).
+        :type preload_modules: list
+        :param prestart: start all child processes up front (and keep
+                         replacing any that die) instead of creating them
+                         on demand as work is submitted.
+        :type prestart: bool
+        :param callable_cache_size: when provided each submitted callable is
+                                    pickled once and sent to each child the
+                                    first time it needs it (later submissions
+                                    only send a small identifier); each child
+                                    keeps at most this many callables (least
+                                    recently used ones are evicted). Only
+                                    enable this for callables whose state does
+                                    not change after being submitted; reuse
+                                    the same callable object (for example
+                                    the same ``functools.partial``) so that
+                                    it can be matched.
+        :type callable_cache_size: int
+        :param shared_statistics: shared statistics that each child process
+                                  records (into its own slot) how many
+                                  submissions it executed, how many
+                                  failed and how long they took to run
+                                  (along with its cpu time and memory
+                                  usage); the same shared statistics can be
+                                  given to executors in other processes
+        :type shared_statistics: :py:class:`.SharedStatistics`
+        """
         if max_workers is None:
             max_workers = _utils.get_optimal_process_count()
-        super(ProcessPoolExecutor, self).__init__(max_workers=max_workers)
-        if self._max_workers <= 0:
+        if max_workers <= 0:
             raise ValueError("Max workers must be greater than zero")
-        self._gatherer = _Gatherer(
-            # Since our submit will use this gatherer we have to reference
-            # the parent submit, bound to this instance (which is what we
-            # really want to use anyway).
-            super(ProcessPoolExecutor, self).submit,
-            self.threading.lock_object)
+        self._max_workers = max_workers
+        context = _process.get_context(mp_context)
+        preload_modules = list(preload_modules or [])
+        if (preload_modules and
+                _process.get_start_method(context) == 'forkserver'):
+            # NOTE: this has no effect if the fork server of this context
+            # has already been started (it only gets started once).
+            context.set_forkserver_preload(preload_modules)
+        self._shutdown_lock = threading.RLock()
+        self._shutdown = False
+        self._pool = self._create_pool(
+            max_workers, context, preload_modules=preload_modules,
+            prestart=prestart, callable_cache_size=callable_cache_size,
+            shared_statistics=shared_statistics)
+        self._gatherer = _Gatherer(self._submit, self.threading.lock_object)
+
+    def _create_pool(self, max_workers, context, **kwargs):
+        return _process.WorkerPool(self, max_workers, context, **kwargs)
 
     @property
     def alive(self):
         """Accessor to determine if the executor is alive/active."""
-        return not self._shutdown_thread
+        return not self._shutdown
 
     @property
     def statistics(self):
         """:class:`.ExecutorStatistics` about the executors executions."""
         return self._gatherer.statistics
 
+    @property
+    def shared_statistics(self):
+        """:class:`.SharedStatistics` the child processes record into."""
+        return self._pool._shared_statistics
+
+    def shutdown(self, wait=True):
+        with self._shutdown_lock:
+            self._shutdown = True
+        self._pool.shutdown(wait=wait)
+
+    def _put(self, work):
+        self._pool.put(work)
+
+    def _submit(self, fn, *args, **kwargs):
+        f = Future()
+        self._put(_utils.WorkItem(f, fn, args, kwargs))
+        return f
+
     def submit(self, fn, *args, **kwargs):
         """Submit some work to be executed (and gather statistics)."""
-        return self._gatherer.submit(fn, *args, **kwargs)
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            return self._gatherer.submit(fn, *args, **kwargs)
 
+    def submit_stream(self, fn, *args, **kwargs):
+        """Submit a generator function whose items get streamed back.
+
+        The child process sends the items back in chunks as the generator
+        produces them (instead of building and sending everything at once);
+        cancelling the stream stops the generator in the child.
+
+        :param stream_chunk_size: how many items are sent back at a time
+                                  (passed as a keyword argument, it is
+                                  **not** passed to ``fn``); defaults to 32
+        :param stream_max_chunks: how many chunks can be sent back (and not
+                                  yet consumed) before the generator gets
+                                  paused (passed as a keyword argument, it
+                                  is **not** passed to ``fn``); defaults
+                                  to 4
+        :returns: stream of the items the generator produces
+        :rtype: :py:class:`.ResultStream`
+        """
+        chunk_size = kwargs.pop('stream_chunk_size', 32)
+        max_chunks = kwargs.pop('stream_max_chunks', 4)
+        stream = ResultStream(self.threading, max_chunks,
+                              on_consumed=self._pool.credit,
+                              on_cancel=self._pool.cancel)
+
+        def submit_func(fn, *args, **kwargs):
+            f = Future()
+            work = _process.StreamWorkItem(f, fn, args, kwargs, stream,
+                                           chunk_size, max_chunks)
+            self._put(work)
+            return f
 
-class SynchronousExecutor(_futures.Executor):
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            stream.attach(self._gatherer.submit_using(submit_func, fn,
+                                                      *args, **kwargs))
+        return stream
+
+
+class AffinityProcessPoolExecutor(ProcessPoolExecutor):
+    """Process pool executor that routes work by key to the same process.
+
+    Each child process has its own queue and work submitted with the same
+    ``affinity_key`` is sent to the same child (keys are spread over the
+    children using consistent hashing) so that per-key state cached in a
+    child gets reused. All children are started up front; work without a
+    key (or whose child is saturated, it already has ``max_worker_backlog``
+    items queued, or has died and its replacement is not ready yet) is run
+    by whichever child becomes free first.
+
+    It gathers statistics about the submissions executed for post-analysis...
+    """
+
+    def __init__(self, max_workers=None, mp_context=None,
+                 preload_modules=None, callable_cache_size=None,
+                 shared_statistics=None, max_worker_backlog=8):
+        """Initializes a process pool executor with key affinity.
+
+        Accepts the same arguments as :py:class:`.ProcessPoolExecutor`
+        (except ``prestart``, child processes are always started up front)
+        and the following:
+
+        :param max_worker_backlog: maximum number of work items that can be
+                                   queued for a single child; when reached
+                                   further work for that child is instead
+                                   run by any child (when none, no
+                                   limit is enforced).
+        :type max_worker_backlog: int
+        """
+        self._max_worker_backlog = max_worker_backlog
+        super(AffinityProcessPoolExecutor, self).__init__(
+            max_workers=max_workers, mp_context=mp_context,
+            preload_modules=preload_modules,
+            callable_cache_size=callable_cache_size,
+            shared_statistics=shared_statistics)
+
+    def _create_pool(self, max_workers, context, **kwargs):
+        return _process.AffinityWorkerPool(
+            self, max_workers, context,
+            max_worker_backlog=self._max_worker_backlog, **kwargs)
+
+    @property
+    def worker_statistics(self):
+        """Per child process backlog statistics.
+
+        :returns: a list of ``WorkerStatistics`` named tuples (with fields
+                  ``pid``, ``backlog``, ``routed``, ``overflowed`` and
+                  ``dispatched``), one per child process
+        :rtype: list
+        """
+        return self._pool.statistics
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work to be executed (and gather statistics).
+
+        :param affinity_key: hashable key (passed as a keyword argument,
+                             it is **not** passed to ``fn``) that decides
+                             which child process runs the work
+        """
+        return super(AffinityProcessPoolExecutor, self).submit(
+            fn, *args, **kwargs)
+
+    def submit_stream(self, fn, *args, **kwargs):
+        """Submit a generator function whose items get streamed back.
+
+        Accepts the same arguments as
+        :py:meth:`.ProcessPoolExecutor.submit_stream` and the following:
+
+        :param affinity_key: hashable key (passed as a keyword argument,
+                             it is **not** passed to ``fn``) that decides
+                             which child process runs the generator
+        """
+        return super(AffinityProcessPoolExecutor, self).submit_stream(
+            fn, *args, **kwargs)
+
+    def _put(self, work):
+        affinity_key = work.kwargs.pop('affinity_key', None)
+        if affinity_key is None:
+            self._pool.put(work)
+        else:
+            self._pool.put_with_key(work, affinity_key)
+
+
+class SynchronousExecutor(Executor):
     """Executor that uses the caller to execute calls synchronously.
 
     This provides an interface to a caller that looks like an executor but
@@ -240,7 +1031,8 @@ class SynchronousExecutor(_futures.Executor):
 
     threading = _thread.Threading()
 
-    def __init__(self, green=False, run_work_func=lambda work: work.run()):
+    def __init__(self, green=False, run_work_func=lambda work: work.run(),
+                 watchdog=None):
         """Synchronous executor constructor.
 
         :param green: when enabled this forces the usage of greened lock
@@ -250,6 +1042,9 @@ class SynchronousExecutor(_futures.Executor):
         :param run_work_func: callable that takes a single work item and
                               runs it (typically in a blocking manner)
         :param run_work_func: callable
+        :param watchdog: watchdog that watches (and reports) submitted work
+                         that gets stuck running
+        :type watchdog: :py:class:`.Watchdog`
         """
         if green and not _utils.EVENTLET_AVAILABLE:
             raise RuntimeError('Eventlet is needed to use a green'
@@ -264,6 +1059,7 @@ class SynchronousExecutor(_futures.Executor):
         else:
             self._future_cls = Future
         self._run_work_func = run_work_func
+        self._watchdog = watchdog
         self._gatherer = _Gatherer(self._submit,
                                    self.threading.lock_object,
                                    start_before_submit=True)
@@ -298,6 +1094,8 @@ class SynchronousExecutor(_futures.Executor):
         return self._gatherer.submit(fn, *args, **kwargs)
 
     def _submit(self, fn, *args, **kwargs):
+        if self._watchdog is not None:
+            fn = self._watchdog.wrap(fn)
         fut = self._future_cls()
         self._run_work_func(_utils.WorkItem(fut, fn, args, kwargs))
         return fut
@@ -319,7 +1117,111 @@ class GreenFuture(Future):
             self._condition = _green.threading.condition_object()
 
 
-class GreenThreadPoolExecutor(_futures.Executor):
+# Setting the outcome of a derived future that was cancelled (by whoever got
+# it) raises this on newer versions of python.
+_INVALID_STATE_ERRORS = tuple(
+    cls for cls in [getattr(_futures, 'InvalidStateError', None)] if cls)
+
+
+def _derived_future(green, sources):
+    """Makes a future whose outcome is set from the outcome of others.
+
+    When it gets cancelled its waiters are told and the (list of) source
+    futures get cancelled (the list can be added to later).
+    """
+    if green:
+        fut = GreenFuture()
+    else:
+        fut = Future()
+
+    def on_done(fut):
+        if not fut.cancelled():
+            return
+        # Derived futures are never marked as running, so they have to be
+        # moved out of the cancelled state (so that waiters are told) here.
+        try:
+            fut.set_running_or_notify_cancel()
+        except RuntimeError:
+            pass
+        for source in list(sources):
+            source.cancel()
+
+    fut.add_done_callback(on_done)
+    return fut
+
+
+def _set_result(fut, result):
+    try:
+        fut.set_result(result)
+    except _INVALID_STATE_ERRORS:
+        pass
+
+
+def _set_exception(fut, exc):
+    try:
+        fut.set_exception(exc)
+    except _INVALID_STATE_ERRORS:
+        pass
+
+
+def _copy_outcome(source, fut):
+    if source.cancelled():
+        fut.cancel()
+        return
+    try:
+        if source.exception() is not None:
+            if six.PY2:
+                fut.set_exception_info(*source.exception_info())
+            else:
+                fut.set_exception(source.exception())
+        else:
+            fut.set_result(source.result())
+    except _INVALID_STATE_ERRORS:
+        pass
+
+
+def _submit_after(executor, deps, submit):
+    deps = list(deps)
+    submitted = []
+    fut = _derived_future(executor.threading is _green.threading,
+                          submitted)
+    results = [None] * len(deps)
+    lock = executor.threading.lock_object()
+    remaining = [len(deps)]
+
+    def dispatch():
+        if fut.done():
+            return
+        try:
+            dep_fut = submit(results)
+        except Exception as e:
+            _set_exception(fut, e)
+        else:
+            submitted.append(dep_fut)
+            if fut.cancelled():
+                dep_fut.cancel()
+            dep_fut.add_done_callback(
+                functools.partial(_copy_outcome, fut=fut))
+
+    def on_dep_done(index, dep):
+        if dep.cancelled() or dep.exception() is not None:
+            _copy_outcome(dep, fut)
+            return
+        results[index] = dep.result()
+        with lock:
+            remaining[0] -= 1
+            ready = remaining[0] == 0
+        if ready:
+            dispatch()
+
+    if not deps:
+        dispatch()
+    for index, dep in enumerate(deps):
+        dep.add_done_callback(functools.partial(on_dep_done, index))
+    return fut
+
+
+class GreenThreadPoolExecutor(Executor):
     """Executor that uses a green thread pool to execute calls asynchronously.
 
     See: https://docs.python.org/dev/library/concurrent.futures.html
@@ -360,7 +1262,8 @@ class GreenThreadPoolExecutor(_futures.Executor):
         self._shutdown_lock = self.threading.lock_object()
         self._shutdown = False
         self._gatherer = _Gatherer(self._submit,
-                                   self.threading.lock_object)
+                                   self.threading.lock_object,
+                                   caller_future_cls=GreenFuture)
 
     @property
     def alive(self):
@@ -384,8 +1287,30 @@ class GreenThreadPoolExecutor(_futures.Executor):
             if self._shutdown:
                 raise RuntimeError('Can not schedule new futures'
                                    ' after being shutdown')
-            self._check_and_reject(self, self._delayed_work.qsize())
-            return self._gatherer.submit(fn, *args, **kwargs)
+            try:
+                self._check_and_reject(self, self._delayed_work.qsize())
+            except RunInCaller:
+                pass
+            else:
+                return self._gatherer.submit(fn, *args, **kwargs)
+        # Outside of the lock, so that other submissions are not blocked
+        # while this one runs.
+        return self._gatherer.submit_in_caller(fn, *args, **kwargs)
+
+    def submit_stream(self, fn, *args, **kwargs):
+        """Submit a generator function whose items get streamed back.
+
+        :param stream_chunk_size: how many items are handed over at a time
+                                  (passed as a keyword argument, it is
+                                  **not** passed to ``fn``); defaults to 1
+        :param stream_max_chunks: how many chunks can be buffered before the
+                                  generator gets paused (passed as a keyword
+                                  argument, it is **not** passed to
+                                  ``fn``); defaults to 64
+        :returns: stream of the items the generator produces
+        :rtype: :py:class:`.ResultStream`
+        """
+        return _submit_stream(self, fn, args, kwargs)
 
     def _submit(self, fn, *args, **kwargs):
         f = GreenFuture()
@@ -419,21 +1344,771 @@ class GreenThreadPoolExecutor(_futures.Executor):
             self._pool.waitall()
 
 
+class AsyncioExecutor(Executor):
+    """Executor that runs coroutine functions on asyncio event loop threads.
+
+    Each submission is called (in one of the loop threads) and what it
+    returns (a coroutine or other awaitable) is run as a task on that loop,
+    so a few threads can drive many concurrent (I/O bound) submissions.
+    Submissions that return something that is not awaitable are treated as
+    plain (and short, since they block their loop) functions, which allows
+    it to be used by a :py:class:`.futurist.periodics.PeriodicWorker`.
+
+    It gathers statistics about the submissions executed for post-analysis...
+    """
+
+    threading = _thread.Threading()
+
+    def __init__(self, max_loops=1, max_concurrency=None,
+                 check_and_reject=None):
+        """Initializes an asyncio executor.
+
+        :param max_loops: how many event loop threads are used (each
+                          submission is started on the loop that is the
+                          least busy).
+        :type max_loops: int
+        :param max_concurrency: maximum number of submissions that can be
+                                simultaneously running at the same time,
+                                further submitted work will be queued up
+                                when this limit is reached (when not
+                                provided there is no limit).
+        :type max_concurrency: int
+        :param check_and_reject: a callback function that will be provided
+                                 two position arguments, the first argument
+                                 will be this executor instance, and the second
+                                 will be the number of currently queued work
+                                 items in this executors backlog; the callback
+                                 should raise a :py:class:`.RejectedSubmission`
+                                 exception if it wants to have this submission
+                                 rejected.
+        :type check_and_reject: callback
+        """
+        if not _asyncio.ASYNCIO_AVAILABLE:
+            raise RuntimeError('Asyncio is needed to use an asyncio executor')
+        if max_loops <= 0:
+            raise ValueError("Max loops must be greater than zero")
+        if max_concurrency is not None and max_concurrency <= 0:
+            raise ValueError("Max concurrency must be greater than zero")
+        self._max_loops = max_loops
+        self._max_concurrency = max_concurrency
+        self._loops = []
+        self._backlog = collections.deque()
+        self._running = 0
+        self._cond = self.threading.condition_object()
+        self._shutdown_lock = threading.RLock()
+        self._shutdown = False
+        self._check_and_reject = check_and_reject or (lambda e, waiting: None)
+        self._gatherer = _Gatherer(self._submit, self.threading.lock_object)
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the executors executions."""
+        return self._gatherer.statistics
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return not self._shutdown
+
+    def _maybe_spin_up(self):
+        """Spin up a loop thread if needed (and pick one to start on)."""
+        if len(self._loops) < self._max_loops:
+            t = _asyncio.LoopThread(
+                name='asyncio-executor-%s' % len(self._loops))
+            self._loops.append(t)
+            t.start()
+            return t
+        return min(self._loops, key=lambda t: t.running)
+
+    def _start(self, work):
+        t = self._maybe_spin_up()
+        t.running += 1
+        self._running += 1
+        t.bridge.post(_asyncio.start_work, work, t.loop,
+                      functools.partial(self._on_finished, t))
+
+    def _on_finished(self, t, work):
+        with self._cond:
+            t.running -= 1
+            self._running -= 1
+            if self._backlog:
+                self._start(self._backlog.popleft())
+            elif self._running == 0:
+                self._cond.notify_all()
+                if self._shutdown:
+                    self._stop_loops()
+
+    def _stop_loops(self):
+        for t in self._loops:
+            t.stop()
+
+    def shutdown(self, wait=True):
+        with self._shutdown_lock:
+            with self._cond:
+                if not self._shutdown:
+                    self._shutdown = True
+                    if self._running == 0:
+                        self._stop_loops()
+        if wait:
+            for t in self._loops:
+                _thread.join_thread(t)
+
+    def _submit(self, fn, *args, **kwargs):
+        f = Future()
+        work = _utils.WorkItem(f, fn, args, kwargs)
+        with self._cond:
+            if (self._max_concurrency is None or
+                    self._running < self._max_concurrency):
+                self._start(work)
+            else:
+                self._backlog.append(work)
+        return f
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit a coroutine function to be run (and gather statistics)."""
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            self._check_and_reject(self, len(self._backlog))
+            return self._gatherer.submit(fn, *args, **kwargs)
+
+
+def _submission_key(fn, args, kwargs):
+    """Key of a submission (or none if its arguments are not hashable)."""
+    key = (fn, args, frozenset(six.iteritems(kwargs)))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+#: Named tuple of the statistics about (the deduplication done by) a
+#: :py:class:`.SingleFlightExecutor`.
+SingleFlightStatistics = collections.namedtuple(
+    'SingleFlightStatistics', 'hits misses in_flight')
+
+
+class SingleFlightExecutor(Executor):
+    """Executor that deduplicates identical (in-flight) submissions.
+
+    Wraps another executor; while a submission is in-flight any equal
+    submission (one with an equal key) gets back the same future instead of
+    having the work submitted again. Once that future completes it is
+    forgotten, so later submissions run the work again. This keeps bursts
+    of requests for the same expensive work (a cache miss storm for
+    example) from running it many times over at once.
+
+    Since the future is shared, cancelling it cancels it for all of the
+    submissions that got it.
+    """
+
+    def __init__(self, executor):
+        """Initializes a single flight executor.
+
+        :param executor: executor that submissions are submitted to (it
+                         gathers the execution statistics)
+        """
+        self._executor = executor
+        self._lock = self.threading.lock_object()
+        self._in_flight = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def threading(self):
+        return self._executor.threading
+
+    @property
+    def executor(self):
+        """The executor that submissions are submitted to."""
+        return self._executor
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the executors executions."""
+        return self._executor.statistics
+
+    @property
+    def single_flight_statistics(self):
+        """:class:`.SingleFlightStatistics` about the deduplication."""
+        with self._lock:
+            return SingleFlightStatistics(hits=self._hits,
+                                          misses=self._misses,
+                                          in_flight=len(self._in_flight))
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return self._executor.alive
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _forget(self, key, fut):
+        with self._lock:
+            if self._in_flight.get(key) is fut:
+                del self._in_flight[key]
+
+    def submit_keyed(self, key, fn, *args, **kwargs):
+        """Submit some work (unless work with an equal key is in-flight).
+
+        :param key: hashable key that identifies the work
+        :returns: future of the result of the work (the in-flight one, if
+                  there is one)
+        """
+        sources = []
+        with self._lock:
+            try:
+                fut = self._in_flight[key]
+            except KeyError:
+                fut = _derived_future(self.threading is _green.threading,
+                                      sources)
+                self._in_flight[key] = fut
+                self._misses += 1
+            else:
+                self._hits += 1
+                return fut
+        fut.add_done_callback(functools.partial(self._forget, key))
+        try:
+            source = self._executor.submit(fn, *args, **kwargs)
+        except Exception as e:
+            # Whoever else got this future will see it fail the same way.
+            _set_exception(fut, e)
+            raise
+        sources.append(source)
+        if fut.cancelled():
+            source.cancel()
+        source.add_done_callback(functools.partial(_copy_outcome, fut=fut))
+        return fut
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work (unless equal work is in-flight).
+
+        Work is equal when the function and the arguments it is given are
+        equal; when any of those arguments can not be hashed the work is
+        submitted without any deduplication.
+        """
+        key = _submission_key(fn, args, kwargs)
+        if key is None:
+            return self._executor.submit(fn, *args, **kwargs)
+        return self.submit_keyed(key, fn, *args, **kwargs)
+
+
+#: Named tuple of the statistics about (the cache of) a
+#: :py:class:`.CachingExecutor`.
+CacheStatistics = collections.namedtuple(
+    'CacheStatistics', 'hits misses evictions size')
+
+
+class CachingExecutor(Executor):
+    """Executor that caches the results of (completed) submissions.
+
+    Wraps another executor; once a submission completes its (completed)
+    future is kept, and equal submissions (ones with an equal key) get that
+    future back (without submitting anything) until it expires or gets
+    evicted (the least recently used are evicted first when the cache is
+    full). Submissions made while an equal one is still running are
+    submitted (wrap a :py:class:`.SingleFlightExecutor` to avoid that).
+
+    It is meant for idempotent work whose results stay valid for a while,
+    such as lookups that periodic refreshes repeat within seconds of each
+    other.
+    """
+
+    def __init__(self, executor, max_size=None, ttl=None,
+                 cache_failures=False):
+        """Initializes a caching executor.
+
+        :param executor: executor that submissions are submitted to (it
+                         gathers the execution statistics)
+        :param max_size: maximum number of results to cache (when not
+                         provided there is no limit)
+        :type max_size: int
+        :param ttl: how many seconds results stay cached (when not provided
+                    they stay until evicted)
+        :type ttl: number
+        :param cache_failures: cache submissions that raised exceptions
+                               (so equal submissions fail the same way
+                               without running again)
+        :type cache_failures: bool
+        """
+        if max_size is not None and max_size <= 0:
+            raise ValueError("Max size must be greater than zero")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("TTL must be greater than zero")
+        self._executor = executor
+        self._max_size = max_size
+        self._ttl = ttl
+        self._cache_failures = cache_failures
+        self._lock = self.threading.lock_object()
+        self._cache = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def threading(self):
+        return self._executor.threading
+
+    @property
+    def executor(self):
+        """The executor that submissions are submitted to."""
+        return self._executor
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the executors executions."""
+        return self._executor.statistics
+
+    @property
+    def cache_statistics(self):
+        """:class:`.CacheStatistics` about the cache."""
+        with self._lock:
+            return CacheStatistics(hits=self._hits, misses=self._misses,
+                                   evictions=self._evictions,
+                                   size=len(self._cache))
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return self._executor.alive
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def clear(self):
+        """Forgets all cached results."""
+        with self._lock:
+            self._cache.clear()
+
+    def _store(self, key, fut):
+        if fut.cancelled():
+            return
+        if fut.exception() is not None and not self._cache_failures:
+            return
+        if self._ttl is None:
+            expires_at = None
+        else:
+            expires_at = _utils.now() + self._ttl
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = (expires_at, fut)
+            if self._max_size is not None:
+                while len(self._cache) > self._max_size:
+                    self._cache.popitem(last=False)
+                    self._evictions += 1
+
+    def _lookup(self, key):
+        with self._lock:
+            try:
+                expires_at, fut = self._cache.pop(key)
+            except KeyError:
+                self._misses += 1
+                return None
+            if expires_at is not None and expires_at <= _utils.now():
+                self._evictions += 1
+                self._misses += 1
+                return None
+            # Put it back (at the end, as the most recently used).
+            self._cache[key] = (expires_at, fut)
+            self._hits += 1
+            return fut
+
+    def submit_keyed(self, key, fn, *args, **kwargs):
+        """Submit some work (unless a result with an equal key is cached).
+
+        :param key: hashable key that identifies the work
+        :returns: future of the result of the work (the cached one, if
+                  there is one)
+        """
+        fut = self._lookup(key)
+        if fut is None:
+            fut = self._executor.submit(fn, *args, **kwargs)
+            fut.add_done_callback(functools.partial(self._store, key))
+        return fut
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work (unless the result of equal work is cached).
+
+        Work is equal when the function and the arguments it is given are
+        equal; when any of those arguments can not be hashed the work is
+        submitted without any caching.
+        """
+        key = _submission_key(fn, args, kwargs)
+        if key is None:
+            return self._executor.submit(fn, *args, **kwargs)
+        return self.submit_keyed(key, fn, *args, **kwargs)
+
+
+#: Named tuple of the statistics about the batches of a
+#: :py:class:`.BatchingExecutor` (the flush latency is the total time the
+#: batches spent being accumulated, from their first item being submitted
+#: until they were flushed).
+BatchStatistics = collections.namedtuple(
+    'BatchStatistics', 'batches items flush_latency')
+
+
+class BatchingExecutor(Executor):
+    """Executor that coalesces submitted items into batches.
+
+    Each submitted item gets its own future, while the items themselves are
+    accumulated and passed (as a list) to a batch function that runs on
+    another executor. A batch is flushed once it has the maximum number of
+    items or once its first item has waited for the maximum delay,
+    whichever comes first.
+
+    The batch function must return a list with a result for each item (in
+    the same order); results that are exceptions fail the futures of their
+    items (and if the batch function raises the futures of all of its items
+    fail with what it raised).
+    """
+
+    def __init__(self, executor, batch_fn, max_batch_size=100,
+                 max_delay=0.01):
+        """Initializes a batching executor.
+
+        :param executor: executor that batches are submitted to (it
+                         gathers the execution statistics)
+        :param batch_fn: callable that is given a list of items and
+                         returns a list of their results
+        :type batch_fn: callable
+        :param max_batch_size: number of items that flushes a batch
+        :type max_batch_size: int
+        :param max_delay: seconds after which a batch is flushed (even if
+                          it is not full)
+        :type max_delay: number
+        """
+        if not six.callable(batch_fn):
+            raise ValueError("Batch function expected to be callable")
+        if max_batch_size <= 0:
+            raise ValueError("Max batch size must be greater than zero")
+        if max_delay < 0:
+            raise ValueError("Max delay must be greater than or equal"
+                             " to zero")
+        self._executor = executor
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay
+        self._green = executor.threading is _green.threading
+        if self._green:
+            self._future_cls = GreenFuture
+        else:
+            self._future_cls = Future
+        self._lock = self.threading.lock_object()
+        self._shutdown = False
+        self._batch = []
+        self._batch_id = 0
+        self._batch_started_at = None
+        self._batch_timer = None
+        self._batches = 0
+        self._items = 0
+        self._flush_latency = 0.0
+
+    @property
+    def threading(self):
+        return self._executor.threading
+
+    @property
+    def executor(self):
+        """The executor that batches are submitted to."""
+        return self._executor
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the executors executions."""
+        return self._executor.statistics
+
+    @property
+    def batch_statistics(self):
+        """:class:`.BatchStatistics` about the flushed batches."""
+        with self._lock:
+            return BatchStatistics(batches=self._batches, items=self._items,
+                                   flush_latency=self._flush_latency)
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return not self._shutdown
+
+    def shutdown(self, wait=True):
+        """Flushes any accumulated items and shuts down the executor."""
+        with self._lock:
+            self._shutdown = True
+            batch = self._take_batch()
+        self._dispatch(batch)
+        self._executor.shutdown(wait=wait)
+
+    def _take_batch(self):
+        batch = self._batch
+        if not batch:
+            return batch
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        self._batch = []
+        self._batch_id += 1
+        self._batches += 1
+        self._items += len(batch)
+        self._flush_latency += _utils.now() - self._batch_started_at
+        return batch
+
+    def _dispatch(self, batch):
+        batch = [(item, fut) for (item, fut) in batch
+                 if fut.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            batch_fut = self._executor.submit(self._run_batch, batch)
+        except Exception as e:
+            for _item, fut in batch:
+                fut.set_exception(e)
+        else:
+            batch_fut.add_done_callback(
+                functools.partial(self._on_batch_done, batch))
+
+    @staticmethod
+    def _on_batch_done(batch, batch_fut):
+        # The futures of the items are already running, so they can not
+        # be cancelled (if the batch never ran they fail instead).
+        if batch_fut.cancelled():
+            exc = CancelledError()
+        else:
+            exc = batch_fut.exception()
+            if exc is None:
+                return
+        for _item, fut in batch:
+            if not fut.done():
+                _set_exception(fut, exc)
+
+    def _run_batch(self, batch):
+        try:
+            results = self._batch_fn([item for (item, _fut) in batch])
+            if len(results) != len(batch):
+                raise ValueError("Batch function returned %s results for"
+                                 " %s items" % (len(results), len(batch)))
+        except Exception as e:
+            for _item, fut in batch:
+                fut.set_exception(e)
+            raise
+        for (_item, fut), result in zip(batch, results):
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    def _flush_due(self, batch_id):
+        with self._lock:
+            if batch_id != self._batch_id:
+                return
+            self._batch_timer = None
+            batch = self._take_batch()
+        self._dispatch(batch)
+
+    def flush(self):
+        """Flushes the accumulated items (without waiting for more)."""
+        with self._lock:
+            batch = self._take_batch()
+        self._dispatch(batch)
+
+    def submit(self, item):
+        """Submit an item to be (batched and) processed.
+
+        :returns: future of the result of the item
+        """
+        fut = self._future_cls()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            self._batch.append((item, fut))
+            if len(self._batch) == 1:
+                self._batch_started_at = _utils.now()
+            if len(self._batch) >= self._max_batch_size:
+                batch = self._take_batch()
+            else:
+                batch = None
+                if self._batch_timer is None:
+                    self._batch_timer = _timer.call_later(
+                        self._max_delay, self._flush_due, self._batch_id,
+                        green=self._green)
+        if batch:
+            self._dispatch(batch)
+        return fut
+
+    def submit_after(self, deps, item):
+        """Submit an item once the futures it depends on have completed.
+
+        If any of them fails (or is cancelled) the item is never submitted
+        and the returned future fails (or is cancelled) the same way.
+
+        :param deps: futures that must complete before submitting
+        :type deps: list
+        :returns: future of the result of the item
+        """
+        return _submit_after(self, deps, lambda _results: self.submit(item))
+
+    def map(self, items, timeout=None):
+        """Submit items (to be batched) and iterate over their results.
+
+        :param items: items to submit (all of them are submitted before
+                      the first result is waited on)
+        :param timeout: seconds to wait for all of the results
+        :type timeout: number
+        :returns: iterator of the results of the items (in order)
+        """
+        if timeout is not None:
+            ends_at = _utils.now() + timeout
+        fs = [self.submit(item) for item in items]
+
+        def result_iterator():
+            try:
+                for fut in fs:
+                    if timeout is None:
+                        yield fut.result()
+                    else:
+                        yield fut.result(max(0, ends_at - _utils.now()))
+            finally:
+                for fut in fs:
+                    fut.cancel()
+
+        return result_iterator()
+
+
+class ScheduledExecutor(Executor):
+    """Executor that submits work (to another executor) at a later time.
+
+    Delays are tracked by a single timer thread (using a heap, where
+    cancelled calls are dropped lazily, so cancelling is cheap), no worker
+    of the other executor is used until the work is due.
+    """
+
+    def __init__(self, executor):
+        """Initializes a scheduled executor.
+
+        :param executor: executor that work is submitted to (once it is
+                         due), it gathers the execution statistics
+        """
+        self._executor = executor
+        self._green = executor.threading is _green.threading
+        self._lock = self.threading.lock_object()
+        self._pending = {}
+        self._shutdown = False
+
+    @property
+    def threading(self):
+        return self._executor.threading
+
+    @property
+    def executor(self):
+        """The executor that work is submitted to."""
+        return self._executor
+
+    @property
+    def statistics(self):
+        """:class:`.ExecutorStatistics` about the executors executions."""
+        return self._executor.statistics
+
+    @property
+    def pending(self):
+        """How much work is waiting to be submitted (when it is due)."""
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def alive(self):
+        """Accessor to determine if the executor is alive/active."""
+        return not self._shutdown
+
+    def shutdown(self, wait=True):
+        """Cancels work that is not due yet and shuts down the executor."""
+        with self._lock:
+            self._shutdown = True
+            pending = list(self._pending)
+        for fut in pending:
+            fut.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _on_done(self, fut):
+        with self._lock:
+            handle = self._pending.pop(fut, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _dispatch(self, fut, sources, fn, args, kwargs):
+        with self._lock:
+            if self._pending.pop(fut, None) is None:
+                return
+        try:
+            source = self._executor.submit(fn, *args, **kwargs)
+        except Exception as e:
+            _set_exception(fut, e)
+        else:
+            sources.append(source)
+            if fut.cancelled():
+                source.cancel()
+            source.add_done_callback(functools.partial(_copy_outcome,
+                                                       fut=fut))
+
+    def submit_delayed(self, delay, fn, *args, **kwargs):
+        """Submit some work after a delay.
+
+        :param delay: seconds to wait before submitting the work
+        :type delay: number
+        :returns: future of the result of the work (cancelling it before
+                  the work is due cancels the submission)
+        """
+        sources = []
+        fut = _derived_future(self._green, sources)
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            self._pending[fut] = _timer.call_later(
+                delay, self._dispatch, fut, sources, fn, args, kwargs,
+                green=self._green)
+        fut.add_done_callback(self._on_done)
+        return fut
+
+    def submit_at(self, when, fn, *args, **kwargs):
+        """Submit some work at a given time.
+
+        :param when: time (in seconds since the epoch, like what
+                     :py:func:`time.time` returns) to submit the work at
+        :type when: number
+        :returns: future of the result of the work (cancelling it before
+                  the work is due cancels the submission)
+        """
+        return self.submit_delayed(when - time.time(), fn, *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work (now)."""
+        if self._shutdown:
+            raise RuntimeError('Can not schedule new futures'
+                               ' after being shutdown')
+        return self._executor.submit(fn, *args, **kwargs)
+
+
 class ExecutorStatistics(object):
     """Holds *immutable* information about a executors executions."""
 
-    __slots__ = ['_failures', '_executed', '_runtime', '_cancelled']
+    __slots__ = ['_failures', '_executed', '_runtime', '_cancelled',
+                 '_caller_runs']
 
     _REPR_MSG_TPL = ("<ExecutorStatistics object at 0x%(ident)x"
                      " (failures=%(failures)s,"
                      " executed=%(executed)s, runtime=%(runtime)0.2f,"
-                     " cancelled=%(cancelled)s)>")
+                     " cancelled=%(cancelled)s,"
+                     " caller_runs=%(caller_runs)s)>")
 
-    def __init__(self, failures=0, executed=0, runtime=0.0, cancelled=0):
+    def __init__(self, failures=0, executed=0, runtime=0.0, cancelled=0,
+                 caller_runs=0):
         self._failures = failures
         self._executed = executed
         self._runtime = runtime
         self._cancelled = cancelled
+        self._caller_runs = caller_runs
 
     @property
     def failures(self):
@@ -471,6 +2146,18 @@ class ExecutorStatistics(object):
         """
         return self._cancelled
 
+    @property
+    def caller_runs(self):
+        """How many submissions were run by the caller (when overloaded).
+
+        These are also counted as executed (and as failures, if they
+        failed).
+
+        :returns: how many submissions were run by the caller
+        :rtype: number
+        """
+        return self._caller_runs
+
     @property
     def average_runtime(self):
         """The average runtime of all submissions executed.
@@ -488,4 +2175,18 @@ class ExecutorStatistics(object):
             'executed': self._executed,
             'runtime': self._runtime,
             'cancelled': self._cancelled,
+            'caller_runs': self._caller_runs,
         })
+
+
+class SharedStatistics(_shared.SharedStatistics):
+    __doc__ = _shared.SharedStatistics.__doc__
+
+    def snapshot(self):
+        """Statistics of all processes (including exited ones) merged.
+
+        :returns: merged statistics (where the runtime is the time spent
+                  executing inside of the processes)
+        :rtype: :class:`.ExecutorStatistics`
+        """
+        return ExecutorStatistics(**self.totals())
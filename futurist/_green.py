@@ -19,6 +19,7 @@ from futurist import _utils
 
 try:
     from eventlet import greenpool
+    from eventlet import greenthread
     from eventlet import patcher as greenpatcher
     from eventlet import queue as greenqueue
 
@@ -26,6 +27,7 @@ try:
 except ImportError:
     greenpatcher, greenpool, greenqueue, greenthreading = (None, None,
                                                            None, None)
+    greenthread = None
 
 
 if _utils.EVENTLET_AVAILABLE:
@@ -33,6 +35,8 @@ if _utils.EVENTLET_AVAILABLE:
     Pool = greenpool.GreenPool
     Queue = greenqueue.Queue
     is_monkey_patched = greenpatcher.is_monkey_patched
+    sleep = greenthread.sleep
+    spawn_after = greenthread.spawn_after
 
     class GreenThreading(object):
 
@@ -57,6 +61,8 @@ else:
     threading = None
     Pool = None
     Queue = None
+    sleep = None
+    spawn_after = None
     is_monkey_patched = lambda mod: False
 
 
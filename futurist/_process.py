@@ -0,0 +1,925 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import atexit
+import bisect
+import collections
+import hashlib
+import importlib
+import itertools
+import multiprocessing
+from multiprocessing import connection as mp_connection
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from concurrent.futures import process as _process
+import six
+
+from futurist import _shared
+from futurist import _utils
+try:
+    from multiprocessing.reduction import ForkingPickler as _ForkingPickler
+except ImportError:
+    import pickle as _ForkingPickler
+
+try:
+    BrokenProcessPool = _process.BrokenProcessPool
+except AttributeError:
+    class BrokenProcessPool(RuntimeError):
+        """Raised when a child process dies while running a work item."""
+
+
+# Message kinds sent from a child process back to its parent.
+_READY = 'ready'
+_RESULT = 'result'
+_FAILED = 'failed'
+_CHUNK = 'chunk'
+
+# Message kinds sent from the parent to a child process.
+_WORK = 'work'
+_CREDIT = 'credit'
+_CANCEL = 'cancel'
+
+_pools = weakref.WeakSet()
+
+#: Named tuple of per child process statistics (see ``AffinityWorkerPool``).
+WorkerStatistics = collections.namedtuple(
+    'WorkerStatistics', 'pid backlog routed overflowed dispatched')
+
+
+def get_context(mp_context=None):
+    """Returns the multiprocessing context to spawn child processes with.
+
+    Accepts ``None`` (the platform default), a start method name (for
+    example ``'forkserver'``) or an already created context object.
+    """
+    if mp_context is None:
+        if hasattr(multiprocessing, 'get_context'):
+            return multiprocessing.get_context()
+        return multiprocessing
+    if isinstance(mp_context, six.string_types):
+        if not hasattr(multiprocessing, 'get_context'):
+            raise ValueError("Selecting a multiprocessing start method"
+                             " is not supported on this version of python")
+        return multiprocessing.get_context(mp_context)
+    return mp_context
+
+
+def get_start_method(context):
+    try:
+        return context.get_start_method()
+    except AttributeError:
+        return None
+
+
+class _ProcessSentinel(object):
+    """Stand-in for the sentinel of a process (that gets polled)."""
+
+    def __init__(self, process):
+        self.process = process
+
+    def poll(self):
+        return not self.process.is_alive()
+
+
+def _sentinel(process):
+    try:
+        return process.sentinel
+    except AttributeError:
+        # Python 2.7 processes have no sentinel (to wait on).
+        return _ProcessSentinel(process)
+
+
+# Bounds on how long to sleep between polls when waiting (on python 2.7);
+# the longest one is the worst case latency of noticing activity.
+_MIN_POLL_DELAY = 0.001
+_MAX_POLL_DELAY = 0.05
+
+
+def _poll_wait(waitables, timeout=None):
+    """Polls until any of the waitables is ready (or the timeout passes)."""
+    if timeout is not None:
+        ends_at = _utils.now() + timeout
+    delay = _MIN_POLL_DELAY
+    while True:
+        ready = [w for w in waitables if w.poll()]
+        if ready:
+            return ready
+        if timeout is None:
+            time.sleep(delay)
+        else:
+            remaining = ends_at - _utils.now()
+            if remaining <= 0:
+                return ready
+            time.sleep(min(delay, remaining))
+        delay = min(delay * 2, _MAX_POLL_DELAY)
+
+
+try:
+    _wait = mp_connection.wait
+except AttributeError:
+    # Python 2.7 has nothing to wait on many connections (and processes)
+    # with, so they get polled instead.
+    _wait = _poll_wait
+
+
+class _RemoteTraceback(Exception):
+    def __init__(self, tb):
+        super(_RemoteTraceback, self).__init__(tb)
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+
+def _rebuild_exc(exc, tb):
+    exc.__cause__ = _RemoteTraceback(tb)
+    return exc
+
+
+class _ExceptionWithTraceback(object):
+    """Pickles a child exception so that it keeps its (textual) traceback."""
+
+    def __init__(self, exc, tb):
+        tb = ''.join(traceback.format_exception(type(exc), exc, tb))
+        self.exc = exc
+        self.tb = '\n"""\n%s"""' % tb
+
+    def __reduce__(self):
+        return _rebuild_exc, (self.exc, self.tb)
+
+
+def _send_reply(conn, kind, work_id, value):
+    try:
+        conn.send((kind, work_id, value))
+    except (EOFError, OSError):
+        raise
+    except BaseException as e:
+        # Pickling failed (before anything was written), so send back
+        # something that can always be pickled instead.
+        exc_info = sys.exc_info()
+        try:
+            failure = _ExceptionWithTraceback(
+                RuntimeError("Unable to send %s back to parent: %r"
+                             % (kind, e)), exc_info[2])
+        finally:
+            del exc_info
+        conn.send((_FAILED, work_id, failure))
+
+
+def _worker_main(conn, preload_modules, statistics_path=None):
+    """Runs inside a child process, executing work sent by the parent."""
+    try:
+        for module_name in preload_modules:
+            importlib.import_module(module_name)
+        if statistics_path is not None:
+            statistics = _shared.SharedStatistics(statistics_path)
+        else:
+            statistics = None
+    except BaseException as e:
+        _send_reply(conn, _READY, None,
+                    _ExceptionWithTraceback(e, sys.exc_info()[2]))
+        return
+    _send_reply(conn, _READY, None, None)
+    # Callables registered by the parent (it decides what gets evicted).
+    callables = {}
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            # Parent went away, nothing left for us to do...
+            return
+        if not data:
+            return
+        message = _loads(data)
+        if message[0] != _WORK:
+            # Left over credit (or cancel) for a stream that has finished.
+            continue
+        _kind, work_id, fn_spec, evictions, payload, stream = message
+        started_at = _utils.now()
+        try:
+            fn, args, kwargs = _unpack_work(callables, fn_spec,
+                                            evictions, payload)
+            result = fn(*args, **kwargs)
+            if stream is not None:
+                result = _stream_results(conn, work_id, result, *stream)
+        except BaseException as e:
+            exc_info = sys.exc_info()
+            try:
+                failure = _ExceptionWithTraceback(e, exc_info[2])
+            finally:
+                del exc_info
+            if statistics is not None:
+                statistics.record(executed=1, failures=1,
+                                  runtime=_utils.now() - started_at)
+            _send_reply(conn, _FAILED, work_id, failure)
+            if isinstance(e, SystemExit):
+                return
+        else:
+            if statistics is not None:
+                statistics.record(executed=1,
+                                  runtime=_utils.now() - started_at)
+            _send_reply(conn, _RESULT, work_id, result)
+        finally:
+            # Avoid holding onto anything from the last piece of work while
+            # idle (and waiting for the next piece of work).
+            message = fn_spec = payload = None
+            fn = args = kwargs = result = None
+
+
+def _stream_results(conn, work_id, iterable, chunk_size, max_chunks):
+    """Sends the items of an iterable back to the parent in chunks.
+
+    At most ``max_chunks`` chunks are sent before the parent has to send
+    back a credit (which it does as chunks get consumed), this bounds how
+    much the parent buffers and blocks (and pauses) the producer when the
+    consumer falls behind.
+    """
+    produced = 0
+    outstanding = 0
+    chunk = []
+    error = None
+    iterator = iter(iterable)
+    try:
+        while True:
+            try:
+                chunk.append(next(iterator))
+            except StopIteration:
+                done = True
+            except Exception as e:
+                # Send back what was produced before it failed first.
+                done = True
+                error = e
+            else:
+                produced += 1
+                done = False
+            if chunk and (done or len(chunk) >= chunk_size):
+                while outstanding >= max_chunks or conn.poll():
+                    kind, credit_id = _loads(conn.recv_bytes())
+                    if credit_id != work_id:
+                        continue
+                    if kind == _CANCEL:
+                        return produced
+                    outstanding -= 1
+                # NOTE: any pickling failure fails the whole stream.
+                conn.send((_CHUNK, work_id, chunk))
+                outstanding += 1
+                chunk = []
+            if done:
+                if error is not None:
+                    raise error
+                return produced
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def _unpack_work(callables, fn_spec, evictions, payload):
+    for fid in evictions:
+        callables.pop(fid, None)
+    if fn_spec is None:
+        return _loads(payload)
+    fid, fn_payload = fn_spec
+    if fn_payload is not None:
+        callables[fid] = _loads(fn_payload)
+    args, kwargs = _loads(payload)
+    return callables[fid], args, kwargs
+
+
+def _dumps(obj):
+    return bytes(_ForkingPickler.dumps(obj))
+
+
+def _loads(data):
+    return _ForkingPickler.loads(data)
+
+
+class StreamWorkItem(_utils.WorkItem):
+    """Work item whose (iterable) result gets sent back in chunks."""
+
+    def __init__(self, future, fn, args, kwargs,
+                 stream, chunk_size, max_chunks):
+        super(StreamWorkItem, self).__init__(future, fn, args, kwargs)
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+
+
+class ProcessWorker(object):
+    """Parent side bookkeeping for a single child process."""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        # The (single) work item the child is currently running (if any).
+        self.work = None
+        # Ids of the registered callables the child has (least recently
+        # used first) and the id of the one sent along with ``work``.
+        self.callables = collections.OrderedDict()
+        self.registering = None
+        # Identifier the child knows the current work item by.
+        self.work_id = None
+
+    @property
+    def idle(self):
+        return self.ready and self.work is None
+
+    def close(self):
+        try:
+            self.conn.close()
+        finally:
+            self.process.join()
+
+
+class CallableRegistry(object):
+    """Pickles callables once and tracks which children already have them.
+
+    Callables are matched by equality (so bound methods of the same object
+    match each other); unhashable callables are never registered and just
+    get pickled along with the rest of each work item.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._ids = itertools.count()
+
+    def lookup(self, fn):
+        """Returns the ``(id, pickled callable)`` of a callable (or none)."""
+        try:
+            entry = self._entries.pop(fn)
+        except TypeError:
+            return None
+        except KeyError:
+            entry = (next(self._ids), _dumps(fn))
+        self._entries[fn] = entry
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def assign(self, worker, entry):
+        """Returns the callable spec and evictions to send to a worker."""
+        fid, fn_payload = entry
+        known = worker.callables
+        if fid in known:
+            known[fid] = known.pop(fid)
+            return (fid, None), ()
+        known[fid] = True
+        evictions = []
+        while len(known) > self.size:
+            evictions.append(known.popitem(last=False)[0])
+        worker.registering = fid
+        return (fid, fn_payload), tuple(evictions)
+
+
+class WorkerPool(object):
+    """Manages child processes and dispatches work items to them.
+
+    Work is queued in the parent and a single manager thread hands each
+    item to an idle child (one item in flight per child), collects replies
+    and replaces children that die.
+    """
+
+    #: How many seconds to wait for children to exit when shutting down.
+    JOIN_TIMEOUT = 5
+
+    #: How many seconds to wait before replacing children after one died
+    #: before it became ready (it doubles for each one that does so in a
+    #: row, up to the maximum).
+    RESPAWN_BACKOFF = 0.1
+    MAX_RESPAWN_BACKOFF = 30
+
+    def __init__(self, owner, max_workers, context,
+                 preload_modules=(), prestart=False,
+                 callable_cache_size=None, shared_statistics=None):
+        self._max_workers = max_workers
+        self._shared_statistics = shared_statistics
+        if callable_cache_size:
+            self._callables = CallableRegistry(callable_cache_size)
+        else:
+            self._callables = None
+        self._context = context
+        self._preload_modules = tuple(preload_modules)
+        self._keep_full = prestart
+        # Children that died (in a row) before becoming ready, and when
+        # children can be spawned again (because of that).
+        self._early_deaths = 0
+        self._respawn_at = None
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        # Credits and cancellations (for streams) to send to children.
+        self._control = collections.deque()
+        self._workers = []
+        self._work_ids = itertools.count()
+        self._shutdown = False
+        self._cancel_pending = False
+        self._manager = None
+        self._wakeup_reader, self._wakeup_writer = mp_connection.Pipe(
+            duplex=False)
+        self._wakeup_sent = False
+        self._closed = False
+        # When the owning executor gets garbage collected ensure this pool
+        # (and its children) gets shutdown as well.
+        self._owner_ref = weakref.ref(
+            owner, lambda _obj: self.shutdown(wait=False))
+        _pools.add(self)
+        if prestart:
+            # Spawn them right now (before the manager thread exists, which
+            # also avoids forking while that thread may hold locks).
+            for _i in range(0, max_workers):
+                self._spawn_worker()
+            self._ensure_manager()
+
+    @property
+    def workers(self):
+        """Snapshot of the currently alive child processes."""
+        return [w.process for w in list(self._workers)]
+
+    @property
+    def backlog(self):
+        """How many work items are waiting to be sent to a child."""
+        with self._lock:
+            return self._queued()
+
+    def put(self, work):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            self._pending.append(work)
+            self._ensure_manager()
+        self._wakeup()
+
+    def credit(self, stream):
+        """Lets the child producing the given stream send another chunk."""
+        self._put_control(_CREDIT, stream)
+
+    def cancel(self, stream):
+        """Asks the child producing the given stream to stop doing so."""
+        self._put_control(_CANCEL, stream)
+
+    def _put_control(self, kind, stream):
+        with self._lock:
+            if self._closed:
+                return
+            self._control.append((kind, stream))
+        self._wakeup()
+
+    def _send_control(self):
+        while True:
+            with self._lock:
+                if not self._control:
+                    return
+                kind, stream = self._control.popleft()
+            for worker in self._workers:
+                if getattr(worker.work, 'stream', None) is stream:
+                    try:
+                        worker.conn.send_bytes(
+                            _ForkingPickler.dumps((kind, worker.work_id)))
+                    except (EOFError, OSError):
+                        pass
+                    break
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        with self._lock:
+            self._shutdown = True
+            if cancel_pending:
+                self._cancel_pending = True
+            manager = self._manager
+        self._wakeup()
+        if wait and manager is not None:
+            manager.join()
+
+    def _ensure_manager(self):
+        if self._manager is None:
+            self._manager = threading.Thread(target=self._run,
+                                             name='futurist-process-manager')
+            self._manager.daemon = True
+            self._manager.start()
+
+    def _wakeup(self):
+        with self._lock:
+            if self._wakeup_sent or self._closed:
+                return
+            self._wakeup_sent = True
+            self._wakeup_writer.send_bytes(b'')
+
+    def _drain_wakeups(self):
+        # Both while locked, otherwise a wakeup sent in between would get
+        # drained while still being marked as sent (and from then on no
+        # wakeups would be sent anymore).
+        with self._lock:
+            while self._wakeup_reader.poll():
+                self._wakeup_reader.recv_bytes()
+            self._wakeup_sent = False
+
+    def _spawn_worker(self):
+        if self._shared_statistics is not None:
+            statistics_path = self._shared_statistics.path
+        else:
+            statistics_path = None
+        parent_conn, child_conn = self._context.Pipe(duplex=True)
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self._preload_modules,
+                                       statistics_path))
+        process.daemon = True
+        try:
+            process.start()
+        finally:
+            child_conn.close()
+        worker = ProcessWorker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    def _adjust_worker_count(self):
+        if self._shutdown:
+            return
+        if self._respawn_at is not None:
+            if _utils.now() < self._respawn_at:
+                return
+            self._respawn_at = None
+        if self._keep_full:
+            wanted = self._max_workers
+        else:
+            idle = sum(1 for w in self._workers if w.work is None)
+            with self._lock:
+                queued = self._queued()
+            wanted = min(self._max_workers,
+                         len(self._workers) - idle + queued)
+        while len(self._workers) < wanted:
+            try:
+                self._spawn_worker()
+            except Exception:
+                if not self._workers:
+                    # Nobody will ever run the pending work, so fail it.
+                    self._fail_pending(sys.exc_info())
+                return
+
+    def _queued(self):
+        """Returns how many items are queued (call with the lock held)."""
+        return len(self._pending)
+
+    def _take_queued(self):
+        """Removes (and returns) all queued items (call with the lock held)."""
+        pending = list(self._pending)
+        self._pending.clear()
+        return pending
+
+    def _fail_pending(self, exc_info):
+        with self._lock:
+            pending = self._take_queued()
+        for work in pending:
+            if work.future.set_running_or_notify_cancel():
+                work.fail(exc_info)
+
+    def _next_work(self, worker):
+        """Returns the next work item the given (idle) worker should run."""
+        with self._lock:
+            if self._pending:
+                return self._pending.popleft()
+        return None
+
+    def _send_work(self, worker, work):
+        if not work.future.set_running_or_notify_cancel():
+            if self._shared_statistics is not None:
+                self._shared_statistics.record(cancelled=1)
+            return
+        try:
+            entry = None
+            if self._callables is not None:
+                entry = self._callables.lookup(work.fn)
+            if entry is None:
+                payload = _dumps((work.fn, work.args, work.kwargs))
+            else:
+                payload = _dumps((work.args, work.kwargs))
+        except Exception:
+            work.fail()
+            return
+        fn_spec, evictions = None, ()
+        if entry is not None:
+            fn_spec, evictions = self._callables.assign(worker, entry)
+        if isinstance(work, StreamWorkItem):
+            stream = (work.chunk_size, work.max_chunks)
+        else:
+            stream = None
+        worker.work_id = next(self._work_ids)
+        data = _ForkingPickler.dumps((_WORK, worker.work_id, fn_spec,
+                                      evictions, payload, stream))
+        worker.work = work
+        try:
+            worker.conn.send_bytes(data)
+        except (EOFError, OSError):
+            # Its death will be noticed (and handled) by the manager.
+            pass
+
+    def _dispatch(self):
+        for worker in list(self._workers):
+            while worker.idle:
+                work = self._next_work(worker)
+                if work is None:
+                    break
+                self._send_work(worker, work)
+
+    def _on_reply(self, worker, reply):
+        kind, _work_id, value = reply
+        if kind == _READY:
+            if value is not None:
+                # Starting it up failed (likely a preload import problem),
+                # it exits (and is replaced, after a while) after this.
+                self._fail_pending((type(value), value, None))
+            else:
+                worker.ready = True
+                self._early_deaths = 0
+            return
+        if kind == _CHUNK:
+            # The child never sends more chunks than the stream has room
+            # for (so this will not block).
+            if worker.work is not None:
+                worker.work.stream.put_chunk(value)
+            return
+        work, worker.work = worker.work, None
+        registering, worker.registering = worker.registering, None
+        if work is None:
+            return
+        if kind == _FAILED and registering is not None:
+            # It may have failed to unpickle it, so send it again next time.
+            worker.callables.pop(registering, None)
+        if kind == _RESULT:
+            work.future.set_result(value)
+        else:
+            work.future.set_exception(value)
+
+    def _on_death(self, worker):
+        self._workers.remove(worker)
+        try:
+            worker.close()
+        finally:
+            work, worker.work = worker.work, None
+            if not worker.ready:
+                # Back off (instead of replacing it right away) so that
+                # children that keep dying while starting up do not get
+                # replaced in a tight loop.
+                self._early_deaths += 1
+                backoff = min(self.RESPAWN_BACKOFF *
+                              (2 ** (self._early_deaths - 1)),
+                              self.MAX_RESPAWN_BACKOFF)
+                self._respawn_at = _utils.now() + backoff
+            if work is not None:
+                work.future.set_exception(BrokenProcessPool(
+                    "A child process (pid %s) terminated abruptly with"
+                    " exit code %s while running a work item"
+                    % (worker.process.pid, worker.process.exitcode)))
+
+    def _should_exit(self):
+        if not self._shutdown:
+            return False
+        with self._lock:
+            if self._cancel_pending:
+                pending = self._take_queued()
+            else:
+                pending = []
+            queued = self._queued()
+        for work in pending:
+            work.future.cancel()
+        if queued:
+            return False
+        return all(w.work is None for w in self._workers)
+
+    def _wait_for_activity(self):
+        waitables = {self._wakeup_reader: None}
+        for worker in self._workers:
+            waitables[worker.conn] = worker
+            waitables[_sentinel(worker.process)] = worker
+        timeout = None
+        if self._respawn_at is not None:
+            # Wake up to replace the children that died.
+            timeout = max(0, self._respawn_at - _utils.now())
+        for ready in _wait(list(waitables), timeout):
+            if ready is self._wakeup_reader:
+                self._drain_wakeups()
+                continue
+            worker = waitables[ready]
+            if worker not in self._workers:
+                # Already handled (both its sentinel and its pipe became
+                # ready at the same time).
+                continue
+            if ready is worker.conn:
+                try:
+                    reply = worker.conn.recv()
+                except (EOFError, OSError):
+                    self._on_death(worker)
+                except Exception:
+                    work, worker.work = worker.work, None
+                    if work is not None:
+                        work.fail()
+                else:
+                    self._on_reply(worker, reply)
+            elif worker.conn.poll():
+                # Let any last reply be read first (on the next pass).
+                continue
+            else:
+                self._on_death(worker)
+
+    def _run(self):
+        try:
+            while True:
+                self._adjust_worker_count()
+                self._dispatch()
+                self._send_control()
+                if self._should_exit():
+                    break
+                self._wait_for_activity()
+        except BaseException:
+            # Nothing will be able to run anything anymore, so make sure
+            # nobody waits forever on work that will never complete.
+            with self._lock:
+                self._shutdown = True
+            exc_info = sys.exc_info()
+            try:
+                for worker in self._workers:
+                    work, worker.work = worker.work, None
+                    if work is not None:
+                        work.fail(exc_info)
+                self._fail_pending(exc_info)
+            finally:
+                del exc_info
+            raise
+        finally:
+            self._stop_workers()
+
+    def _stop_workers(self):
+        with self._lock:
+            self._closed = True
+        while self._workers:
+            worker = self._workers.pop()
+            try:
+                worker.conn.send_bytes(b'')
+            except (EOFError, OSError):
+                pass
+            worker.process.join(self.JOIN_TIMEOUT)
+            if worker.process.exitcode is None:
+                worker.process.terminate()
+            worker.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
+
+def _hash(value):
+    digest = hashlib.md5(six.b(str(value))).hexdigest()
+    return int(digest[0:16], 16)
+
+
+class _Slot(object):
+    """A position (and its queued work) that a child process occupies."""
+
+    def __init__(self, index):
+        self.index = index
+        self.worker = None
+        self.queue = collections.deque()
+        # Submissions routed here, how many of those went to the shared
+        # queue instead (this slot was saturated) and how many items any
+        # child in this slot has been sent.
+        self.routed = 0
+        self.overflowed = 0
+        self.dispatched = 0
+        # If a child in this slot has died (so whoever is in it now may be
+        # a replacement that is still starting up).
+        self.restarted = False
+
+
+class AffinityWorkerPool(WorkerPool):
+    """Worker pool that sends work with the same key to the same child.
+
+    Each child process occupies a slot that has its own queue; keys are
+    mapped onto slots using consistent hashing (so a child that dies and
+    gets replaced keeps the keys of the one it replaced). Work that has no
+    key (or whose slot is saturated, or has no child in it) goes onto a
+    shared queue that any child takes from once its own queue is empty.
+    """
+
+    #: How many points on the hash ring each slot gets.
+    REPLICAS = 64
+
+    def __init__(self, owner, max_workers, context,
+                 max_worker_backlog=None, **kwargs):
+        self._max_worker_backlog = max_worker_backlog
+        self._slots = [_Slot(i) for i in range(0, max_workers)]
+        ring = sorted((_hash("%s-%s" % (slot.index, replica)), slot.index)
+                      for slot in self._slots
+                      for replica in range(0, self.REPLICAS))
+        self._ring_hashes = [h for h, _index in ring]
+        self._ring_slots = [index for _h, index in ring]
+        kwargs['prestart'] = True
+        super(AffinityWorkerPool, self).__init__(owner, max_workers,
+                                                 context, **kwargs)
+
+    @property
+    def statistics(self):
+        """List of :py:class:`.WorkerStatistics` (one per slot)."""
+        with self._lock:
+            return [
+                WorkerStatistics(
+                    pid=(slot.worker.process.pid
+                         if slot.worker is not None else None),
+                    backlog=len(slot.queue), routed=slot.routed,
+                    overflowed=slot.overflowed, dispatched=slot.dispatched)
+                for slot in self._slots
+            ]
+
+    def locate(self, key):
+        """Returns the index of the slot that the given key maps to."""
+        point = bisect.bisect(self._ring_hashes, _hash(hash(key)))
+        return self._ring_slots[point % len(self._ring_slots)]
+
+    def put_with_key(self, work, key):
+        slot = self._slots[self.locate(key)]
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Can not schedule new futures'
+                                   ' after being shutdown')
+            slot.routed += 1
+            if (slot.worker is None or
+                    (slot.restarted and not slot.worker.ready) or
+                    (self._max_worker_backlog is not None and
+                     len(slot.queue) >= self._max_worker_backlog)):
+                slot.overflowed += 1
+                self._pending.append(work)
+            else:
+                slot.queue.append(work)
+            self._ensure_manager()
+        self._wakeup()
+
+    def _spawn_worker(self):
+        free = [slot for slot in self._slots if slot.worker is None]
+        # Prefer the slots that have work waiting for them.
+        free.sort(key=lambda slot: not slot.queue)
+        worker = super(AffinityWorkerPool, self)._spawn_worker()
+        worker.slot = free[0]
+        # Only ever changed while locked (so that what is put and the
+        # statistics see a consistent slot).
+        with self._lock:
+            worker.slot.worker = worker
+        return worker
+
+    def _on_death(self, worker):
+        try:
+            super(AffinityWorkerPool, self)._on_death(worker)
+        finally:
+            slot = worker.slot
+            # Until it gets replaced (and the replacement is ready) any
+            # child can run what was queued for it (ahead of what was
+            # queued after it).
+            with self._lock:
+                slot.worker = None
+                slot.restarted = True
+                slot.overflowed += len(slot.queue)
+                self._pending.extendleft(reversed(slot.queue))
+                slot.queue.clear()
+
+    def _queued(self):
+        return (super(AffinityWorkerPool, self)._queued() +
+                sum(len(slot.queue) for slot in self._slots))
+
+    def _take_queued(self):
+        pending = super(AffinityWorkerPool, self)._take_queued()
+        for slot in self._slots:
+            pending.extend(slot.queue)
+            slot.queue.clear()
+        return pending
+
+    def _next_work(self, worker):
+        slot = worker.slot
+        with self._lock:
+            if slot.queue:
+                work = slot.queue.popleft()
+            elif self._pending:
+                work = self._pending.popleft()
+            else:
+                return None
+            slot.dispatched += 1
+            return work
+
+
+def _clean_up():
+    """Ensure all process pools that were created are shutdown cleanly."""
+    for pool in list(_pools):
+        pool.shutdown(wait=True, cancel_pending=True)
+
+
+atexit.register(_clean_up)
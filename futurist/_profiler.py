@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import logging
+import sys
+import threading
+
+from futurist import _utils
+from futurist import _watchdog
+
+LOG = logging.getLogger(__name__)
+
+# Frames (of the code that runs work items) that the stacks of the work are
+# found under, and frames (that wrap the submitted callables) that are
+# skipped when looking for the submitted callable.
+_RUN_CODE = _utils.WorkItem.run.__code__
+_SKIP_CODES = frozenset([_watchdog.Watchdog.call.__code__])
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    module = frame.f_globals.get('__name__')
+    if module:
+        return "%s.%s" % (module, name)
+    return name
+
+
+def _worker_threads(executor):
+    # Wrapping executors (that do not have workers of their own) expose
+    # the executor they wrap.
+    while not hasattr(executor, '_workers') and hasattr(executor,
+                                                        'executor'):
+        executor = executor.executor
+    try:
+        return list(executor._workers)
+    except AttributeError:
+        raise ValueError("Executor %r does not run work in (native) worker"
+                         " threads that can be sampled" % (executor,))
+
+
+class SamplingProfiler(object):
+    """Samples the stacks of the worker threads of an executor.
+
+    While started a (single) sampling thread periodically captures the
+    stacks of the worker threads of the executor (and only of those), and
+    counts the stacks of the work that they are running (starting at the
+    submitted callable, so the stacks are grouped by it); idle workers are
+    not counted. The counts can be output in the collapsed stack format
+    that flamegraph tools take.
+
+    NOTE: stacks are captured using :py:func:`sys._current_frames`, which
+    only knows about (native) threads, so only executors with worker
+    threads (like the :py:class:`.ThreadPoolExecutor`) can be sampled.
+    """
+
+    def __init__(self, executor, interval=0.01):
+        """Initializes a sampling profiler.
+
+        :param executor: executor whose worker threads get sampled
+        :param interval: seconds between samples
+        :type interval: number
+        """
+        if interval <= 0:
+            raise ValueError("Interval must be greater than zero")
+        # Fail early (the workers themselves get looked up on each sample,
+        # since they get started as work is submitted).
+        _worker_threads(executor)
+        self._executor = executor
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._stacks = collections.Counter()
+        self._samples = 0
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def samples(self):
+        """How many times the worker threads have been sampled."""
+        return self._samples
+
+    @property
+    def running(self):
+        """If it is currently sampling."""
+        return self._thread is not None
+
+    def start(self):
+        """Starts sampling (in a new sampling thread)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name='futurist-profiler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stops sampling (the counted stacks are kept)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def reset(self):
+        """Forgets the counted stacks."""
+        with self._lock:
+            self._stacks.clear()
+            self._samples = 0
+
+    def _sample(self):
+        idents = [t.ident for t in _worker_threads(self._executor)]
+        frames = sys._current_frames()
+        frame = None
+        stacks = []
+        try:
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    if frame.f_code is _RUN_CODE:
+                        break
+                    if frame.f_code not in _SKIP_CODES:
+                        stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if frame is not None and stack:
+                    # Walked up from the innermost frame (to the one running
+                    # the work item), so reverse it (to start at the
+                    # callable).
+                    stack.reverse()
+                    stacks.append(tuple(stack))
+        finally:
+            del frames, frame
+        with self._lock:
+            self._samples += 1
+            self._stacks.update(stacks)
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._sample()
+            except Exception:
+                LOG.exception("Failed sampling the worker threads of %r",
+                              self._executor)
+
+    def callback_samples(self):
+        """Counts of the samples (keyed by the submitted callable name).
+
+        :rtype: dict
+        """
+        counts = collections.Counter()
+        with self._lock:
+            for stack, count in self._stacks.items():
+                counts[stack[0]] += count
+        return dict(counts)
+
+    def collapsed(self):
+        """Counted stacks in the collapsed stack (flamegraph) format.
+
+        Each line is a stack (its frames separated by semicolons, starting
+        at the submitted callable) followed by a space and how many times it
+        was sampled.
+
+        :rtype: string
+        """
+        with self._lock:
+            lines = ["%s %s" % (";".join(stack), count)
+                     for stack, count in self._stacks.items()]
+        lines.sort()
+        return "".join(line + "\n" for line in lines)
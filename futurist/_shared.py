@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import contextlib
+import errno
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from futurist import _utils
+
+#: Named tuple of the statistics a single process has recorded.
+ProcessStatistics = collections.namedtuple(
+    'ProcessStatistics',
+    'pid executed failures cancelled runtime cpu_time max_rss')
+
+_MAGIC = b'FUTSTAT1'
+# Magic, slot count (then padding up to a full slot).
+_HEADER = struct.Struct('8sq48x')
+# Sequence (odd while being written), pid, executed, failures, cancelled,
+# runtime (ns), cpu time (ns), max rss (kb).
+_SLOT = struct.Struct('8q')
+_SEQ = struct.Struct('q')
+# What comes after the sequence (so it can be written before the sequence
+# is made even again).
+_DATA = struct.Struct('7q')
+_EMPTY = (0,) * 8
+
+# How many times a read that overlaps a write is retried (before waiting
+# for the write to finish, or finding that the writer died while writing).
+_MAX_READ_ATTEMPTS = 10000
+
+# How long (in seconds) a read waits for a (live) writer to finish writing.
+_MAX_READ_WAIT = 5.0
+
+# Slot (right after the header) that accumulates the counts of processes
+# that have exited (so that their slots can be reused).
+_RETIRED = 0
+_RETIRED_PID = -1
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+class SharedStatistics(object):
+    """Execution statistics shared between processes (via a mapped file).
+
+    Each process that records into it gets its own slot in the file that
+    only it writes to (readers retry reads that overlap a write, so no
+    locks are taken when recording or reading); the file is only locked
+    when a process claims a slot. Slots of processes that have exited get
+    folded into a shared total (so nothing they recorded is lost) and get
+    reused.
+
+    Any number of (unrelated) processes can use the same file, for example
+    the processes of a pre-forking server (and each of their process pool
+    children) to get statistics across all of them.
+
+    NOTE: processes are told apart (and found to have exited) by their pid,
+    so if the pid of a process that exited gets reused (by a process that
+    does not record into the file) before its slot was reused, its slot
+    (and what it recorded, which still counts in the totals) is kept until
+    that process exits too.
+    """
+
+    def __init__(self, path, slots=256):
+        """Opens (and if needed creates) a shared statistics file.
+
+        :param path: file to share the statistics through
+        :type path: string
+        :param slots: how many processes can be recording at the same time
+                      (only used when the file gets created)
+        :type slots: int
+        """
+        if fcntl is None:
+            raise RuntimeError("Shared statistics are not supported on"
+                               " this platform")
+        if slots <= 1:
+            raise ValueError("Slots must be greater than one")
+        self._path = path
+        self._write_lock = threading.Lock()
+        self._slot = None
+        self._open(slots)
+
+    def _open(self, slots):
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._file_locked(fd):
+                if os.fstat(fd).st_size < _HEADER.size:
+                    os.ftruncate(fd, _HEADER.size + slots * _SLOT.size)
+                    os.write(fd, _HEADER.pack(_MAGIC, slots))
+                # Not os.pread (python 2.7 does not have it).
+                os.lseek(fd, 0, os.SEEK_SET)
+                header = os.read(fd, _HEADER.size)
+                magic, self._slots = _HEADER.unpack(header)
+                if magic != _MAGIC:
+                    raise ValueError("File %r does not contain shared"
+                                     " statistics" % self._path)
+            self._map = mmap.mmap(fd, _HEADER.size +
+                                  self._slots * _SLOT.size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._pid = os.getpid()
+
+    @property
+    def path(self):
+        """The file these statistics are shared through."""
+        return self._path
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _file_locked(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _offset(self, slot):
+        return _HEADER.size + slot * _SLOT.size
+
+    def _try_read_slot(self, offset):
+        (seq,) = _SEQ.unpack_from(self._map, offset)
+        if seq % 2 != 0:
+            return None
+        data = _DATA.unpack_from(self._map, offset + _SEQ.size)
+        (after_seq,) = _SEQ.unpack_from(self._map, offset)
+        if after_seq != seq:
+            return None
+        return (seq,) + data
+
+    def _read_slot(self, slot, locked=False):
+        offset = self._offset(slot)
+        for _i in range(0, _MAX_READ_ATTEMPTS):
+            values = self._try_read_slot(offset)
+            if values is not None:
+                return values
+        if not locked:
+            # Slots are claimed (and emptied) while the file is locked, so
+            # this waits out any of those writes.
+            with self._file_locked(self._fd):
+                return self._read_slot(slot, locked=True)
+        # Still being written, so the process that owns the slot is writing
+        # it (or it died while writing it, in which case what is in it is
+        # torn and can not be read).
+        started_at = _utils.now()
+        while True:
+            (pid,) = _SEQ.unpack_from(self._map, offset + _SEQ.size)
+            if pid <= 0 or not _pid_alive(pid):
+                return None
+            if _utils.now() - started_at > _MAX_READ_WAIT:
+                raise RuntimeError("Slot %s of %r has been being written"
+                                   " (by process %s) for more than %s"
+                                   " seconds" % (slot, self._path, pid,
+                                                 _MAX_READ_WAIT))
+            time.sleep(0.001)
+            values = self._try_read_slot(offset)
+            if values is not None:
+                return values
+
+    def _write_slot(self, slot, values):
+        # The sequence is odd while a write is happening (so that readers
+        # know to retry) and is only made even (by its own store) after
+        # everything else was written.
+        offset = self._offset(slot)
+        (seq,) = _SEQ.unpack_from(self._map, offset)
+        if seq % 2 == 0:
+            seq += 1
+        _SEQ.pack_into(self._map, offset, seq)
+        _DATA.pack_into(self._map, offset + _SEQ.size, *values[1:])
+        _SEQ.pack_into(self._map, offset, seq + 1)
+
+    def _claim_slot(self):
+        pid = os.getpid()
+        with self._file_locked(self._fd):
+            free = None
+            retired = self._read_slot(_RETIRED, locked=True)
+            if retired is None:
+                # Torn by a process that died while folding into it.
+                retired = _EMPTY
+            retired = list(retired)
+            retired[1] = _RETIRED_PID
+            for slot in range(_RETIRED + 1, self._slots):
+                values = self._read_slot(slot, locked=True)
+                if values is None:
+                    # Its process died while writing it, so what it
+                    # recorded (since it is torn) gets dropped.
+                    self._write_slot(slot, _EMPTY)
+                    values = _EMPTY
+                slot_pid = values[1]
+                if slot_pid and slot_pid != pid and _pid_alive(slot_pid):
+                    continue
+                if slot_pid:
+                    # Fold what it recorded into the total of exited
+                    # processes (only counters carry over).
+                    for i in (2, 3, 4, 5, 6):
+                        retired[i] += values[i]
+                    self._write_slot(slot, _EMPTY)
+                if free is None:
+                    free = slot
+            self._write_slot(_RETIRED, retired)
+            if free is None:
+                raise RuntimeError("No free slot for process %s in %r"
+                                   % (pid, self._path))
+            self._write_slot(free, (0, pid, 0, 0, 0, 0, 0, 0))
+        self._slot = free
+        return free
+
+    def record(self, executed=0, failures=0, cancelled=0, runtime=0.0):
+        """Adds to the statistics of the current process.
+
+        :param runtime: seconds spent executing (in this process)
+        :type runtime: float
+        """
+        with self._write_lock:
+            if self._pid != os.getpid():
+                # Forked, the file lock would be shared with the parent
+                # (and so would its slot) unless the file is reopened.
+                self.close()
+                self._open(self._slots)
+                self._slot = None
+            slot = self._slot
+            if slot is None:
+                slot = self._claim_slot()
+            values = self._read_slot(slot)
+            cpu_time = sum(os.times()[0:2])
+            if resource is not None:
+                max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            else:
+                max_rss = 0
+            self._write_slot(slot, (
+                values[0], values[1], values[2] + executed,
+                values[3] + failures, values[4] + cancelled,
+                values[5] + int(runtime * 1e9), int(cpu_time * 1e9),
+                max_rss))
+
+    def processes(self):
+        """Statistics of each process that currently has a slot.
+
+        :returns: a list of ``ProcessStatistics`` named tuples (with fields
+                  ``pid``, ``executed``, ``failures``, ``cancelled``,
+                  ``runtime``, ``cpu_time`` and ``max_rss``)
+        :rtype: list
+        """
+        found = []
+        for slot in range(_RETIRED + 1, self._slots):
+            values = self._read_slot(slot)
+            if values is not None and values[1]:
+                found.append(ProcessStatistics(
+                    pid=values[1], executed=values[2], failures=values[3],
+                    cancelled=values[4], runtime=values[5] / 1e9,
+                    cpu_time=values[6] / 1e9, max_rss=values[7]))
+        return found
+
+    def totals(self):
+        """Totals of all processes (including exited ones) merged together.
+
+        :returns: dictionary with ``failures``, ``executed``, ``runtime``
+                  and ``cancelled`` keys
+        :rtype: dict
+        """
+        totals = [0, 0, 0, 0]
+        for slot in range(_RETIRED, self._slots):
+            values = self._read_slot(slot)
+            if values is None:
+                continue
+            for i in range(0, 4):
+                totals[i] += values[i + 2]
+        executed, failures, cancelled, runtime = totals
+        return {'failures': failures, 'executed': executed,
+                'runtime': runtime / 1e9, 'cancelled': cancelled}
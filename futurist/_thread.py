@@ -13,6 +13,7 @@
 #    under the License.
 
 import atexit
+import collections
 import sys
 import threading
 import weakref
@@ -20,6 +21,8 @@ import weakref
 import six
 from six.moves import queue as compat_queue
 
+from futurist import _utils
+
 
 class Threading(object):
 
@@ -126,6 +129,334 @@ class ThreadWorker(threading.Thread):
                 del work
 
 
+class HelpingWorkItem(_utils.WorkItem):
+    """Work item that whoever waits on it can run (if nobody has yet)."""
+
+    def __init__(self, future, fn, args, kwargs, work_queue):
+        super(HelpingWorkItem, self).__init__(future, fn, args, kwargs)
+        self.work_queue = work_queue
+        self._claim_lock = threading.Lock()
+        self._claimed = False
+
+    def _claim(self):
+        with self._claim_lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+    def run(self):
+        if self._claim():
+            super(HelpingWorkItem, self).run()
+
+    def help(self):
+        """Runs it (inline) when waited on from a worker of its queue.
+
+        Only the awaited item itself is run (and only if no worker has
+        started it yet), so the stack only grows as deep as work is nested.
+        """
+        worker = threading.current_thread()
+        if (getattr(worker, 'work_queue', None) is self.work_queue and
+                self._claim()):
+            # So that it is no longer counted as backlog (a worker that
+            # took it already would find it claimed and skip it).
+            self.work_queue.discard(self)
+            super(HelpingWorkItem, self).run()
+
+
+class WorkQueue(compat_queue.Queue):
+    """Work queue (for thread workers) that queued work can be taken from."""
+
+    def discard(self, work):
+        with self.mutex:
+            try:
+                self.queue.remove(work)
+            except ValueError:
+                pass
+            else:
+                self.not_full.notify()
+
+
+class _Lane(object):
+    __slots__ = ['name', 'min_workers', 'max_workers', 'backlog', 'running']
+
+    def __init__(self, name, min_workers, max_workers):
+        self.name = name
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.backlog = collections.deque()
+        self.running = 0
+
+
+class LaneWorkItem(_utils.WorkItem):
+    """Work item (of a lane) that tells its queue when it has finished."""
+
+    def __init__(self, future, fn, args, kwargs, lane, work_queue):
+        super(LaneWorkItem, self).__init__(future, fn, args, kwargs)
+        self.lane = lane
+        self.work_queue = work_queue
+
+    def run(self):
+        try:
+            super(LaneWorkItem, self).run()
+        finally:
+            self.work_queue.finished(self.lane)
+
+
+class LaneWorkQueue(object):
+    """Work queue (for thread workers) that hands out work from lanes.
+
+    Work is handed out from lanes that are below their minimum number of
+    workers first (the lane that is the furthest below it first), then
+    from the other lanes (in turns) that are below their maximum number of
+    workers. The workers that lanes below their minimum have reserved (but
+    are not using) are never handed out to other lanes.
+    """
+
+    def __init__(self, max_workers):
+        self._max_workers = max_workers
+        self._cond = threading.Condition()
+        self._lanes = collections.OrderedDict()
+        self._tombstones = 0
+        self._turn = 0
+
+    def add_lane(self, name, min_workers, max_workers):
+        with self._cond:
+            self._lanes[name] = _Lane(name, min_workers, max_workers)
+
+    def qsize(self, lane=None):
+        with self._cond:
+            if lane is not None:
+                return len(self._lanes[lane].backlog)
+            return sum(len(lane.backlog) for lane in self._lanes.values())
+
+    def running(self, lane):
+        with self._cond:
+            return self._lanes[lane].running
+
+    def put(self, work):
+        with self._cond:
+            if work is _TOMBSTONE:
+                self._tombstones += 1
+            else:
+                self._lanes[work.lane].backlog.append(work)
+            self._cond.notify()
+
+    def _pick(self):
+        lanes = list(self._lanes.values())
+        if not lanes:
+            return None
+        best = None
+        for lane in lanes:
+            deficit = lane.min_workers - lane.running
+            if (lane.backlog and deficit > 0 and
+                    (best is None or
+                     deficit > best.min_workers - best.running)):
+                best = lane
+        if best is not None:
+            return best
+        # Lanes that have work are at (or above) their minimum now, so what
+        # is left (for lanes to borrow) is what is not running or reserved.
+        unreserved = self._max_workers - sum(
+            max(lane.running, lane.min_workers) for lane in lanes)
+        if unreserved <= 0:
+            return None
+        for i in range(0, len(lanes)):
+            lane = lanes[(self._turn + i) % len(lanes)]
+            if lane.backlog and lane.running < lane.max_workers:
+                self._turn = (self._turn + i + 1) % len(lanes)
+                return lane
+        return None
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if timeout is not None:
+                ends_at = _utils.now() + timeout
+            while True:
+                lane = self._pick()
+                if lane is not None:
+                    lane.running += 1
+                    return lane.backlog.popleft()
+                # Like a normal queue, tombstones come after any queued work.
+                if self._tombstones and not any(
+                        lane.backlog for lane in self._lanes.values()):
+                    self._tombstones -= 1
+                    return _TOMBSTONE
+                if not block:
+                    raise compat_queue.Empty()
+                if timeout is None:
+                    self._cond.wait()
+                else:
+                    remaining = ends_at - _utils.now()
+                    if remaining <= 0:
+                        raise compat_queue.Empty()
+                    self._cond.wait(remaining)
+
+    def finished(self, lane):
+        with self._cond:
+            self._lanes[lane].running -= 1
+            # Some lane (that was at its maximum) may be able to go now.
+            self._cond.notify()
+
+
+class _Tenant(object):
+    __slots__ = ['name', 'weight', 'added', 'backlog', 'deficit',
+                 'dispatched', 'wait_time', 'max_wait_time']
+
+    def __init__(self, name, weight, added=True):
+        self.name = name
+        self.weight = weight
+        self.added = added
+        self.backlog = collections.deque()
+        self.deficit = 0.0
+        self.dispatched = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+
+class FairWorkQueue(object):
+    """Work queue (for thread workers) that is fair across tenants.
+
+    Each tenant has its own backlog, which are taken from using deficit
+    round robin (each turn a tenant gets to hand out as many work items as
+    its weight, fractions of it carry over to its next turn). Tenants that
+    were not added are only kept while they have work queued (so that lots
+    of short lived tenants do not pile up); once they have none left only
+    their statistics are kept (for the most recent of them).
+    """
+
+    #: How many tenants (that were not added) statistics are kept of once
+    #: they have nothing queued anymore.
+    MAX_RETIRED = 256
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._tenants = {}
+        self._retired = collections.OrderedDict()
+        self._active = collections.deque()
+        self._tombstones = 0
+
+    def _new_tenant(self, name, weight, added=True):
+        tenant = self._tenants[name] = _Tenant(name, weight, added=added)
+        try:
+            (tenant.dispatched, tenant.wait_time,
+             tenant.max_wait_time) = self._retired.pop(name)
+        except KeyError:
+            pass
+        return tenant
+
+    def add_tenant(self, name, weight=1):
+        with self._cond:
+            tenant = self._tenants.get(name)
+            if tenant is None:
+                self._new_tenant(name, weight)
+            else:
+                tenant.weight = weight
+                tenant.added = True
+
+    def qsize(self, tenant=None):
+        with self._cond:
+            if tenant is not None:
+                try:
+                    return len(self._tenants[tenant].backlog)
+                except KeyError:
+                    return 0
+            return sum(len(tenant.backlog)
+                       for tenant in self._tenants.values())
+
+    def statistics(self):
+        with self._cond:
+            statistics = [(tenant.name, tenant.dispatched, len(tenant.backlog),
+                           tenant.wait_time, tenant.max_wait_time)
+                          for tenant in self._tenants.values()]
+            statistics.extend((name, dispatched, 0, wait_time, max_wait_time)
+                              for (name, (dispatched, wait_time,
+                                          max_wait_time))
+                              in self._retired.items())
+            return statistics
+
+    def put(self, work):
+        if work is _TOMBSTONE:
+            with self._cond:
+                self._tombstones += 1
+                self._cond.notify()
+        else:
+            self.put_for(None, work)
+
+    def put_for(self, name, work):
+        with self._cond:
+            try:
+                tenant = self._tenants[name]
+            except KeyError:
+                tenant = self._new_tenant(name, 1, added=False)
+            if not tenant.backlog:
+                self._active.append(tenant)
+            tenant.backlog.append((_utils.now(), work))
+            self._cond.notify()
+
+    def discard(self, work):
+        with self._cond:
+            for tenant in self._active:
+                for entry in tenant.backlog:
+                    if entry[1] is work:
+                        tenant.backlog.remove(entry)
+                        if not tenant.backlog:
+                            self._retire(tenant)
+                        return
+
+    def _retire(self, tenant):
+        # Idle tenants do not get to save up (unused) turns.
+        tenant.deficit = 0.0
+        self._active.remove(tenant)
+        if not tenant.added:
+            del self._tenants[tenant.name]
+            self._retired[tenant.name] = (tenant.dispatched, tenant.wait_time,
+                                          tenant.max_wait_time)
+            while len(self._retired) > self.MAX_RETIRED:
+                self._retired.popitem(last=False)
+
+    def _take(self):
+        while True:
+            tenant = self._active[0]
+            if tenant.deficit < 1:
+                tenant.deficit += tenant.weight
+                if tenant.deficit < 1:
+                    self._active.rotate(-1)
+                    continue
+            enqueued_at, work = tenant.backlog.popleft()
+            waited = _utils.now() - enqueued_at
+            tenant.dispatched += 1
+            tenant.wait_time += waited
+            tenant.max_wait_time = max(tenant.max_wait_time, waited)
+            tenant.deficit -= 1
+            if not tenant.backlog:
+                self._retire(tenant)
+            elif tenant.deficit < 1:
+                self._active.rotate(-1)
+            return work
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if timeout is not None:
+                ends_at = _utils.now() + timeout
+            while True:
+                if self._active:
+                    return self._take()
+                # Like a normal queue, tombstones come after any queued work.
+                if self._tombstones:
+                    self._tombstones -= 1
+                    return _TOMBSTONE
+                if not block:
+                    raise compat_queue.Empty()
+                if timeout is None:
+                    self._cond.wait()
+                else:
+                    remaining = ends_at - _utils.now()
+                    if remaining <= 0:
+                        raise compat_queue.Empty()
+                    self._cond.wait(remaining)
+
+
 def _clean_up():
     """Ensure all threads that were created were destroyed cleanly."""
     global _dying
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import heapq
+import itertools
+import logging
+import threading
+
+from futurist import _green
+from futurist import _utils
+
+LOG = logging.getLogger(__name__)
+
+
+class TimerHandle(object):
+    """Handle to a scheduled call (that can be used to cancel it)."""
+
+    __slots__ = ['deadline', 'callback', 'args', 'cancelled', 'fired',
+                 '_timer']
+
+    def __init__(self, timer, deadline, callback, args):
+        self._timer = timer
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        # Popped from the heap (because it came due).
+        self.fired = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self._timer._cancel(self)
+
+
+class _GreenTimerHandle(object):
+    __slots__ = ['_green_thread']
+
+    def __init__(self, green_thread):
+        self._green_thread = green_thread
+
+    def cancel(self):
+        self._green_thread.cancel()
+
+
+class Timer(object):
+    """Runs callbacks after delays (using a heap and a single thread).
+
+    Cancelled calls are left in the heap (and skipped when they come due)
+    unless more than half of the heap is cancelled calls, in which case
+    the heap gets rebuilt without them.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._cancelled_count = 0
+        self._thread = None
+
+    def call_later(self, delay, callback, *args):
+        """Calls a callback (in the timer thread) after a delay."""
+        handle = TimerHandle(self, _utils.now() + max(0.0, delay),
+                             callback, args)
+        with self._cond:
+            heapq.heappush(self._heap,
+                           (handle.deadline, next(self._counter), handle))
+            if self._thread is None or not self._thread.is_alive():
+                # Not started yet (or this is a forked child, where the
+                # thread does not exist anymore).
+                self._thread = threading.Thread(target=self._run,
+                                                name='futurist-timer')
+                self._thread.daemon = True
+                self._thread.start()
+            elif self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+
+    def _cancel(self, handle):
+        with self._cond:
+            if handle.cancelled:
+                return
+            handle.cancelled = True
+            # Drop references (the entry itself stays in the heap until it
+            # is popped, cancelling is lazy).
+            handle.callback = None
+            handle.args = None
+            if handle.fired:
+                # Not in the heap anymore (so nothing to clean up).
+                return
+            self._cancelled_count += 1
+            if self._cancelled_count * 2 > len(self._heap):
+                self._heap = [entry for entry in self._heap
+                              if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled_count = 0
+
+    def _pop_due(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled_count -= 1
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - _utils.now()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                handle = heapq.heappop(self._heap)[2]
+                handle.fired = True
+                return handle
+
+    def _run(self):
+        while True:
+            handle = self._pop_due()
+            callback, args = handle.callback, handle.args
+            if callback is None:
+                continue
+            try:
+                callback(*args)
+            except Exception:
+                LOG.exception("Timer callback %r failed",
+                              _utils.get_callback_name(callback))
+            finally:
+                del callback, args, handle
+
+
+_timer = Timer()
+
+
+def call_later(delay, callback, *args, **kwargs):
+    """Calls a callback after a delay (returns a handle that can cancel it).
+
+    :param green: use a green thread to make the call (instead of the
+                  shared timer thread)
+    :type green: bool
+    """
+    if kwargs.pop('green', False):
+        return _GreenTimerHandle(_green.spawn_after(delay, callback, *args))
+    return _timer.call_later(delay, callback, *args)
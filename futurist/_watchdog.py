@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import functools
+import itertools
+import logging
+import sys
+import threading
+import traceback
+
+from futurist import _utils
+
+LOG = logging.getLogger(__name__)
+
+#: Named tuple of what a watchdog reports about work that is stuck.
+StuckWork = collections.namedtuple(
+    'StuckWork', 'name elapsed thread_name stack')
+
+
+def _log_stuck(stuck):
+    LOG.warning("Work '%s' has been running for %0.2f seconds (in thread"
+                " '%s'):\n%s", stuck.name, stuck.elapsed, stuck.thread_name,
+                stuck.stack)
+
+
+class Watchdog(object):
+    """Reports work that has been running (stuck) for too long.
+
+    Work gets watched by wrapping the callable that runs it (executors that
+    accept a watchdog do this for all submitted work); a (single) watchdog
+    thread periodically looks at what is running and, once some work has
+    been running past the threshold, captures the stack of the thread
+    running it and reports it (once) to the ``on_stuck`` hook.
+
+    Watching work costs two dictionary operations (the watchdog thread only
+    wakes up every so often), so it can be left enabled.
+
+    NOTE: stacks are captured using :py:func:`sys._current_frames`, which
+    only knows about (native) threads, not green threads.
+    """
+
+    def __init__(self, threshold, on_stuck=None, check_every=None):
+        """Initializes a watchdog.
+
+        :param threshold: seconds that work can run for before it is
+                          considered stuck
+        :type threshold: number
+        :param on_stuck: callable that is called with a
+                         :py:class:`.StuckWork` for each stuck work (by
+                         default it gets logged as a warning)
+        :type on_stuck: callable
+        :param check_every: seconds between checks (defaults to half of
+                            the threshold)
+        :type check_every: number
+        """
+        if threshold <= 0:
+            raise ValueError("Threshold must be greater than zero")
+        if check_every is None:
+            check_every = threshold / 2.0
+        if check_every <= 0:
+            raise ValueError("Check every must be greater than zero")
+        self._threshold = threshold
+        self._check_every = check_every
+        self._on_stuck = on_stuck or _log_stuck
+        self._running = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def threshold(self):
+        """Seconds that work can run for before it is considered stuck."""
+        return self._threshold
+
+    def _ensure_started(self):
+        # Not started yet (or this is a forked child, where the thread does
+        # not exist anymore).
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopped.clear()
+                    self._thread = threading.Thread(
+                        target=self._run, name='futurist-watchdog')
+                    self._thread.daemon = True
+                    self._thread.start()
+
+    def stop(self):
+        """Stops the watchdog thread (it gets started again when needed)."""
+        self._stopped.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _check(self):
+        now = _utils.now()
+        stuck = []
+        with self._lock:
+            for token, entry in self._running.items():
+                started_at, ident, name, reported = entry
+                if not reported and now - started_at >= self._threshold:
+                    self._running[token] = (started_at, ident, name, True)
+                    stuck.append((now - started_at, ident, name))
+        if not stuck:
+            return
+        frames = sys._current_frames()
+        threads = dict((t.ident, t.name) for t in threading.enumerate())
+        for elapsed, ident, name in stuck:
+            frame = frames.get(ident)
+            if frame is None:
+                stack = ''
+            else:
+                stack = ''.join(traceback.format_stack(frame))
+            del frame
+            try:
+                self._on_stuck(StuckWork(name, elapsed,
+                                         threads.get(ident), stack))
+            except Exception:
+                LOG.exception("Failed reporting stuck work '%s'", name)
+        del frames
+
+    def _run(self):
+        while not self._stopped.wait(self._check_every):
+            self._check()
+
+    def call(self, name, fn, *args, **kwargs):
+        """Calls a callable (in this thread) while watching it."""
+        self._ensure_started()
+        token = next(self._counter)
+        with self._lock:
+            self._running[token] = (_utils.now(),
+                                    threading.current_thread().ident,
+                                    name, False)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                del self._running[token]
+
+    def wrap(self, fn, name=None):
+        """Wraps a callable so that calls to it get watched.
+
+        :param name: name that gets reported (defaults to the name of the
+                     callable)
+        """
+        if name is None:
+            name = _utils.get_callback_name(fn)
+        return functools.partial(self.call, name, fn)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Combine futures (without blocking any thread while doing so)."""
+
+import functools
+import threading
+
+import futurist
+from futurist import _futures
+from futurist import _timer
+
+
+def _new_future(fs, sources=None):
+    green = bool(fs) and all(isinstance(f, futurist.GreenFuture)
+                             for f in fs)
+    if sources is None:
+        sources = fs
+    return _futures._derived_future(green, sources)
+
+
+def then(fut, fn, executor=None):
+    """Calls a function with the result of a future (once it has one).
+
+    If the future fails (or is cancelled) the function is not called and
+    the returned future fails (or is cancelled) the same way. Cancelling
+    the returned future cancels the future it was chained to.
+
+    :param executor: executor to run the function in; when not provided it
+                     is called by whatever completes the future (so it
+                     should be quick)
+    :returns: future of what the function returns
+    """
+    followups = [fut]
+    chained = _new_future([fut], sources=followups)
+
+    def on_done(fut):
+        if fut.cancelled() or fut.exception() is not None:
+            _futures._copy_outcome(fut, chained)
+            return
+        if chained.done():
+            return
+        if executor is None:
+            try:
+                result = fn(fut.result())
+            except Exception as e:
+                _futures._set_exception(chained, e)
+            else:
+                _futures._set_result(chained, result)
+        else:
+            try:
+                submitted = executor.submit(fn, fut.result())
+            except Exception as e:
+                _futures._set_exception(chained, e)
+            else:
+                followups.append(submitted)
+                submitted.add_done_callback(
+                    functools.partial(_futures._copy_outcome, fut=chained))
+
+    fut.add_done_callback(on_done)
+    return chained
+
+
+def gather(fs):
+    """Combines futures into one future of (the list of) their results.
+
+    The results are in the same order as the futures; the combined future
+    fails as soon as any of the futures fails (and is cancelled if any of
+    them is cancelled). Cancelling the combined future cancels all of the
+    futures.
+    """
+    fs = list(fs)
+    gathered = _new_future(fs)
+    if not fs:
+        gathered.set_result([])
+        return gathered
+    results = [None] * len(fs)
+    lock = threading.Lock()
+    remaining = [len(fs)]
+
+    def on_done(index, fut):
+        if fut.cancelled() or fut.exception() is not None:
+            _futures._copy_outcome(fut, gathered)
+            return
+        results[index] = fut.result()
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            _futures._set_result(gathered, results)
+
+    for index, fut in enumerate(fs):
+        fut.add_done_callback(functools.partial(on_done, index))
+    return gathered
+
+
+def first_of(fs, cancel_rest=True):
+    """Future of the outcome of whichever of the futures completes first.
+
+    Cancelling the returned future cancels all of the futures.
+
+    :param cancel_rest: once one of the futures completes, try to cancel
+                        the others
+    """
+    fs = list(fs)
+    if not fs:
+        raise ValueError("Can not get the first of no futures")
+    first = _new_future(fs)
+
+    def on_done(fut):
+        if first.done():
+            return
+        _futures._copy_outcome(fut, first)
+        if cancel_rest:
+            for other in fs:
+                if other is not fut:
+                    other.cancel()
+
+    for fut in fs:
+        fut.add_done_callback(on_done)
+    return first
+
+
+def with_timeout(fut, timeout):
+    """Future of the outcome of a future (if it completes in time).
+
+    If the future does not complete within ``timeout`` seconds the returned
+    future fails with :py:class:`~futurist.TimeoutError` (and the future is
+    cancelled, if it has not started running). Cancelling the returned
+    future cancels the future.
+    """
+    timed = _new_future([fut])
+
+    def on_timeout():
+        if not fut.done():
+            _futures._set_exception(timed, futurist.TimeoutError(
+                "Future did not complete within %s seconds" % timeout))
+            fut.cancel()
+
+    handle = _timer.call_later(timeout, on_timeout,
+                               green=isinstance(timed, futurist.GreenFuture))
+
+    def on_done(fut):
+        handle.cancel()
+        _futures._copy_outcome(fut, timed)
+
+    fut.add_done_callback(on_done)
+    return timed
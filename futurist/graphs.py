@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run graphs of tasks (that depend on each others results) on executors."""
+
+import collections
+import functools
+import threading
+
+from futurist import _utils
+
+#: Named tuple of the statistics about a graph run.
+GraphStatistics = collections.namedtuple(
+    'GraphStatistics',
+    'elapsed runtime critical_path critical_path_time')
+
+_Node = collections.namedtuple('_Node', 'name fn requires args kwargs')
+
+_WHITE, _GREY, _BLACK = range(0, 3)
+
+
+class TaskGraph(object):
+    """Graph of tasks where tasks run once the ones they require are done.
+
+    Each task is given the results of the tasks it requires (in the order
+    they were required) as its first positional arguments. A task is only
+    submitted to the executor once all of the tasks it requires have
+    completed (so no worker waits on another), if any of them fails (or is
+    cancelled) the task (and all that require it) fail (or are cancelled)
+    the same way without ever being submitted.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._nodes = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._finished_at = {}
+        self._started_at = None
+
+    def add(self, name, fn, requires=None, args=(), kwargs=None):
+        """Adds a task to the graph.
+
+        :param name: unique name of the task
+        :param fn: callable the task runs
+        :param requires: names of the tasks (whose results are passed to
+                         ``fn``) that must complete before this one runs
+        :type requires: list
+        :param args: extra positional arguments (passed after the results
+                     of the required tasks)
+        :param kwargs: keyword arguments
+        """
+        if name in self._nodes:
+            raise ValueError("Task %r already exists" % (name,))
+        self._nodes[name] = _Node(name, fn, tuple(requires or ()),
+                                  tuple(args), dict(kwargs or {}))
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _find_cycle(self, order):
+        colors = dict((name, _WHITE) for name in self._nodes)
+        for root in self._nodes:
+            if colors[root] != _WHITE:
+                continue
+            # Iterative depth first search (to avoid recursion limits on
+            # long chains); the stack holds the path being explored.
+            colors[root] = _GREY
+            path = [root]
+            stack = [iter(self._nodes[root].requires)]
+            while stack:
+                for name in stack[-1]:
+                    if colors[name] == _GREY:
+                        return path[path.index(name):] + [name]
+                    if colors[name] == _WHITE:
+                        colors[name] = _GREY
+                        path.append(name)
+                        stack.append(iter(self._nodes[name].requires))
+                        break
+                else:
+                    stack.pop()
+                    done = path.pop()
+                    colors[done] = _BLACK
+                    order.append(done)
+        return None
+
+    def validate(self):
+        """Checks the graph (for unknown requirements and cycles).
+
+        :returns: names of the tasks (ordered so that each task comes
+                  after the tasks it requires)
+        :rtype: list
+        :raises: ValueError if the graph is not valid
+        """
+        for node in self._nodes.values():
+            for name in node.requires:
+                if name not in self._nodes:
+                    raise ValueError("Task %r requires unknown task %r"
+                                     % (node.name, name))
+        order = []
+        cycle = self._find_cycle(order)
+        if cycle is not None:
+            raise ValueError("Cycle detected: %s"
+                             % " -> ".join(repr(name) for name in cycle))
+        return order
+
+    def _on_finished(self, name, fut):
+        with self._lock:
+            self._finished_at[name] = _utils.now()
+
+    def run(self):
+        """Submits the tasks of the graph (as their requirements complete).
+
+        :returns: futures of the results of each task (keyed by name)
+        :rtype: OrderedDict
+        """
+        order = self.validate()
+        with self._lock:
+            self._finished_at.clear()
+            self._started_at = _utils.now()
+        fs = collections.OrderedDict()
+        for name in order:
+            node = self._nodes[name]
+            deps = [fs[dep] for dep in node.requires]
+            fut = self._executor.submit_after(deps, node.fn,
+                                              *node.args, **node.kwargs)
+            fut.add_done_callback(functools.partial(self._on_finished, name))
+            fs[name] = fut
+        return collections.OrderedDict((name, fs[name])
+                                       for name in self._nodes)
+
+    @property
+    def statistics(self):
+        """Statistics about the (finished tasks of the) last run.
+
+        Each tasks time is from when the tasks it requires completed until
+        it completed (so it includes any time spent waiting for a worker);
+        the critical path is the chain of tasks whose times add up to the
+        longest.
+
+        :rtype: :py:class:`.GraphStatistics`
+        """
+        with self._lock:
+            finished_at = dict(self._finished_at)
+            started_at = self._started_at
+        times = {}
+        for name, finished in finished_at.items():
+            # It became runnable when the last task it requires finished.
+            ready_at = max([finished_at.get(dep, started_at)
+                            for dep in self._nodes[name].requires] +
+                           [started_at])
+            times[name] = max(0.0, finished - ready_at)
+        longest = {}
+        for name in self.validate():
+            if name not in times:
+                continue
+            best = None
+            for dep in self._nodes[name].requires:
+                if dep in longest and (best is None or
+                                       longest[dep][0] > longest[best][0]):
+                    best = dep
+            if best is None:
+                longest[name] = (times[name], [name])
+            else:
+                longest[name] = (longest[best][0] + times[name],
+                                 longest[best][1] + [name])
+        if longest:
+            critical_time, critical_path = max(longest.values(),
+                                               key=lambda v: v[0])
+        else:
+            critical_time, critical_path = 0.0, []
+        if finished_at and started_at is not None:
+            elapsed = max(finished_at.values()) - started_at
+        else:
+            elapsed = 0.0
+        return GraphStatistics(elapsed=elapsed, runtime=sum(times.values()),
+                               critical_path=critical_path,
+                               critical_path_time=critical_time)
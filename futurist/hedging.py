@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Hedged (speculative) submission of work to executors."""
+
+import collections
+import functools
+import math
+import threading
+import weakref
+
+from futurist import _futures
+from futurist import _green
+from futurist import _timer
+from futurist import _utils
+
+#: Named tuple of the statistics about the submissions of a hedger (the
+#: hedge delay is the one that the next submission will use).
+HedgeStatistics = collections.namedtuple(
+    'HedgeStatistics', 'submitted hedged hedges_won hedge_after')
+
+# How many new latencies are observed before the (adaptive) hedge delay
+# gets recalculated.
+_RECALCULATE_EVERY = 16
+
+# Hedgers (keyed by callable name) that ``hedged_submit`` shares for each
+# executor, and how many (of the most recently used) are kept per executor.
+_SHARED_HEDGERS = weakref.WeakKeyDictionary()
+_SHARED_HEDGERS_LOCK = threading.Lock()
+_MAX_SHARED_HEDGERS = 128
+
+
+class Hedger(object):
+    """Submits work again when it has not finished (fast enough).
+
+    Each submission is submitted to the executor and, if it has not
+    finished after the hedge delay, it is submitted once more; the future
+    that is returned has the outcome of whichever of the attempts finishes
+    first (the other one is cancelled, or ignored if it is already
+    running), though an attempt that fails only does so if the other one
+    is not still running. Only work that can safely run more than once
+    (like read-only calls) should be submitted.
+
+    Unless a fixed delay is given the hedge delay adapts to the latencies
+    of previous attempts (it is their given percentile, so that only the
+    slowest submissions get hedged).
+    """
+
+    def __init__(self, executor, hedge_after=None, percentile=95.0,
+                 window=1000, initial_hedge_after=0.1, min_samples=10):
+        """Initializes a hedger.
+
+        :param executor: executor that attempts are submitted to
+        :param hedge_after: fixed hedge delay (in seconds), when not
+                            provided it is derived from the latencies of
+                            previous attempts
+        :type hedge_after: number
+        :param percentile: percentile (of the latencies of previous
+                           attempts) that is used as the hedge delay
+        :type percentile: number
+        :param window: how many of the latest latencies are kept
+        :type window: int
+        :param initial_hedge_after: hedge delay that is used until enough
+                                    latencies have been observed
+        :type initial_hedge_after: number
+        :param min_samples: how many latencies have to be observed before
+                            the hedge delay is derived from them
+        :type min_samples: int
+        """
+        if hedge_after is not None and hedge_after < 0:
+            raise ValueError("Hedge delay must be greater than or equal"
+                             " to zero")
+        if not 0 < percentile <= 100:
+            raise ValueError("Percentile must be greater than zero and"
+                             " less than or equal to 100")
+        if window <= 0:
+            raise ValueError("Window must be greater than zero")
+        self._executor = executor
+        self._green = executor.threading is _green.threading
+        self._fixed_hedge_after = hedge_after
+        self._percentile = percentile
+        self._latencies = collections.deque(maxlen=window)
+        self._min_samples = min(min_samples, window)
+        self._hedge_after = initial_hedge_after
+        self._unaccounted = 0
+        self._derived = False
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._hedged = 0
+        self._hedges_won = 0
+
+    @property
+    def hedge_after(self):
+        """The hedge delay (in seconds) the next submission will use."""
+        if self._fixed_hedge_after is not None:
+            return self._fixed_hedge_after
+        with self._lock:
+            if (len(self._latencies) >= self._min_samples and
+                    (not self._derived or
+                     self._unaccounted >= _RECALCULATE_EVERY)):
+                latencies = sorted(self._latencies)
+                index = int(math.ceil(len(latencies) *
+                                      self._percentile / 100.0)) - 1
+                self._hedge_after = latencies[max(0, index)]
+                self._unaccounted = 0
+                self._derived = True
+            return self._hedge_after
+
+    @property
+    def statistics(self):
+        """:class:`.HedgeStatistics` about the submissions."""
+        hedge_after = self.hedge_after
+        with self._lock:
+            return HedgeStatistics(submitted=self._submitted,
+                                   hedged=self._hedged,
+                                   hedges_won=self._hedges_won,
+                                   hedge_after=hedge_after)
+
+    def _observe(self, started_at, fut):
+        if fut.cancelled():
+            return
+        with self._lock:
+            self._latencies.append(_utils.now() - started_at)
+            self._unaccounted += 1
+
+    def _attempt(self, attempts, fn, args, kwargs):
+        started_at = _utils.now()
+        attempt = self._executor.submit(fn, *args, **kwargs)
+        attempts.append(attempt)
+        attempt.add_done_callback(functools.partial(self._observe,
+                                                    started_at))
+        return attempt
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit some work (and submit it again if it is slow to finish).
+
+        :returns: future of the result of (the first attempt to finish of)
+                  the work
+        """
+        attempts = []
+        won = []
+        fut = _futures._derived_future(self._green, attempts)
+        with self._lock:
+            self._submitted += 1
+
+        def on_done(attempt):
+            with self._lock:
+                if won or fut.done():
+                    return
+                if (attempt.cancelled() or
+                        attempt.exception() is not None):
+                    # Failed, so let any other attempt that is still
+                    # running decide instead (it may still succeed).
+                    if any(not other.done() for other in list(attempts)):
+                        return
+                won.append(attempt)
+                if attempt is not attempts[0]:
+                    self._hedges_won += 1
+            _futures._copy_outcome(attempt, fut)
+            for other in attempts:
+                if other is not attempt:
+                    other.cancel()
+
+        def hedge():
+            if fut.done() or attempts[0].done():
+                return
+            with self._lock:
+                self._hedged += 1
+            try:
+                attempt = self._attempt(attempts, fn, args, kwargs)
+            except Exception:
+                # Rejected (or shut down), the first attempt may still
+                # finish though...
+                pass
+            else:
+                attempt.add_done_callback(on_done)
+
+        first = self._attempt(attempts, fn, args, kwargs)
+        handle = _timer.call_later(self.hedge_after, hedge,
+                                   green=self._green)
+        fut.add_done_callback(lambda fut: handle.cancel())
+        first.add_done_callback(on_done)
+        return fut
+
+
+def _shared_hedger(executor, fn):
+    name = _utils.get_callback_name(fn)
+    with _SHARED_HEDGERS_LOCK:
+        try:
+            hedgers = _SHARED_HEDGERS[executor]
+        except KeyError:
+            hedgers = _SHARED_HEDGERS[executor] = collections.OrderedDict()
+        try:
+            hedger = hedgers.pop(name)
+        except KeyError:
+            # It must not keep the executor alive (it is only weakly
+            # referenced by the dictionary it is in).
+            hedger = Hedger(weakref.proxy(executor))
+        hedgers[name] = hedger
+        while len(hedgers) > _MAX_SHARED_HEDGERS:
+            hedgers.popitem(last=False)
+        return hedger
+
+
+def hedged_submit(executor, fn, *args, **kwargs):
+    """Submit some work (and submit it again if it is slow to finish).
+
+    Submits the work to the executor and, if it has not finished after the
+    hedge delay, submits it once more. Unless a fixed delay is given, the
+    delay adapts to the latencies observed by earlier hedged submissions of
+    the same callable to the same executor (use a :py:class:`.Hedger`
+    directly to also get its statistics, or to configure how it adapts).
+
+    :param hedge_after: fixed hedge delay in seconds (passed as a keyword
+                        argument, it is **not** passed to ``fn``)
+    :returns: future of the result of (the first attempt to finish of) the
+              work
+    """
+    hedge_after = kwargs.pop('hedge_after', None)
+    if hedge_after is None:
+        hedger = _shared_hedger(executor, fn)
+    else:
+        hedger = Hedger(executor, hedge_after=hedge_after)
+    return hedger.submit(fn, *args, **kwargs)
@@ -414,7 +414,8 @@ class PeriodicWorker(object):
                log=None, executor_factory=None,
                cond_cls=threading.Condition, event_cls=threading.Event,
                schedule_strategy='last_started', now_func=utils.now,
-               on_failure=None, args=_NO_OP_ARGS, kwargs=_NO_OP_KWARGS):
+               on_failure=None, args=_NO_OP_ARGS, kwargs=_NO_OP_KWARGS,
+               watchdog=None):
         """Automatically creates a worker by analyzing object(s) methods.
 
         Only picks up methods that have been tagged/decorated with
@@ -476,6 +477,10 @@ class PeriodicWorker(object):
         :type args: tuple
         :param kwargs: keyword arguments to be passed to all callables
         :type kwargs: dict
+        :param watchdog: watchdog that watches (and reports, by their
+                         names) callables that get stuck running (only
+                         for executors that run them in this process)
+        :type watchdog: :py:class:`~futurist.Watchdog`
         """
         callables = []
         for obj in objects:
@@ -489,12 +494,12 @@ class PeriodicWorker(object):
         return cls(callables, log=log, executor_factory=executor_factory,
                    cond_cls=cond_cls, event_cls=event_cls,
                    schedule_strategy=schedule_strategy, now_func=now_func,
-                   on_failure=on_failure)
+                   on_failure=on_failure, watchdog=watchdog)
 
     def __init__(self, callables, log=None, executor_factory=None,
                  cond_cls=threading.Condition, event_cls=threading.Event,
                  schedule_strategy='last_started', now_func=utils.now,
-                 on_failure=None):
+                 on_failure=None, watchdog=None):
         """Creates a new worker using the given periodic callables.
 
         :param callables: a iterable of tuple objects previously decorated
@@ -553,6 +558,10 @@ class PeriodicWorker(object):
                            any user provided callable should not raise
                            exceptions on being called)
         :type on_failure: callable
+        :param watchdog: watchdog that watches (and reports, by their
+                         names) callables that get stuck running (only
+                         for executors that run them in this process)
+        :type watchdog: :py:class:`~futurist.Watchdog`
         """
         if on_failure is not None and not six.callable(on_failure):
             raise ValueError("On failure callback %r must be"
@@ -602,6 +611,7 @@ class PeriodicWorker(object):
         self._on_failure = on_failure
         self._executor_factory = executor_factory
         self._now_func = now_func
+        self._watchdog = watchdog
 
     def __len__(self):
         """How many callables/periodic work units are currently active."""
@@ -611,6 +621,12 @@ class PeriodicWorker(object):
         """Main worker run loop."""
         barrier = utils.Barrier(cond_cls=self._cond_cls)
         rnd = random.SystemRandom()
+        if self._watchdog is None:
+            def run(work):
+                return runner.run
+        else:
+            def run(work):
+                return self._watchdog.wrap(runner.run, name=work.name)
 
         def _process_scheduled():
             # Figure out when we should run next (by selecting the
@@ -638,7 +654,7 @@ class PeriodicWorker(object):
                     self._log.debug("Submitting periodic"
                                     " callback '%s'", work.name)
                     try:
-                        fut = executor.submit(runner.run, work)
+                        fut = executor.submit(run(work), work)
                     except _SCHEDULE_RETRY_EXCEPTIONS as exc:
                         # Restart after a short delay
                         delay = (self._RESCHEDULE_DELAY +
@@ -673,7 +689,7 @@ class PeriodicWorker(object):
                     self._log.debug("Submitting immediate"
                                     " callback '%s'", work.name)
                     try:
-                        fut = executor.submit(runner.run, work)
+                        fut = executor.submit(run(work), work)
                     except _SCHEDULE_RETRY_EXCEPTIONS as exc:
                         self._log.error("Failed to submit immediate callback "
                                         "'%s', retrying. Error: %s", work.name,
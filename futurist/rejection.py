@@ -16,7 +16,24 @@
 
 """Executor rejection strategies."""
 
+import collections
+import threading
+
 import futurist
+from futurist import _utils
+
+#: Circuit breaker state where submissions are accepted.
+CLOSED = 'closed'
+
+#: Circuit breaker state where submissions are rejected.
+OPEN = 'open'
+
+#: Circuit breaker state where (a few) probe submissions are accepted.
+HALF_OPEN = 'half-open'
+
+# How many snapshots of an executors statistics a circuit breaker keeps
+# (at most) for its window.
+_WINDOW_SNAPSHOTS = 10
 
 
 def reject_when_reached(max_backlog):
@@ -30,3 +47,172 @@ def reject_when_reached(max_backlog):
                                                               max_backlog))
 
     return _rejector
+
+
+def run_in_caller_when_reached(max_backlog):
+    """Returns a function that will run in the caller when backlog is full.
+
+    Once the backlog goes past max size submissions are run synchronously
+    by whoever submitted them (which slows them down, instead of failing
+    their submissions). Only the thread and green thread pool executors
+    can do this, other executors reject these submissions instead.
+    """
+
+    def _rejector(executor, backlog):
+        if backlog >= max_backlog:
+            raise futurist.RunInCaller("Current backlog %s is not"
+                                       " allowed to go"
+                                       " beyond %s" % (backlog,
+                                                       max_backlog))
+
+    return _rejector
+
+
+class CircuitBreaker(object):
+    """Rejects submissions while the executor is failing too much.
+
+    It is provided (as the ``check_and_reject`` callback) to a single
+    executor, and watches the statistics of that executor. While closed
+    submissions are accepted, until the ratio of failures (of the
+    submissions that completed in the window) reaches the failure ratio;
+    then it opens and rejects all submissions until the cooldown has
+    passed. After that it is half-open, and only lets probe submissions
+    through; if they succeed it closes, if any fails it opens again.
+
+    Rejecting fast keeps work that is bound to fail (because something it
+    depends on is down) from tying up all of the workers until it times out.
+    """
+
+    def __init__(self, failure_ratio, window, cooldown, min_completions=10,
+                 probes=1, on_transition=None):
+        if not 0 < failure_ratio <= 1:
+            raise ValueError("Failure ratio must be greater than zero and"
+                             " less than or equal to one")
+        if window <= 0:
+            raise ValueError("Window must be greater than zero")
+        if cooldown < 0:
+            raise ValueError("Cooldown must be greater than or equal"
+                             " to zero")
+        if probes <= 0:
+            raise ValueError("Probes must be greater than zero")
+        self._failure_ratio = failure_ratio
+        self._window = window
+        self._cooldown = cooldown
+        self._min_completions = max(1, min_completions)
+        self._probes = probes
+        self._on_transition = on_transition
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._snapshots = collections.deque()
+        self._opened_at = None
+        self._probe_base = None
+        self._probes_admitted = 0
+        self._rejected = 0
+
+    @property
+    def state(self):
+        """The current state (closed, open or half-open) of the breaker."""
+        return self._state
+
+    @property
+    def rejected(self):
+        """How many submissions the breaker has rejected."""
+        return self._rejected
+
+    def _transition(self, state, transitions):
+        transitions.append((self._state, state))
+        self._state = state
+
+    def _trip(self, now, transitions):
+        self._opened_at = now
+        self._transition(OPEN, transitions)
+
+    def _check_closed(self, now, executed, failures, transitions):
+        snapshots = self._snapshots
+        if snapshots and (executed < snapshots[-1][1] or
+                          failures < snapshots[-1][2]):
+            # The statistics got cleared (the executor was restarted).
+            snapshots.clear()
+        if (not snapshots or
+                now - snapshots[-1][0] >= self._window / _WINDOW_SNAPSHOTS):
+            snapshots.append((now, executed, failures))
+        while len(snapshots) > 1 and now - snapshots[1][0] >= self._window:
+            snapshots.popleft()
+        completed = executed - snapshots[0][1]
+        failed = failures - snapshots[0][2]
+        if (completed >= self._min_completions and
+                failed >= completed * self._failure_ratio):
+            self._trip(now, transitions)
+            return False
+        return True
+
+    def _check_half_open(self, now, executed, failures, transitions):
+        completed = executed - self._probe_base[0]
+        failed = failures - self._probe_base[1]
+        if failed:
+            self._trip(now, transitions)
+            return False
+        if completed >= self._probes:
+            self._snapshots.clear()
+            self._snapshots.append((now, executed, failures))
+            self._transition(CLOSED, transitions)
+            return True
+        if self._probes_admitted < self._probes:
+            self._probes_admitted += 1
+            return True
+        return False
+
+    def _check(self, executor):
+        stats = executor.statistics
+        now = _utils.now()
+        transitions = []
+        with self._lock:
+            if self._state == CLOSED:
+                accepted = self._check_closed(now, stats.executed,
+                                              stats.failures, transitions)
+            else:
+                if (self._state == OPEN and
+                        now - self._opened_at >= self._cooldown):
+                    self._probe_base = (stats.executed, stats.failures)
+                    self._probes_admitted = 0
+                    self._transition(HALF_OPEN, transitions)
+                if self._state == HALF_OPEN:
+                    accepted = self._check_half_open(now, stats.executed,
+                                                     stats.failures,
+                                                     transitions)
+                else:
+                    accepted = False
+            if not accepted:
+                self._rejected += 1
+        if self._on_transition is not None:
+            for old_state, new_state in transitions:
+                self._on_transition(self, old_state, new_state)
+        return accepted
+
+    def __call__(self, executor, backlog):
+        if not self._check(executor):
+            raise futurist.RejectedSubmission("Circuit breaker is %s"
+                                              % self._state)
+
+
+def circuit_breaker(failure_ratio, window, cooldown, min_completions=10,
+                    probes=1, on_transition=None):
+    """Returns a function that will raise while the executor is failing.
+
+    :param failure_ratio: ratio (greater than zero, up to one) of the
+                          submissions that completed in the window that
+                          have to have failed to open the circuit
+    :param window: seconds that completions are looked at for
+    :param cooldown: seconds the circuit stays open (rejecting everything)
+                     before probe submissions are let through
+    :param min_completions: how many submissions have to have completed in
+                            the window before the circuit can open
+    :param probes: how many probe submissions are let through (and have to
+                   succeed to close the circuit) while half-open
+    :param on_transition: callback that is called with the breaker, the old
+                          state and the new state on each state transition
+    :rtype: :py:class:`.CircuitBreaker`
+    """
+    return CircuitBreaker(failure_ratio, window, cooldown,
+                          min_completions=min_completions, probes=probes,
+                          on_transition=on_transition)
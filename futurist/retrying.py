@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Retrying of submitted work (that fails) with backoff."""
+
+import collections
+import functools
+import random
+import threading
+
+from futurist import _futures
+from futurist import _green
+from futurist import _timer
+
+#: Named tuple of the statistics about the submissions made with a retry
+#: policy (the retries are also counted by the outcome of the submission
+#: they were made for).
+RetryStatistics = collections.namedtuple(
+    'RetryStatistics', ['attempts', 'retries', 'succeeded', 'failed',
+                        'cancelled', 'succeeded_retries', 'failed_retries'])
+
+
+class RetryPolicy(object):
+    """Policy that resubmits work (to an executor) when it fails.
+
+    Each submission made with the policy gets one future that spans all of
+    its attempts; failed attempts (that raised one of the exceptions that
+    are retried) are submitted again after an exponential backoff, which is
+    waited out by a timer (so no worker sleeps while waiting).
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=None,
+                 jitter=0.0, retry_on=(Exception,)):
+        """Initializes a retry policy.
+
+        :param max_attempts: maximum number of attempts (including the
+                             first one)
+        :type max_attempts: int
+        :param backoff: delay (in seconds) before the first retry, it
+                        doubles before each retry after that
+        :type backoff: number
+        :param max_backoff: maximum delay (in seconds) before a retry (when
+                            not provided there is no maximum)
+        :type max_backoff: number
+        :param jitter: fraction (from zero to one) of each delay that is
+                       randomly taken off of it (so that work that failed
+                       together is not retried together)
+        :type jitter: number
+        :param retry_on: exception type (or tuple of them) that are retried
+                         (other exceptions fail the submission right away)
+        """
+        if max_attempts <= 0:
+            raise ValueError("Max attempts must be greater than zero")
+        if backoff < 0:
+            raise ValueError("Backoff must be greater than or equal to zero")
+        if not 0 <= jitter <= 1:
+            raise ValueError("Jitter must be between zero and one")
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._retry_on = retry_on
+        self._lock = threading.Lock()
+        self._stats = dict((name, 0) for name in RetryStatistics._fields)
+
+    @property
+    def statistics(self):
+        """:class:`.RetryStatistics` about the submissions."""
+        with self._lock:
+            return RetryStatistics(**self._stats)
+
+    def delay(self, retry):
+        """Returns the delay (in seconds) before the given retry.
+
+        :param retry: which retry it is (the first retry is one)
+        :type retry: int
+        """
+        delay = self._backoff * (2 ** (retry - 1))
+        if self._max_backoff is not None:
+            delay = min(delay, self._max_backoff)
+        if self._jitter:
+            delay -= delay * self._jitter * random.random()
+        return delay
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self._stats[name] += count
+
+    def _on_finished(self, retries, fut):
+        if fut.cancelled():
+            self._count(cancelled=1)
+        elif fut.exception() is not None:
+            self._count(failed=1, failed_retries=retries[0])
+        else:
+            self._count(succeeded=1, succeeded_retries=retries[0])
+
+    def submit(self, executor, fn, *args, **kwargs):
+        """Submit some work (and resubmit it when it fails).
+
+        :param executor: executor to submit the work (and its retries) to
+        :returns: future of the result of (the last attempt of) the work
+        """
+        attempts = []
+        retries = [0]
+        fut = _futures._derived_future(executor.threading is _green.threading,
+                                       attempts)
+
+        def submit_attempt():
+            if fut.done():
+                return
+            self._count(attempts=1)
+            try:
+                attempt = executor.submit(fn, *args, **kwargs)
+            except Exception as e:
+                if not attempts:
+                    raise
+                _futures._set_exception(fut, e)
+                return
+            attempts[:] = [attempt]
+            if fut.cancelled():
+                attempt.cancel()
+            attempt.add_done_callback(on_done)
+
+        def on_done(attempt):
+            exc = None
+            if not attempt.cancelled():
+                exc = attempt.exception()
+            if (exc is not None and not fut.done() and
+                    isinstance(exc, self._retry_on) and
+                    retries[0] + 1 < self._max_attempts):
+                retries[0] += 1
+                self._count(retries=1)
+                _timer.call_later(self.delay(retries[0]), submit_attempt,
+                                  green=isinstance(fut, _futures.GreenFuture))
+            else:
+                _futures._copy_outcome(attempt, fut)
+
+        submit_attempt()
+        fut.add_done_callback(functools.partial(self._on_finished, retries))
+        return fut
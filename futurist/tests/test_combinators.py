@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+import eventlet
+import testscenarios
+
+import futurist
+from futurist import _timer
+from futurist import combinators
+from futurist.tests import base
+
+
+def double(value):
+    return value * 2
+
+
+def blows_up(value):
+    raise RuntimeError("Broken")
+
+
+def sleeps_then_returns(delay, value, use_eventlet_sleep=False):
+    if use_eventlet_sleep:
+        eventlet.sleep(delay)
+    else:
+        time.sleep(delay)
+    return value
+
+
+class TestCombinators(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'future_cls': futurist.GreenFuture,
+                   'use_eventlet_sleep': True}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'future_cls': futurist.Future,
+                    'use_eventlet_sleep': False}),
+    ]
+
+    def setUp(self):
+        super(TestCombinators, self).setUp()
+        self.executor = self.executor_cls()
+        self.addCleanup(self.executor.shutdown)
+
+    def sleeps(self, delay, value):
+        return self.executor.submit(
+            sleeps_then_returns, delay, value,
+            use_eventlet_sleep=self.use_eventlet_sleep)
+
+    def test_then(self):
+        fut = combinators.then(self.sleeps(0.01, 1), double)
+        self.assertIsInstance(fut, self.future_cls)
+        self.assertEqual(2, fut.result(timeout=5))
+
+    def test_then_chain_in_executor(self):
+        fut = self.sleeps(0.01, 1)
+        for _i in range(0, 3):
+            fut = combinators.then(fut, double, executor=self.executor)
+        self.assertEqual(8, fut.result(timeout=5))
+
+    def test_then_blows_up(self):
+        fut = combinators.then(self.sleeps(0.01, 1), blows_up)
+        self.assertRaises(RuntimeError, fut.result, timeout=5)
+        fut = combinators.then(fut, double)
+        self.assertRaises(RuntimeError, fut.result, timeout=5)
+
+    def test_then_cancel_propagates(self):
+        source = self.future_cls()
+        middle = combinators.then(source, double)
+        last = combinators.then(middle, double)
+        self.assertTrue(last.cancel())
+        self.assertTrue(middle.cancelled())
+        self.assertTrue(source.cancelled())
+
+    def test_then_source_cancelled(self):
+        source = self.future_cls()
+        chained = combinators.then(source, double)
+        source.cancel()
+        self.assertTrue(chained.cancelled())
+
+    def test_gather(self):
+        fs = [self.sleeps(0.05 - i * 0.01, i) for i in range(0, 5)]
+        gathered = combinators.gather(fs)
+        self.assertEqual(list(range(0, 5)), gathered.result(timeout=5))
+
+    def test_gather_empty(self):
+        self.assertEqual([], combinators.gather([]).result())
+
+    def test_gather_blows_up(self):
+        fs = [self.sleeps(0.01, 1), self.executor.submit(blows_up, 1)]
+        gathered = combinators.gather(fs)
+        self.assertRaises(RuntimeError, gathered.result, timeout=5)
+
+    def test_gather_cancel(self):
+        fs = [self.future_cls(), self.future_cls()]
+        gathered = combinators.gather(fs)
+        gathered.cancel()
+        self.assertTrue(all(f.cancelled() for f in fs))
+
+    def test_first_of(self):
+        fs = [self.future_cls(), self.sleeps(0.01, 'fast')]
+        first = combinators.first_of(fs)
+        self.assertEqual('fast', first.result(timeout=5))
+        self.assertTrue(fs[0].cancelled())
+
+    def test_first_of_keeps_rest(self):
+        fs = [self.future_cls(), self.sleeps(0.01, 'fast')]
+        first = combinators.first_of(fs, cancel_rest=False)
+        self.assertEqual('fast', first.result(timeout=5))
+        self.assertFalse(fs[0].cancelled())
+
+    def test_with_timeout(self):
+        fut = combinators.with_timeout(self.sleeps(0.01, 1), 5)
+        self.assertEqual(1, fut.result(timeout=5))
+
+    def test_with_timeout_expires(self):
+        source = self.future_cls()
+        fut = combinators.with_timeout(source, 0.01)
+        self.assertRaises(futurist.TimeoutError, fut.result, timeout=5)
+        self.assertTrue(source.cancelled())
+
+
+class TestTimer(base.TestCase):
+    def test_call_later_order(self):
+        timer = _timer.Timer()
+        called = []
+        done = threading.Event()
+        timer.call_later(0.02, called.append, 2)
+        timer.call_later(0.01, called.append, 1)
+        timer.call_later(0.03, done.set)
+        self.assertTrue(done.wait(5))
+        self.assertEqual([1, 2], called)
+
+    def test_cancel(self):
+        timer = _timer.Timer()
+        called = []
+        done = threading.Event()
+        handles = [timer.call_later(0.01, called.append, i)
+                   for i in range(0, 10)]
+        for handle in handles[1:]:
+            handle.cancel()
+        timer.call_later(0.02, done.set)
+        self.assertTrue(done.wait(5))
+        self.assertEqual([0], called)
+        self.assertLessEqual(len(timer._heap), 1)
+
+    def test_cancel_after_fired(self):
+        timer = _timer.Timer()
+        done = threading.Event()
+        handles = [timer.call_later(0, lambda: None) for _i in range(0, 5)]
+        timer.call_later(0, done.set)
+        self.assertTrue(done.wait(5))
+        pending = [timer.call_later(60, lambda: None) for _i in range(0, 20)]
+        for handle in pending:
+            self.addCleanup(handle.cancel)
+        for handle in handles:
+            handle.cancel()
+        # Nothing that is still in the heap was cancelled (so nothing is
+        # counted as needing to be cleaned up).
+        self.assertEqual(0, timer._cancelled_count)
+        self.assertEqual(20, len(timer._heap))
@@ -12,15 +12,33 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import multiprocessing
+import multiprocessing.util
+import os
+import signal
+import sys
 import threading
 import time
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
 from eventlet.green import threading as green_threading
+import fixtures
+import mock
 import testscenarios
+import testtools
 from testtools import testcase
 
 import futurist
+from futurist import _asyncio
+from futurist import _process
+from futurist import _shared
+from futurist import _thread
 from futurist import rejection
+from futurist import waiters
 from futurist.tests import base
 
 
@@ -40,6 +58,127 @@ def delayed(wait_secs):
     time.sleep(wait_secs)
 
 
+def exits_abruptly():
+    os._exit(1)
+
+
+def returns_pid():
+    return os.getpid()
+
+
+def yields_pid():
+    yield os.getpid()
+
+
+def is_imported(module_name):
+    return module_name in sys.modules
+
+
+def counts_up(amount):
+    for i in range(0, amount):
+        yield i
+
+
+def counts_up_then_blows_up(amount):
+    for i in range(0, amount):
+        yield i
+    raise RuntimeError("no worky")
+
+
+def counts_forever():
+    i = 0
+    while True:
+        yield i
+        i += 1
+
+
+def fails_later():
+    fut = asyncio.get_event_loop().create_future()
+    fut.set_exception(RuntimeError('Broken'))
+    return fut
+
+
+class ConcurrencyTracker(object):
+    def __init__(self):
+        self.active = 0
+        self.most_active = 0
+
+    def __call__(self, delay):
+        self.active += 1
+        self.most_active = max(self.active, self.most_active)
+        loop = asyncio.get_event_loop()
+        fut = loop.create_future()
+
+        def finish():
+            self.active -= 1
+            fut.set_result(None)
+
+        loop.call_later(delay, finish)
+        return fut
+
+
+class FanOut(object):
+    def __init__(self):
+        self.executor = None
+
+    def __call__(self, depth):
+        if depth == 0:
+            return 1
+        fs = [self.executor.submit(self, depth - 1) for _i in range(0, 2)]
+        return sum(f.result() for f in fs)
+
+
+def records_into(path, executed):
+    statistics = futurist.SharedStatistics(path)
+    statistics.record(executed=executed, runtime=0.5)
+
+
+def slow_start(test, delay=0.5):
+    """Makes a module (to preload) that delays children becoming ready."""
+    tmp_dir = test.useFixture(fixtures.TempDir()).path
+    with open(os.path.join(tmp_dir, 'futurist_slow_start.py'), 'w') as fh:
+        fh.write("import time\ntime.sleep(%s)\n" % delay)
+    test.useFixture(fixtures.MonkeyPatch('sys.path', [tmp_dir] + sys.path))
+    return 'futurist_slow_start'
+
+
+def wait_until_ready(executor, timeout=10):
+    deadline = time.time() + timeout
+    pool = executor._pool
+    while (len(pool._workers) < pool._max_workers or
+           not all(w.ready for w in list(pool._workers))):
+        if time.time() > deadline:
+            raise AssertionError("Children not ready after %s seconds"
+                                 % timeout)
+        time.sleep(0.01)
+
+
+def records_in_lockstep(path, times):
+    statistics = futurist.SharedStatistics(path)
+    for _i in range(0, times):
+        statistics.record(executed=1, failures=1, cancelled=1)
+
+
+class UnpickleCounter(object):
+    """Returns how many times (any) counter was unpickled in a process."""
+
+    unpickled = 0
+
+    def __init__(self, name):
+        self.name = name
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        UnpickleCounter.unpickled += 1
+
+    def __call__(self):
+        return UnpickleCounter.unpickled
+
+
+class Unhashable(UnpickleCounter):
+    __hash__ = None
+
+
 class TestExecutors(testscenarios.TestWithScenarios, base.TestCase):
     scenarios = [
         ('sync', {'executor_cls': futurist.SynchronousExecutor,
@@ -53,6 +192,9 @@ class TestExecutors(testscenarios.TestWithScenarios, base.TestCase):
                     'restartable': False, 'executor_kwargs': {}}),
         ('process', {'executor_cls': futurist.ProcessPoolExecutor,
                      'restartable': False, 'executor_kwargs': {}}),
+        ('affinity_process', {
+            'executor_cls': futurist.AffinityProcessPoolExecutor,
+            'restartable': False, 'executor_kwargs': {'max_workers': 2}}),
     ]
 
     def setUp(self):
@@ -180,3 +322,1448 @@ class TestRejection(testscenarios.TestWithScenarios, base.TestCase):
 
         self.assertRaises(futurist.RejectedSubmission,
                           self.executor.submit, returns_one)
+
+
+class FakeExecutor(object):
+    def __init__(self):
+        self.statistics = futurist.ExecutorStatistics()
+
+    def complete(self, executed, failures=0):
+        stats = self.statistics
+        self.statistics = futurist.ExecutorStatistics(
+            executed=stats.executed + executed,
+            failures=stats.failures + failures)
+
+
+class TestCircuitBreaker(base.TestCase):
+    def make_breaker(self, **kwargs):
+        self.transitions = []
+        kwargs.setdefault('min_completions', 4)
+        return rejection.circuit_breaker(
+            0.5, 60, kwargs.pop('cooldown', 0),
+            on_transition=lambda breaker, old, new: self.transitions.append(
+                (old, new)), **kwargs)
+
+    def test_opens(self):
+        breaker = self.make_breaker(cooldown=60)
+        executor = FakeExecutor()
+        breaker(executor, 0)
+        executor.complete(4, failures=1)
+        breaker(executor, 0)
+        self.assertEqual(rejection.CLOSED, breaker.state)
+        executor.complete(4, failures=3)
+        self.assertRaises(futurist.RejectedSubmission, breaker, executor, 0)
+        self.assertEqual(rejection.OPEN, breaker.state)
+        self.assertRaises(futurist.RejectedSubmission, breaker, executor, 0)
+        self.assertEqual(2, breaker.rejected)
+        self.assertEqual([(rejection.CLOSED, rejection.OPEN)],
+                         self.transitions)
+
+    def test_min_completions(self):
+        breaker = self.make_breaker()
+        executor = FakeExecutor()
+        breaker(executor, 0)
+        executor.complete(3, failures=3)
+        breaker(executor, 0)
+        self.assertEqual(rejection.CLOSED, breaker.state)
+
+    def test_half_open_probe_succeeds(self):
+        breaker = self.make_breaker(probes=2)
+        executor = FakeExecutor()
+        breaker(executor, 0)
+        executor.complete(4, failures=4)
+        self.assertRaises(futurist.RejectedSubmission, breaker, executor, 0)
+        # Cooldown has passed, so probes are let through (but only them).
+        breaker(executor, 0)
+        breaker(executor, 0)
+        self.assertEqual(rejection.HALF_OPEN, breaker.state)
+        self.assertRaises(futurist.RejectedSubmission, breaker, executor, 0)
+        executor.complete(2)
+        breaker(executor, 0)
+        self.assertEqual(rejection.CLOSED, breaker.state)
+        self.assertEqual([(rejection.CLOSED, rejection.OPEN),
+                          (rejection.OPEN, rejection.HALF_OPEN),
+                          (rejection.HALF_OPEN, rejection.CLOSED)],
+                         self.transitions)
+
+    def test_half_open_probe_fails(self):
+        breaker = self.make_breaker(cooldown=0.01)
+        executor = FakeExecutor()
+        breaker(executor, 0)
+        executor.complete(4, failures=4)
+        self.assertRaises(futurist.RejectedSubmission, breaker, executor, 0)
+        time.sleep(0.02)
+        breaker(executor, 0)
+        executor.complete(1, failures=1)
+        self.assertRaises(futurist.RejectedSubmission, breaker, executor, 0)
+        self.assertEqual(rejection.OPEN, breaker.state)
+
+    def test_with_executor(self):
+        breaker = self.make_breaker(cooldown=60)
+        executor = futurist.ThreadPoolExecutor(check_and_reject=breaker)
+        self.addCleanup(executor.shutdown)
+        for _i in range(0, 4):
+            fut = executor.submit(blows_up)
+            self.assertRaises(RuntimeError, fut.result)
+        # Statistics are gathered by callbacks (that may run just after the
+        # results are available).
+        while executor.statistics.executed < 4:
+            time.sleep(0.001)
+        self.assertRaises(futurist.RejectedSubmission,
+                          executor.submit, returns_one)
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, rejection.circuit_breaker, 0, 1, 1)
+        self.assertRaises(ValueError, rejection.circuit_breaker, 0.5, 0, 1)
+        self.assertRaises(ValueError, rejection.circuit_breaker, 0.5, 1, -1)
+
+
+class TestCallerRuns(testscenarios.TestWithScenarios, base.TestCase):
+    rejector = rejection.run_in_caller_when_reached(1)
+
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'executor_kwargs': {'check_and_reject': rejector,
+                                       'max_workers': 1},
+                   'event_cls': green_threading.Event,
+                   'future_cls': futurist.GreenFuture}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'executor_kwargs': {'check_and_reject': rejector,
+                                        'max_workers': 1},
+                    'event_cls': threading.Event,
+                    'future_cls': futurist.Future}),
+    ]
+
+    def setUp(self):
+        super(TestCallerRuns, self).setUp()
+        self.executor = self.executor_cls(**self.executor_kwargs)
+        self.addCleanup(self.executor.shutdown, wait=True)
+
+    def saturate(self):
+        ev = self.event_cls()
+        ev_thread_started = self.event_cls()
+        self.addCleanup(ev.set)
+
+        def wait_until_set(check_delay):
+            ev_thread_started.set()
+            while not ev.is_set():
+                ev.wait(check_delay)
+
+        # 1 worker + 1 item of backlog
+        self.saturated = [self.executor.submit(wait_until_set, 0.1)]
+        ev_thread_started.wait()
+        self.saturated.append(self.executor.submit(wait_until_set, 0.1))
+        return ev
+
+    def test_runs_in_caller(self):
+        ev = self.saturate()
+        caller = threading.current_thread()
+        fut = self.executor.submit(threading.current_thread)
+        self.assertIsInstance(fut, self.future_cls)
+        self.assertTrue(fut.done())
+        self.assertIs(caller, fut.result())
+        fut = self.executor.submit(blows_up)
+        self.assertTrue(fut.done())
+        self.assertRaises(RuntimeError, fut.result)
+
+        ev.set()
+        self.executor.shutdown()
+        stats = self.executor.statistics
+        self.assertEqual(2, stats.caller_runs)
+        self.assertEqual(4, stats.executed)
+        self.assertEqual(1, stats.failures)
+
+    def test_not_saturated(self):
+        fut = self.executor.submit(returns_one)
+        self.assertEqual(1, fut.result())
+        self.executor.shutdown()
+        self.assertEqual(0, self.executor.statistics.caller_runs)
+
+    def test_over_backlog_limit(self):
+        ev = self.saturate()
+        caller = threading.current_thread()
+        for i in range(1, 4):
+            fut = self.executor.submit(threading.current_thread)
+            self.assertIs(caller, fut.result())
+            self.assertEqual(i, self.executor.statistics.caller_runs)
+
+        # Once the backlog drains the workers run submissions again.
+        ev.set()
+        for fut in self.saturated:
+            fut.result()
+        self.assertEqual(1, self.executor.submit(returns_one).result())
+        self.executor.shutdown()
+        stats = self.executor.statistics
+        self.assertEqual(3, stats.caller_runs)
+        self.assertEqual(6, stats.executed)
+
+
+class TestSingleFlightExecutor(testscenarios.TestWithScenarios,
+                               base.TestCase):
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'event_cls': green_threading.Event,
+                   'future_cls': futurist.GreenFuture}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'event_cls': threading.Event,
+                    'future_cls': futurist.Future}),
+    ]
+
+    def setUp(self):
+        super(TestSingleFlightExecutor, self).setUp()
+        self.executor = futurist.SingleFlightExecutor(
+            self.executor_cls(max_workers=2))
+        self.addCleanup(self.executor.shutdown, wait=True)
+
+    def test_deduplicates_in_flight(self):
+        ev = self.event_cls()
+        self.addCleanup(ev.set)
+        calls = []
+
+        def load(key):
+            calls.append(key)
+            ev.wait()
+            return key * 2
+
+        fs = [self.executor.submit(load, 2) for _i in range(0, 10)]
+        other = self.executor.submit(load, 3)
+        self.assertIsInstance(fs[0], self.future_cls)
+        self.assertTrue(all(f is fs[0] for f in fs))
+        self.assertIsNot(fs[0], other)
+        stats = self.executor.single_flight_statistics
+        self.assertEqual((9, 2, 2), stats)
+
+        ev.set()
+        self.assertEqual(4, fs[0].result(timeout=5))
+        self.assertEqual(6, other.result(timeout=5))
+        self.assertEqual([2, 3], sorted(calls))
+        self.assertEqual(0, self.executor.single_flight_statistics.in_flight)
+
+        # Completed work is forgotten (so it runs again).
+        self.assertEqual(4, self.executor.submit(load, 2).result(timeout=5))
+        self.assertEqual(3, len(calls))
+
+    def test_explicit_key(self):
+        ev = self.event_cls()
+        self.addCleanup(ev.set)
+
+        def waits_then_returns(value):
+            ev.wait()
+            return value
+
+        fut = self.executor.submit_keyed('a', waits_then_returns, 1)
+        self.assertIs(fut, self.executor.submit_keyed('a', returns_one))
+        ev.set()
+        self.assertEqual(1, fut.result(timeout=5))
+
+    def test_unhashable_not_deduplicated(self):
+        ev = self.event_cls()
+        self.addCleanup(ev.set)
+
+        def waits_then_returns(value):
+            ev.wait()
+            return value
+
+        first = self.executor.submit(waits_then_returns, [1])
+        second = self.executor.submit(waits_then_returns, [1])
+        self.assertIsNot(first, second)
+        ev.set()
+        self.assertEqual([1], second.result(timeout=5))
+        self.assertEqual((0, 0, 0), self.executor.single_flight_statistics)
+
+    def test_failure_shared(self):
+        fut = self.executor.submit(blows_up)
+        self.assertRaises(RuntimeError, fut.result, timeout=5)
+        self.executor.shutdown()
+        self.assertEqual(1, self.executor.statistics.failures)
+
+    def test_rejected(self):
+        self.executor.shutdown()
+        self.assertRaises(RuntimeError, self.executor.submit, returns_one)
+        self.assertEqual(0, self.executor.single_flight_statistics.in_flight)
+
+
+class TestCachingExecutor(testscenarios.TestWithScenarios, base.TestCase):
+    # Synchronous executors (so results get cached before submit returns).
+    scenarios = [
+        ('green', {'green': True}),
+        ('thread', {'green': False}),
+    ]
+
+    def make_executor(self, **kwargs):
+        executor = futurist.CachingExecutor(
+            futurist.SynchronousExecutor(green=self.green), **kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_caches(self):
+        executor = self.make_executor()
+        calls = []
+
+        def lookup(key):
+            calls.append(key)
+            return key * 2
+
+        self.assertEqual(2, executor.submit(lookup, 1).result())
+        self.assertEqual(2, executor.submit(lookup, 1).result())
+        self.assertEqual(4, executor.submit(lookup, 2).result())
+        self.assertEqual([1, 2], calls)
+        self.assertEqual((1, 2, 0, 2), executor.cache_statistics)
+        self.assertEqual(2, executor.statistics.executed)
+
+        executor.clear()
+        self.assertEqual(2, executor.submit(lookup, 1).result())
+        self.assertEqual([1, 2, 1], calls)
+
+    def test_lru_eviction(self):
+        executor = self.make_executor(max_size=2)
+        calls = []
+        executor.submit_keyed('a', calls.append, 'a')
+        executor.submit_keyed('b', calls.append, 'b')
+        # Makes 'a' the most recently used (so 'b' gets evicted).
+        executor.submit_keyed('a', calls.append, 'a')
+        executor.submit_keyed('c', calls.append, 'c')
+        executor.submit_keyed('a', calls.append, 'a')
+        executor.submit_keyed('b', calls.append, 'b')
+        self.assertEqual(['a', 'b', 'c', 'b'], calls)
+        stats = executor.cache_statistics
+        self.assertEqual(2, stats.hits)
+        self.assertEqual(2, stats.evictions)
+        self.assertEqual(2, stats.size)
+
+    def test_ttl(self):
+        executor = self.make_executor(ttl=0.01)
+        calls = []
+        executor.submit_keyed('a', calls.append, 'a')
+        executor.submit_keyed('a', calls.append, 'a')
+        time.sleep(0.02)
+        executor.submit_keyed('a', calls.append, 'a')
+        self.assertEqual(['a', 'a'], calls)
+        self.assertEqual((1, 2, 1, 1), executor.cache_statistics)
+
+    def test_failures(self):
+        executor = self.make_executor()
+        executor.submit(blows_up)
+        fut = executor.submit(blows_up)
+        self.assertRaises(RuntimeError, fut.result)
+        self.assertEqual(2, executor.statistics.failures)
+        self.assertEqual(0, executor.cache_statistics.size)
+
+    def test_cache_failures(self):
+        executor = self.make_executor(cache_failures=True)
+        executor.submit(blows_up)
+        fut = executor.submit(blows_up)
+        self.assertRaises(RuntimeError, fut.result)
+        self.assertEqual(1, executor.statistics.failures)
+        self.assertEqual(1, executor.cache_statistics.hits)
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, self.make_executor, max_size=0)
+        self.assertRaises(ValueError, self.make_executor, ttl=-1)
+
+
+class TestBatchingExecutor(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'event_cls': green_threading.Event,
+                   'future_cls': futurist.GreenFuture}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'event_cls': threading.Event,
+                    'future_cls': futurist.Future}),
+    ]
+
+    def make_executor(self, batch_fn, **kwargs):
+        executor = futurist.BatchingExecutor(self.executor_cls(),
+                                             batch_fn, **kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_flush_when_full(self):
+        batches = []
+
+        def doubles(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        executor = self.make_executor(doubles, max_batch_size=3,
+                                      max_delay=60)
+        fs = [executor.submit(i) for i in range(0, 6)]
+        self.assertIsInstance(fs[0], self.future_cls)
+        self.assertEqual([0, 2, 4, 6, 8, 10],
+                         [f.result(timeout=5) for f in fs])
+        self.assertEqual([[0, 1, 2], [3, 4, 5]], batches)
+        stats = executor.batch_statistics
+        self.assertEqual(2, stats.batches)
+        self.assertEqual(6, stats.items)
+
+    def test_flush_after_delay(self):
+        executor = self.make_executor(lambda items: items,
+                                      max_batch_size=100, max_delay=0.01)
+        fs = [executor.submit(i) for i in range(0, 3)]
+        self.assertEqual([0, 1, 2], [f.result(timeout=5) for f in fs])
+        stats = executor.batch_statistics
+        self.assertEqual((1, 3), stats[0:2])
+        self.assertGreater(stats.flush_latency, 0)
+
+    def test_split_exceptions(self):
+
+        def checks(items):
+            return [item if item >= 0 else ValueError(item)
+                    for item in items]
+
+        executor = self.make_executor(checks, max_batch_size=2)
+        good, bad = executor.submit(1), executor.submit(-1)
+        self.assertEqual(1, good.result(timeout=5))
+        self.assertRaises(ValueError, bad.result, timeout=5)
+
+    def test_batch_blows_up(self):
+
+        def blows_up(items):
+            raise RuntimeError("no worky")
+
+        executor = self.make_executor(blows_up, max_batch_size=2)
+        fs = [executor.submit(i) for i in range(0, 2)]
+        for fut in fs:
+            self.assertRaises(RuntimeError, fut.result, timeout=5)
+        executor.shutdown()
+        self.assertEqual(1, executor.statistics.failures)
+
+    def test_wrong_result_count(self):
+        executor = self.make_executor(lambda items: [], max_batch_size=1)
+        self.assertRaises(ValueError, executor.submit(1).result, timeout=5)
+
+    def test_cancelled_skipped(self):
+        batches = []
+
+        def records(items):
+            batches.append(items)
+            return items
+
+        executor = self.make_executor(records, max_batch_size=100,
+                                      max_delay=60)
+        fs = [executor.submit(i) for i in range(0, 3)]
+        self.assertTrue(fs[1].cancel())
+        executor.flush()
+        self.assertEqual(2, fs[2].result(timeout=5))
+        self.assertEqual([[0, 2]], batches)
+
+    def test_shutdown_flushes(self):
+        executor = self.make_executor(lambda items: items,
+                                      max_batch_size=100, max_delay=60)
+        fut = executor.submit(1)
+        executor.shutdown()
+        self.assertEqual(1, fut.result(timeout=5))
+        self.assertFalse(executor.alive)
+        self.assertRaises(RuntimeError, executor.submit, 2)
+
+    def test_batch_cancelled(self):
+        inner = self.executor_cls(max_workers=1)
+        executor = futurist.BatchingExecutor(inner, lambda items: items,
+                                             max_delay=60)
+        self.addCleanup(executor.shutdown)
+        ev = self.event_cls()
+        self.addCleanup(ev.set)
+        started = self.event_cls()
+
+        def blocks():
+            started.set()
+            ev.wait()
+
+        inner.submit(blocks)
+        started.wait()
+        submitted = []
+        submit = inner.submit
+
+        def records_submit(fn, *args, **kwargs):
+            fut = submit(fn, *args, **kwargs)
+            submitted.append(fut)
+            return fut
+
+        inner.submit = records_submit
+        fs = [executor.submit(i) for i in range(0, 2)]
+        executor.flush()
+        # The batch is queued behind what blocks the only worker.
+        self.assertTrue(submitted[0].cancel())
+        for fut in fs:
+            self.assertRaises(futurist.CancelledError, fut.result, timeout=5)
+
+    def test_batch_rejected(self):
+        inner = self.executor_cls(
+            check_and_reject=rejection.reject_when_reached(0))
+        executor = futurist.BatchingExecutor(inner, lambda items: items,
+                                             max_delay=60)
+        self.addCleanup(executor.shutdown)
+        fut = executor.submit(1)
+        executor.flush()
+        self.assertRaises(futurist.RejectedSubmission, fut.result, timeout=5)
+
+    def test_map(self):
+        batches = []
+
+        def doubles(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        executor = self.make_executor(doubles, max_batch_size=2,
+                                      max_delay=60)
+        self.assertIsInstance(executor, futurist.Executor)
+        self.assertEqual([0, 2, 4, 6],
+                         list(executor.map(range(0, 4), timeout=5)))
+        self.assertEqual([[0, 1], [2, 3]], batches)
+
+    def test_submit_after(self):
+        executor = self.make_executor(lambda items: items, max_delay=0)
+        first = executor.submit(1)
+        second = executor.submit_after([first], 2)
+        self.assertEqual(2, second.result(timeout=5))
+        failed = self.future_cls()
+        failed.set_exception(RuntimeError("no worky"))
+        self.assertRaises(RuntimeError,
+                          executor.submit_after([failed], 3).result,
+                          timeout=5)
+
+    def test_context_manager(self):
+        with futurist.BatchingExecutor(self.executor_cls(),
+                                       lambda items: items,
+                                       max_delay=60) as executor:
+            fut = executor.submit(1)
+        self.assertFalse(executor.alive)
+        self.assertEqual(1, fut.result(timeout=5))
+
+
+class TestScheduledExecutor(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'future_cls': futurist.GreenFuture}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'future_cls': futurist.Future}),
+    ]
+
+    def setUp(self):
+        super(TestScheduledExecutor, self).setUp()
+        self.executor = futurist.ScheduledExecutor(self.executor_cls())
+        self.addCleanup(self.executor.shutdown)
+
+    def test_submit_delayed(self):
+        started_at = time.time()
+        fut = self.executor.submit_delayed(0.05, time.time)
+        self.assertIsInstance(fut, self.future_cls)
+        self.assertEqual(1, self.executor.pending)
+        self.assertGreaterEqual(fut.result(timeout=5) - started_at, 0.04)
+        self.assertEqual(0, self.executor.pending)
+        self.assertEqual(1, self.executor.statistics.executed)
+
+    def test_submit_at_order(self):
+        now = time.time()
+        called = []
+        fs = [self.executor.submit_at(now + 0.03, called.append, 3),
+              self.executor.submit_at(now + 0.01, called.append, 1),
+              self.executor.submit_at(now - 1, called.append, 0)]
+        waiters.wait_for_all(fs, timeout=5)
+        self.assertEqual([0, 1, 3], called)
+
+    def test_cancel(self):
+        called = []
+        fut = self.executor.submit_delayed(0.01, called.append, 1)
+        self.assertTrue(fut.cancel())
+        self.assertEqual(0, self.executor.pending)
+        self.executor.submit_delayed(0.02, called.append, 2).result(timeout=5)
+        self.assertEqual([2], called)
+        self.assertTrue(fut.cancelled())
+
+    def test_failure(self):
+        fut = self.executor.submit_delayed(0, blows_up)
+        self.assertRaises(RuntimeError, fut.result, timeout=5)
+
+    def test_shutdown_cancels_pending(self):
+        fut = self.executor.submit_delayed(60, returns_one)
+        self.executor.shutdown()
+        self.assertTrue(fut.cancelled())
+        self.assertEqual(0, self.executor.pending)
+        self.assertRaises(RuntimeError,
+                          self.executor.submit_delayed, 0, returns_one)
+
+
+class ActiveTracker(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.max_seen = 0
+
+    def enter(self):
+        with self.lock:
+            self.current += 1
+            self.max_seen = max(self.current, self.max_seen)
+
+    def exit(self):
+        with self.lock:
+            self.current -= 1
+
+
+class TestBulkheadExecutor(base.TestCase):
+    def setUp(self):
+        super(TestBulkheadExecutor, self).setUp()
+        self.executor = futurist.BulkheadExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+        self.ev = threading.Event()
+        self.addCleanup(self.ev.set)
+
+    def blocks(self, tracker):
+        tracker.enter()
+        try:
+            self.ev.wait()
+        finally:
+            tracker.exit()
+
+    def test_lane_cap(self):
+        noisy = self.executor.add_lane('noisy', max_workers=2)
+        tracker = ActiveTracker()
+        fs = [noisy.submit(self.blocks, tracker) for _i in range(0, 6)]
+        time.sleep(0.1)
+        self.assertEqual(2, tracker.current)
+        self.ev.set()
+        waiters.wait_for_all(fs, timeout=5)
+        self.assertEqual(2, tracker.max_seen)
+
+    def test_reserved_workers(self):
+        noisy = self.executor.add_lane('noisy', max_workers=4)
+        quiet = self.executor.add_lane('quiet', min_workers=1)
+        tracker = ActiveTracker()
+        noisy_fs = [noisy.submit(self.blocks, tracker)
+                    for _i in range(0, 10)]
+        time.sleep(0.1)
+        # The noisy lane borrowed all of the workers that are not reserved.
+        self.assertEqual(3, tracker.current)
+        # So the quiet lane runs right away (while the noisy lane is still
+        # saturating the pool).
+        self.assertEqual(1, quiet.submit(returns_one).result(timeout=5))
+        self.assertEqual(3, tracker.current)
+        self.ev.set()
+        waiters.wait_for_all(noisy_fs, timeout=5)
+        self.executor.shutdown()
+        self.assertEqual(3, tracker.max_seen)
+        stats = self.executor.lane_statistics
+        self.assertEqual(10, stats['noisy'].executed)
+        self.assertEqual(1, stats['quiet'].executed)
+        self.assertEqual(11, self.executor.statistics.executed)
+        self.assertEqual(1, quiet.statistics.executed)
+
+    def test_default_lane(self):
+        self.assertEqual([1, 2, 3], list(self.executor.map(abs, [-1, 2, -3])))
+        self.assertEqual(1, self.executor.submit(returns_one).result())
+        self.executor.shutdown()
+        self.assertEqual(4, self.executor.lane_statistics[None].executed)
+
+    def test_lane_runs_in_caller(self):
+        lane = self.executor.add_lane(
+            'a', max_workers=1,
+            check_and_reject=rejection.run_in_caller_when_reached(1))
+        tracker = ActiveTracker()
+        lane.submit(self.blocks, tracker)
+        while not tracker.current:
+            time.sleep(0.001)
+        lane.submit(returns_one)
+        fut = lane.submit(threading.current_thread)
+        self.assertIs(threading.current_thread(), fut.result(timeout=0))
+        self.ev.set()
+        self.executor.shutdown()
+        self.assertEqual(1, lane.statistics.caller_runs)
+        self.assertEqual(1, self.executor.statistics.caller_runs)
+
+    def test_reserved_first(self):
+        work_queue = _thread.LaneWorkQueue(4)
+        work_queue.add_lane('a', 0, 4)
+        work_queue.add_lane('b', 1, 4)
+
+        class Work(object):
+            def __init__(self, lane):
+                self.lane = lane
+
+        for lane in ['a', 'a', 'b']:
+            work_queue.put(Work(lane))
+        self.assertEqual('b', work_queue.get().lane)
+        self.assertEqual('a', work_queue.get().lane)
+
+    def test_lane_rejection(self):
+        lane = self.executor.add_lane(
+            'a', max_workers=1,
+            check_and_reject=rejection.reject_when_reached(1))
+        tracker = ActiveTracker()
+        lane.submit(self.blocks, tracker)
+        while not tracker.current:
+            time.sleep(0.001)
+        lane.submit(returns_one)
+        self.assertRaises(futurist.RejectedSubmission,
+                          lane.submit, returns_one)
+
+    def test_bad_lanes(self):
+        self.executor.add_lane('a', min_workers=3)
+        self.assertRaises(ValueError, self.executor.add_lane, 'a')
+        self.assertRaises(ValueError, self.executor.add_lane, 'b',
+                          min_workers=2)
+        self.assertRaises(ValueError, self.executor.add_lane, 'b',
+                          min_workers=1, max_workers=0)
+        self.assertRaises(KeyError, self.executor.submit_to, 'c',
+                          returns_one)
+
+
+class TestFairThreadPoolExecutor(base.TestCase):
+    def setUp(self):
+        super(TestFairThreadPoolExecutor, self).setUp()
+        self.executor = futurist.FairThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+        self.ev = threading.Event()
+        self.addCleanup(self.ev.set)
+        # Keep the only worker busy (so that the backlogs fill up).
+        started = threading.Event()
+        self.executor.submit_for('blocker', self.blocks, started)
+        started.wait()
+
+    def blocks(self, started):
+        started.set()
+        self.ev.wait()
+
+    def run_order(self, submissions):
+        order = []
+        fs = [self.executor.submit_for(tenant, order.append, tenant)
+              for tenant in submissions]
+        self.ev.set()
+        waiters.wait_for_all(fs, timeout=5)
+        return order
+
+    def test_round_robin(self):
+        order = self.run_order(['a'] * 4 + ['b'] * 2)
+        self.assertEqual(['a', 'b', 'a', 'b', 'a', 'a'], order)
+
+    def test_weighted(self):
+        self.executor.add_tenant('a', weight=2)
+        self.executor.add_tenant('b', weight=0.5)
+        order = self.run_order(['a'] * 6 + ['b'] * 3)
+        self.assertEqual(['a', 'a', 'a', 'a', 'b', 'a', 'a', 'b', 'b'],
+                         order)
+
+    def test_tenant_rejection(self):
+        self.executor.add_tenant(
+            'a', check_and_reject=rejection.reject_when_reached(2))
+        self.executor.submit_for('a', returns_one)
+        self.executor.submit_for('a', returns_one)
+        self.assertRaises(futurist.RejectedSubmission,
+                          self.executor.submit_for, 'a', returns_one)
+        self.executor.submit_for('b', returns_one)
+
+    def test_statistics(self):
+        self.executor.add_tenant('a')
+        self.executor.submit(returns_one)
+        self.executor.submit_for('a', returns_one)
+        time.sleep(0.01)
+        stats = self.executor.tenant_statistics
+        self.assertEqual(set(['a', None, 'blocker']), set(stats))
+        self.assertEqual((0, 1), stats['a'][0:2])
+        self.ev.set()
+        self.executor.shutdown()
+        # The statistics of tenants that were not added are kept after they
+        # have nothing queued.
+        stats = self.executor.tenant_statistics
+        self.assertEqual(set(['a', None, 'blocker']), set(stats))
+        self.assertEqual((1, 0), stats['a'][0:2])
+        self.assertEqual((1, 0), stats[None][0:2])
+        self.assertGreaterEqual(stats['a'].max_wait_time, 0.01)
+        self.assertGreaterEqual(stats[None].max_wait_time, 0.01)
+        self.assertEqual(3, self.executor.statistics.executed)
+
+    def test_bad_weight(self):
+        self.assertRaises(ValueError, self.executor.add_tenant, 'a',
+                          weight=0)
+
+    def test_short_lived_tenants(self):
+        fs = [self.executor.submit_for(i, returns_one)
+              for i in range(0, 1000)]
+        # (Along with the one that blocks.)
+        self.assertEqual(1001, len(self.executor.tenant_statistics))
+        self.ev.set()
+        waiters.wait_for_all(fs, timeout=5)
+        # Only the statistics of the most recent ones are kept.
+        stats = self.executor.tenant_statistics
+        max_retired = _thread.FairWorkQueue.MAX_RETIRED
+        self.assertEqual(set(range(1000 - max_retired, 1000)), set(stats))
+        self.assertEqual([(1, 0)] * max_retired,
+                         [s[0:2] for s in stats.values()])
+        self.assertEqual(0, len(self.executor._work_queue._tenants))
+
+    def test_returning_tenant(self):
+        self.executor.submit_for('a', returns_one)
+        self.ev.set()
+        self.executor.submit_for('blocker', returns_one).result()
+        waiters.wait_for_all([self.executor.submit_for('a', returns_one)])
+        self.assertEqual((2, 0),
+                         self.executor.tenant_statistics['a'][0:2])
+
+    def test_helped_not_queued(self):
+        executor = futurist.FairThreadPoolExecutor(max_workers=1,
+                                                   help_while_waiting=True)
+        self.addCleanup(executor.shutdown)
+
+        def waits_on_queued():
+            executor.submit_for('a', returns_one).result()
+            return executor.tenant_statistics
+
+        stats = executor.submit_for('b', waits_on_queued).result()
+        # Neither has anything left queued.
+        self.assertEqual({'a': 0, 'b': 0},
+                         dict((name, s.backlog) for name, s in stats.items()))
+
+
+def waits_on(ev):
+    ev.wait()
+
+
+class TestWatchdog(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('sync', {'executor_cls': futurist.SynchronousExecutor}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor}),
+        ('fair', {'executor_cls': futurist.FairThreadPoolExecutor}),
+    ]
+
+    def setUp(self):
+        super(TestWatchdog, self).setUp()
+        self.reports = []
+        self.reported = threading.Event()
+        self.watchdog = futurist.Watchdog(0.05, on_stuck=self.on_stuck)
+        self.addCleanup(self.watchdog.stop)
+        self.executor = self.executor_cls(watchdog=self.watchdog)
+        self.addCleanup(self.executor.shutdown)
+
+    def on_stuck(self, stuck):
+        self.reports.append(stuck)
+        self.reported.set()
+
+    def test_reports_stuck(self):
+        ev = threading.Event()
+        self.addCleanup(ev.set)
+        if self.executor_cls is futurist.SynchronousExecutor:
+            # Gets stuck in the caller, so it has to be un-stuck by another
+            # thread once reported.
+            unstick = threading.Thread(
+                target=lambda: self.reported.wait(5) and ev.set())
+            unstick.start()
+            self.addCleanup(unstick.join)
+            fut = self.executor.submit(waits_on, ev)
+        else:
+            fut = self.executor.submit(waits_on, ev)
+            self.assertTrue(self.reported.wait(5))
+            ev.set()
+        fut.result(timeout=5)
+        self.assertEqual(1, len(self.reports))
+        stuck = self.reports[0]
+        self.assertEqual(__name__ + '.waits_on', stuck.name)
+        self.assertGreaterEqual(stuck.elapsed, 0.05)
+        self.assertIn('ev.wait()', stuck.stack)
+
+    def test_nothing_stuck(self):
+        fs = [self.executor.submit(returns_one) for _i in range(0, 10)]
+        self.assertEqual([1] * 10, [f.result(timeout=5) for f in fs])
+        time.sleep(0.1)
+        self.assertEqual([], self.reports)
+        self.assertEqual({}, self.watchdog._running)
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, futurist.Watchdog, 0)
+        self.assertRaises(ValueError, futurist.Watchdog, 1, check_every=0)
+
+
+def spins_until(ev):
+    while not ev.is_set():
+        pass
+
+
+class TestSamplingProfiler(base.TestCase):
+    def setUp(self):
+        super(TestSamplingProfiler, self).setUp()
+        self.executor = futurist.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def wait_for_samples(self, profiler, samples, timeout=5):
+        deadline = time.time() + timeout
+        while profiler.samples < samples:
+            if time.time() > deadline:
+                self.fail("Only %s of %s samples taken in %s seconds"
+                          % (profiler.samples, samples, timeout))
+            time.sleep(0.01)
+
+    def test_samples_running_work(self):
+        profiler = futurist.SamplingProfiler(self.executor, interval=0.001)
+        ev = threading.Event()
+        self.addCleanup(ev.set)
+        with profiler:
+            self.assertTrue(profiler.running)
+            fut = self.executor.submit(spins_until, ev)
+            self.wait_for_samples(profiler, 20)
+            ev.set()
+            fut.result(timeout=5)
+        self.assertFalse(profiler.running)
+        name = __name__ + '.spins_until'
+        counts = profiler.callback_samples()
+        self.assertEqual([name], list(counts))
+        self.assertGreater(counts[name], 0)
+        for line in profiler.collapsed().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith(name))
+            self.assertGreater(int(count), 0)
+        profiler.reset()
+        self.assertEqual(0, profiler.samples)
+        self.assertEqual({}, profiler.callback_samples())
+        self.assertEqual("", profiler.collapsed())
+
+    def test_idle_workers_not_counted(self):
+        self.executor.submit(returns_one).result()
+        profiler = futurist.SamplingProfiler(self.executor, interval=0.001)
+        with profiler:
+            self.wait_for_samples(profiler, 10)
+        self.assertEqual({}, profiler.callback_samples())
+
+    def test_started_before_workers(self):
+        # No workers exist yet (they are started as work is submitted).
+        profiler = futurist.SamplingProfiler(self.executor, interval=0.001)
+        ev = threading.Event()
+        self.addCleanup(ev.set)
+        with profiler:
+            self.wait_for_samples(profiler, 5)
+            fut = self.executor.submit(spins_until, ev)
+            samples = profiler.samples
+            self.wait_for_samples(profiler, samples + 20)
+            ev.set()
+            fut.result(timeout=5)
+        self.assertIn(__name__ + '.spins_until', profiler.callback_samples())
+
+    def test_unsupported_executors(self):
+        for executor_cls in (futurist.GreenThreadPoolExecutor,
+                             futurist.SynchronousExecutor):
+            executor = executor_cls()
+            self.addCleanup(executor.shutdown)
+            self.assertRaises(ValueError, futurist.SamplingProfiler,
+                              executor)
+        self.assertRaises(ValueError, futurist.SamplingProfiler,
+                          self.executor, interval=0)
+
+
+class TestProcessPoolExecutor(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('fork', {'mp_context': 'fork'}),
+        ('spawn', {'mp_context': 'spawn'}),
+        ('forkserver', {'mp_context': 'forkserver'}),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestProcessPoolExecutor, cls).setUpClass()
+        # The fork server (which is shared and only started once) keeps its
+        # socket in this directory; ensure it gets created outside of the
+        # per-test temporary directories (which get removed after each test).
+        multiprocessing.util.get_temp_dir()
+
+    def make_executor(self, **kwargs):
+        executor = futurist.ProcessPoolExecutor(mp_context=self.mp_context,
+                                                **kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_run_one(self):
+        executor = self.make_executor(max_workers=1)
+        self.assertEqual(1, executor.submit(returns_one).result())
+
+    def test_preload_modules(self):
+        executor = self.make_executor(max_workers=1,
+                                      preload_modules=['colorsys'])
+        self.assertTrue(executor.submit(is_imported, 'colorsys').result())
+
+    def test_preload_failure(self):
+        executor = self.make_executor(max_workers=1,
+                                      preload_modules=['not_a_module_'])
+        fut = executor.submit(returns_one)
+        self.assertRaises(ImportError, fut.result)
+
+    def test_prestart(self):
+        executor = self.make_executor(max_workers=2, prestart=True)
+        pids = set(p.pid for p in executor._pool.workers)
+        self.assertEqual(2, len(pids))
+        fs = [executor.submit(returns_pid) for _i in range(0, 10)]
+        self.assertTrue(set(f.result() for f in fs).issubset(pids))
+
+    def test_early_death_replaced(self):
+        # Children take a while to start up (and become ready), so one can
+        # be killed while it is still doing so.
+        executor = self.make_executor(max_workers=1, prestart=True,
+                                      preload_modules=[slow_start(self)])
+        first_pid = executor._pool.workers[0].pid
+        os.kill(first_pid, signal.SIGKILL)
+        # It gets replaced (even though nothing was submitted).
+        deadline = time.time() + 10
+        while True:
+            pids = [p.pid for p in executor._pool.workers]
+            if pids and pids != [first_pid]:
+                break
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(pids[0], executor.submit(returns_pid).result())
+
+    def test_dead_worker_replaced(self):
+        executor = self.make_executor(max_workers=1, prestart=True)
+        first_pid = executor.submit(returns_pid).result()
+        fut = executor.submit(exits_abruptly)
+        self.assertRaises(futurist.BrokenProcessPool, fut.result)
+        second_pid = executor.submit(returns_pid).result()
+        self.assertNotEqual(first_pid, second_pid)
+        executor.shutdown()
+        self.assertEqual(3, executor.statistics.executed)
+        self.assertEqual(1, executor.statistics.failures)
+
+    def test_polled(self):
+        # Like on python 2.7 (which can not wait on processes and many
+        # connections at once).
+        self.useFixture(fixtures.MonkeyPatch(
+            'futurist._process._wait', _process._poll_wait))
+        self.useFixture(fixtures.MonkeyPatch(
+            'futurist._process._sentinel', _process._ProcessSentinel))
+        executor = self.make_executor(max_workers=2)
+        fs = [executor.submit(returns_pid) for _i in range(0, 10)]
+        self.assertEqual(10, len([f.result() for f in fs]))
+        fut = executor.submit(exits_abruptly)
+        self.assertRaises(futurist.BrokenProcessPool, fut.result)
+        self.assertEqual(1, executor.submit(returns_one).result())
+
+    def test_wakeup_while_draining(self):
+        executor = self.make_executor(max_workers=1)
+        pool = executor._pool
+        pool._wakeup()
+        poll = pool._wakeup_reader.poll
+        waker = threading.Thread(target=pool._wakeup)
+
+        def polls():
+            if waker.ident is None:
+                # Wake it up (again) while it drains the earlier wakeups.
+                waker.start()
+                time.sleep(0.05)
+            return poll()
+
+        with mock.patch.object(pool._wakeup_reader, 'poll',
+                               side_effect=polls):
+            pool._drain_wakeups()
+        waker.join()
+        # Only marked as sent if there is a wakeup left to drain.
+        self.assertEqual(pool._wakeup_sent, pool._wakeup_reader.poll())
+
+    def test_unpicklable_submission(self):
+        executor = self.make_executor(max_workers=1)
+        fut = executor.submit(lambda: 1)
+        self.assertIsNotNone(fut.exception())
+        self.assertEqual(1, executor.submit(returns_one).result())
+
+    def test_callable_cache(self):
+        executor = self.make_executor(max_workers=1, callable_cache_size=2)
+        counter = UnpickleCounter('a')
+        fs = [executor.submit(counter) for _i in range(0, 5)]
+        self.assertEqual([1] * 5, [f.result() for f in fs])
+
+    def test_callable_cache_eviction(self):
+        executor = self.make_executor(max_workers=1, callable_cache_size=1)
+        a = UnpickleCounter('a')
+        b = UnpickleCounter('b')
+        fs = [executor.submit(a), executor.submit(b), executor.submit(a)]
+        self.assertEqual([1, 2, 3], [f.result() for f in fs])
+
+    def test_callable_cache_unhashable(self):
+        executor = self.make_executor(max_workers=1, callable_cache_size=2)
+        counter = Unhashable('a')
+        fs = [executor.submit(counter) for _i in range(0, 3)]
+        self.assertEqual([1, 2, 3], [f.result() for f in fs])
+
+    def test_no_callable_cache(self):
+        executor = self.make_executor(max_workers=1)
+        counter = UnpickleCounter('a')
+        fs = [executor.submit(counter) for _i in range(0, 3)]
+        self.assertEqual([1, 2, 3], [f.result() for f in fs])
+
+    def test_bad_context(self):
+        self.assertRaises(ValueError, futurist.ProcessPoolExecutor,
+                          mp_context='not-a-start-method')
+
+
+class TestAffinityProcessPoolExecutor(base.TestCase):
+    def make_executor(self, **kwargs):
+        executor = futurist.AffinityProcessPoolExecutor(**kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_same_key_same_process(self):
+        executor = self.make_executor(max_workers=4)
+        for key in range(0, 20):
+            fs = [executor.submit(returns_pid, affinity_key=key)
+                  for _i in range(0, 5)]
+            self.assertEqual(1, len(set(f.result() for f in fs)))
+
+    def test_keys_spread(self):
+        executor = self.make_executor(max_workers=4, max_worker_backlog=None)
+        fs = [executor.submit(returns_pid, affinity_key=key)
+              for key in range(0, 100)]
+        self.assertGreater(len(set(f.result() for f in fs)), 1)
+        stats = executor.worker_statistics
+        self.assertEqual(4, len(stats))
+        self.assertEqual(100, sum(s.routed for s in stats))
+        self.assertEqual(0, sum(s.overflowed for s in stats))
+        self.assertEqual(100, sum(s.dispatched for s in stats))
+
+    def test_saturated_falls_back(self):
+        executor = self.make_executor(max_workers=2, max_worker_backlog=1)
+        fs = [executor.submit(delayed, 0.1, affinity_key='a')
+              for _i in range(0, 6)]
+        waiters.wait_for_all(fs)
+        stats = executor.worker_statistics
+        self.assertEqual(6, sum(s.routed for s in stats))
+        self.assertGreater(sum(s.overflowed for s in stats), 0)
+        self.assertEqual(0, sum(s.backlog for s in stats))
+        self.assertEqual(6, executor.statistics.executed)
+
+    def test_replaced_keeps_keys(self):
+        executor = self.make_executor(max_workers=2)
+        first_pid = executor.submit(returns_pid, affinity_key='a').result()
+        fut = executor.submit(exits_abruptly, affinity_key='a')
+        self.assertRaises(futurist.BrokenProcessPool, fut.result)
+        wait_until_ready(executor)
+        slot = executor._pool.locate('a')
+        replacement_pid = executor.worker_statistics[slot].pid
+        self.assertNotEqual(first_pid, replacement_pid)
+        for _i in range(0, 3):
+            self.assertEqual(replacement_pid, executor.submit(
+                returns_pid, affinity_key='a').result())
+
+    def test_dead_falls_back(self):
+        executor = self.make_executor(max_workers=2,
+                                      preload_modules=[slow_start(self)])
+        wait_until_ready(executor)
+        slot = executor._pool.locate('a')
+        pids = [s.pid for s in executor.worker_statistics]
+        dead_pid, other_pid = pids[slot], pids[1 - slot]
+        os.kill(dead_pid, signal.SIGKILL)
+        deadline = time.time() + 10
+        while dead_pid in [p.pid for p in executor._pool.workers]:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        # Its replacement is starting up (slowly), so any other child runs
+        # the work meanwhile.
+        fs = [executor.submit(returns_pid, affinity_key='a')
+              for _i in range(0, 3)]
+        self.assertEqual([other_pid] * 3,
+                         [f.result(timeout=0.4) for f in fs])
+        self.assertEqual(3, executor.worker_statistics[slot].overflowed)
+
+    def test_statistics_while_dying(self):
+        executor = self.make_executor(max_workers=2)
+        stop = threading.Event()
+        self.addCleanup(stop.set)
+        errors = []
+
+        def reads_statistics():
+            while not stop.is_set():
+                try:
+                    executor.worker_statistics
+                except Exception as e:
+                    errors.append(e)
+
+        reader = threading.Thread(target=reads_statistics)
+        reader.start()
+        for _i in range(0, 5):
+            fut = executor.submit(exits_abruptly, affinity_key='a')
+            self.assertRaises(futurist.BrokenProcessPool, fut.result)
+        stop.set()
+        reader.join()
+        self.assertEqual([], errors)
+
+    def test_stream_routed(self):
+        executor = self.make_executor(max_workers=4)
+        pid = executor.submit(returns_pid, affinity_key='a').result()
+        stream = executor.submit_stream(yields_pid, affinity_key='a')
+        self.assertEqual([pid], list(stream))
+
+
+class TestHelpingThreadPoolExecutor(base.TestCase):
+    def make_executor(self, **kwargs):
+        executor = futurist.ThreadPoolExecutor(help_while_waiting=True,
+                                               **kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_recursive_fan_out(self):
+        # Without helping both workers end up blocked waiting on work
+        # that is queued behind them (and never runs).
+        executor = self.make_executor(max_workers=2)
+        fan_out = FanOut()
+        fan_out.executor = executor
+        fut = executor.submit(fan_out, 8)
+        self.assertEqual(2 ** 8, fut.result(timeout=30))
+        self.assertEqual(2 ** 9 - 1, executor.statistics.executed)
+
+    def test_single_worker(self):
+        executor = self.make_executor(max_workers=1)
+        fan_out = FanOut()
+        fan_out.executor = executor
+        self.assertEqual(2 ** 4, executor.submit(fan_out, 4).result())
+
+    def test_outside_worker(self):
+        executor = self.make_executor(max_workers=1)
+        self.assertEqual(1, executor.submit(returns_one).result())
+        fut = executor.submit(blows_up)
+        self.assertIsInstance(fut.exception(), RuntimeError)
+
+    def test_other_executor_not_helped(self):
+        executor = self.make_executor(max_workers=1)
+        other = self.make_executor(max_workers=1)
+        blocker = threading.Event()
+        other.submit(blocker.wait)
+        queued = other.submit(returns_one)
+
+        def waits_on_other():
+            try:
+                return queued.result(timeout=0.1)
+            finally:
+                blocker.set()
+
+        fut = executor.submit(waits_on_other)
+        self.assertRaises(futurist.TimeoutError, fut.result)
+        self.assertEqual(1, queued.result())
+
+    def test_timeout_not_helped(self):
+        executor = self.make_executor(max_workers=1)
+
+        def waits_on_queued():
+            queued = executor.submit(returns_one)
+            self.assertRaises(futurist.TimeoutError,
+                              queued.result, timeout=0.1)
+            return queued
+
+        queued = executor.submit(waits_on_queued).result()
+        self.assertEqual(1, queued.result())
+
+    def test_helped_not_queued(self):
+        waiting = []
+
+        def check_and_reject(executor, backlog):
+            waiting.append(backlog)
+
+        executor = self.make_executor(max_workers=1,
+                                      check_and_reject=check_and_reject)
+
+        def waits_on_queued():
+            executor.submit(returns_one).result()
+            executor.submit(returns_one)
+
+        executor.submit(waits_on_queued).result()
+        self.assertEqual([0, 0, 0], waiting)
+
+
+@testtools.skipIf(asyncio is None, "asyncio is not available")
+class TestAsyncioExecutor(base.TestCase):
+    def make_executor(self, **kwargs):
+        executor = futurist.AsyncioExecutor(**kwargs)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def test_run_one(self):
+        executor = self.make_executor()
+        fut = executor.submit(asyncio.sleep, 0, result=1)
+        self.assertEqual(1, fut.result())
+
+    def test_blows_up(self):
+        executor = self.make_executor()
+        fut = executor.submit(fails_later)
+        self.assertRaises(RuntimeError, fut.result)
+        fut = executor.submit(blows_up)
+        self.assertRaises(RuntimeError, fut.result)
+
+    def test_plain_function(self):
+        executor = self.make_executor()
+        self.assertEqual(1, executor.submit(returns_one).result())
+
+    def test_many_concurrently(self):
+        executor = self.make_executor(max_loops=2)
+        tracker = ConcurrencyTracker()
+        fs = [executor.submit(tracker, 0.2) for _i in range(0, 1000)]
+        done, not_done = waiters.wait_for_all(fs, timeout=10)
+        self.assertEqual(0, len(not_done))
+        self.assertGreater(tracker.most_active, 1)
+        self.assertEqual(2, len(executor._loops))
+
+    def test_loops_forgotten(self):
+        executor = self.make_executor(max_loops=2)
+        fs = [executor.submit(returns_one) for _i in range(0, 10)]
+        waiters.wait_for_all(fs)
+        loops = [t.loop for t in executor._loops]
+        executor.shutdown()
+        for loop in loops:
+            self.assertTrue(loop.is_closed())
+            self.assertNotIn(loop, _asyncio._bridges)
+
+    def test_max_concurrency(self):
+        executor = self.make_executor(max_concurrency=2)
+        tracker = ConcurrencyTracker()
+        fs = [executor.submit(tracker, 0.01) for _i in range(0, 20)]
+        waiters.wait_for_all(fs)
+        self.assertEqual(2, tracker.most_active)
+        self.assertEqual(20, executor.statistics.executed)
+
+    def test_rejection(self):
+        executor = self.make_executor(
+            max_concurrency=1,
+            check_and_reject=rejection.reject_when_reached(1))
+        executor.submit(asyncio.sleep, 0.1)
+        executor.submit(asyncio.sleep, 0.1)
+        self.assertRaises(futurist.RejectedSubmission,
+                          executor.submit, asyncio.sleep, 0.1)
+
+    def test_graceful_shutdown(self):
+        executor = futurist.AsyncioExecutor(max_concurrency=1)
+        fs = [executor.submit(asyncio.sleep, 0.05, result=i)
+              for i in range(0, 3)]
+        executor.shutdown()
+        self.assertEqual([0, 1, 2], [f.result(timeout=0) for f in fs])
+        self.assertEqual(3, executor.statistics.executed)
+        self.assertFalse(executor.alive)
+        self.assertRaises(RuntimeError, executor.submit, asyncio.sleep, 0)
+        for t in executor._loops:
+            self.assertFalse(t.is_alive())
+
+
+class TestSharedStatistics(base.TestCase):
+    def setUp(self):
+        super(TestSharedStatistics, self).setUp()
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(tmp_dir, 'stats')
+
+    def test_process_pool(self):
+        statistics = futurist.SharedStatistics(self.path)
+        executor = futurist.ProcessPoolExecutor(max_workers=2,
+                                                shared_statistics=statistics)
+        self.addCleanup(executor.shutdown)
+        fs = [executor.submit(returns_one) for _i in range(0, 5)]
+        fs.append(executor.submit(blows_up))
+        waiters.wait_for_all(fs)
+        pids = set(p.pid for p in executor._pool.workers)
+        self.assertTrue(set(p.pid for p in statistics.processes()) <= pids)
+        snapshot = statistics.snapshot()
+        self.assertEqual(6, snapshot.executed)
+        self.assertEqual(1, snapshot.failures)
+        self.assertEqual(0, snapshot.cancelled)
+
+    def test_sibling_processes(self):
+        statistics = futurist.SharedStatistics(self.path)
+        for executed in (1, 2, 3):
+            child = multiprocessing.Process(target=records_into,
+                                            args=(self.path, executed))
+            child.start()
+            child.join()
+        statistics.record(executed=4, failures=1, cancelled=2)
+        # Slots of the exited children got folded into the total.
+        processes = statistics.processes()
+        self.assertEqual([os.getpid()], [p.pid for p in processes])
+        snapshot = statistics.snapshot()
+        self.assertEqual(10, snapshot.executed)
+        self.assertEqual(1, snapshot.failures)
+        self.assertEqual(2, snapshot.cancelled)
+        self.assertAlmostEqual(1.5, snapshot.runtime)
+
+    def test_concurrent_reads_not_torn(self):
+        statistics = futurist.SharedStatistics(self.path)
+        child = multiprocessing.Process(target=records_in_lockstep,
+                                        args=(self.path, 20000))
+        child.start()
+        self.addCleanup(child.join)
+        reads = 0
+        while child.is_alive() or reads == 0:
+            for p in statistics.processes():
+                # Always recorded together, so a read that mixes two
+                # writes would show them differing.
+                self.assertEqual(p.executed, p.failures)
+                self.assertEqual(p.executed, p.cancelled)
+            totals = statistics.totals()
+            self.assertEqual(totals['executed'], totals['failures'])
+            reads += 1
+        child.join()
+        self.assertEqual(20000, statistics.snapshot().executed)
+
+    def test_writer_died_while_writing(self):
+        statistics = futurist.SharedStatistics(self.path)
+        child = multiprocessing.Process(target=records_into,
+                                        args=(self.path, 1))
+        child.start()
+        child.join()
+        slot = [p.pid for p in statistics.processes()].index(child.pid) + 1
+        # Make it look like the child died while writing its slot.
+        offset = statistics._offset(slot)
+        (seq,) = _shared._SEQ.unpack_from(statistics._map, offset)
+        _shared._SEQ.pack_into(statistics._map, offset, seq + 1)
+        self.assertEqual([], statistics.processes())
+        statistics.record(executed=2)
+        self.assertEqual([os.getpid()],
+                         [p.pid for p in statistics.processes()])
+        # What the child recorded (being torn) got dropped.
+        self.assertEqual(2, statistics.snapshot().executed)
+
+    def test_not_statistics(self):
+        with open(self.path, 'wb') as fh:
+            fh.write(b'\x00' * 1024)
+        self.assertRaises(ValueError, futurist.SharedStatistics, self.path)
+
+
+class TestStreams(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor}),
+        ('process', {'executor_cls': futurist.ProcessPoolExecutor}),
+    ]
+
+    def setUp(self):
+        super(TestStreams, self).setUp()
+        self.executor = self.executor_cls(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_stream(self):
+        stream = self.executor.submit_stream(counts_up, 100,
+                                             stream_chunk_size=7)
+        self.assertEqual(list(range(0, 100)), list(stream))
+        self.assertEqual(100, stream.future.result())
+
+    def test_stream_empty(self):
+        stream = self.executor.submit_stream(counts_up, 0)
+        self.assertEqual([], list(stream))
+        self.assertEqual(0, stream.future.result())
+
+    def test_stream_blows_up(self):
+        stream = self.executor.submit_stream(counts_up_then_blows_up, 10)
+        items = []
+        self.assertRaises(RuntimeError, items.extend, stream)
+        self.assertEqual(list(range(0, 10)), items)
+        self.executor.shutdown()
+        self.assertEqual(1, self.executor.statistics.failures)
+
+    def test_stream_backpressure_and_cancel(self):
+        stream = self.executor.submit_stream(counts_forever,
+                                             stream_chunk_size=2,
+                                             stream_max_chunks=2)
+        for i, item in enumerate(stream):
+            self.assertEqual(i, item)
+            if i == 9:
+                break
+        self.assertFalse(stream.future.done())
+        stream.cancel()
+        self.assertRaises(futurist.CancelledError, next, stream)
+        produced = stream.future.result()
+        # What was consumed, plus what was buffered (and being produced).
+        self.assertGreaterEqual(produced, 10)
+        self.assertLessEqual(produced, 10 + 2 * 4)
+
+    def test_cancel_before_running(self):
+        blockers = [self.executor.submit(delayed, 0.2) for _i in range(0, 2)]
+        stream = self.executor.submit_stream(counts_forever)
+        stream.cancel()
+        self.assertRaises(futurist.CancelledError, list, stream)
+        self.assertTrue(stream.future.cancelled())
+        waiters.wait_for_all(blockers)
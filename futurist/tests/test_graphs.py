@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import time
+
+import testscenarios
+
+import futurist
+from futurist import graphs
+from futurist.tests import base
+from futurist import waiters
+
+
+def add(*values):
+    return sum(values)
+
+
+def delayed_value(delay, value):
+    time.sleep(delay)
+    return value
+
+
+def passes_on_later(value, delay):
+    time.sleep(delay)
+    return value
+
+
+def blows_up(*values):
+    raise RuntimeError("Broken")
+
+
+class TestSubmitAfter(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('sync', {'executor_cls': futurist.SynchronousExecutor,
+                  'executor_kwargs': {}}),
+        ('green_sync', {'executor_cls': futurist.SynchronousExecutor,
+                        'executor_kwargs': {'green': True}}),
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'executor_kwargs': {}}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'executor_kwargs': {'max_workers': 1}}),
+        ('process', {'executor_cls': futurist.ProcessPoolExecutor,
+                     'executor_kwargs': {'max_workers': 1}}),
+    ]
+
+    def setUp(self):
+        super(TestSubmitAfter, self).setUp()
+        self.executor = self.executor_cls(**self.executor_kwargs)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_submit_after(self):
+        a = self.executor.submit(add, 1)
+        b = self.executor.submit(add, 2)
+        c = self.executor.submit_after([a, b], add, 3)
+        self.assertEqual(6, c.result(timeout=10))
+
+    def test_submit_after_nothing(self):
+        fut = self.executor.submit_after([], add, 1, 2)
+        self.assertEqual(3, fut.result(timeout=10))
+
+    def test_uses_executor_locks(self):
+        threading = self.executor.threading
+        lock_object = threading.lock_object
+        made = []
+
+        def recording_lock_object(*args, **kwargs):
+            lock = lock_object(*args, **kwargs)
+            made.append(lock)
+            return lock
+
+        threading.lock_object = recording_lock_object
+        self.addCleanup(delattr, threading, 'lock_object')
+        a = self.executor.submit(add, 1)
+        fut = self.executor.submit_after([a], add, 2)
+        self.assertEqual(3, fut.result(timeout=10))
+        self.assertIsInstance(self.executor, futurist.Executor)
+        self.assertEqual(1, len(made))
+        self.assertIsInstance(made[0], type(lock_object()))
+
+    def test_failure_propagates(self):
+        a = self.executor.submit(blows_up)
+        b = self.executor.submit_after([a], add)
+        c = self.executor.submit_after([b], add)
+        self.assertRaises(RuntimeError, c.result, timeout=10)
+        waiters.wait_for_all([a, b, c])
+        self.assertEqual(1, self.executor.statistics.executed)
+
+    def test_cancel_propagates(self):
+        a = futurist.Future()
+        b = self.executor.submit_after([a], add)
+        c = self.executor.submit_after([b], add)
+        a.cancel()
+        self.assertTrue(b.cancelled())
+        self.assertTrue(c.cancelled())
+
+    def test_cancel_dependent(self):
+        a = futurist.Future()
+        b = self.executor.submit_after([a], add)
+        self.assertTrue(b.cancel())
+        a.set_result(1)
+        self.assertFalse(a.cancelled())
+        self.assertEqual(0, self.executor.statistics.executed)
+
+
+class TestTaskGraph(base.TestCase):
+    def setUp(self):
+        super(TestTaskGraph, self).setUp()
+        self.executor = futurist.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_run(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('a', add, args=(1,))
+        graph.add('b', add, args=(2,))
+        graph.add('c', add, requires=['a', 'b'], args=(3,))
+        graph.add('d', add, requires=['c', 'a'])
+        fs = graph.run()
+        self.assertEqual(['a', 'b', 'c', 'd'], list(fs))
+        self.assertEqual(7, fs['d'].result(timeout=10))
+
+    def test_cycle(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('a', add, requires=['c'])
+        graph.add('b', add, requires=['a'])
+        graph.add('c', add, requires=['b'])
+        graph.add('d', add)
+        e = self.assertRaises(ValueError, graph.run)
+        self.assertIn("Cycle detected", str(e))
+        self.assertEqual(0, self.executor.statistics.executed)
+
+    def test_self_cycle(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('a', add, requires=['a'])
+        self.assertRaises(ValueError, graph.validate)
+
+    def test_unknown_requirement(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('a', add, requires=['b'])
+        self.assertRaises(ValueError, graph.validate)
+
+    def test_duplicate(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('a', add)
+        self.assertRaises(ValueError, graph.add, 'a', add)
+
+    def test_long_chain(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add(0, add, args=(1,))
+        for i in range(1, 5000):
+            graph.add(i, add, requires=[i - 1], args=(1,))
+        fs = graph.run()
+        self.assertEqual(5000, fs[4999].result(timeout=30))
+
+    def test_failure(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('a', blows_up)
+        graph.add('b', add, args=(1,))
+        graph.add('c', add, requires=['a', 'b'])
+        fs = graph.run()
+        self.assertRaises(RuntimeError, fs['c'].result, timeout=10)
+        self.assertEqual(1, fs['b'].result(timeout=10))
+
+    def test_statistics(self):
+        graph = graphs.TaskGraph(self.executor)
+        graph.add('slow', delayed_value, args=(0.2, 1))
+        graph.add('fast', delayed_value, args=(0.01, 2))
+        graph.add('after_slow', passes_on_later, requires=['slow'],
+                  args=(0.1,))
+        graph.add('join', add, requires=['after_slow', 'fast'])
+        fs = graph.run()
+        self.assertEqual(3, fs['join'].result(timeout=10))
+        stats = graph.statistics
+        self.assertEqual(['slow', 'after_slow', 'join'],
+                         stats.critical_path)
+        self.assertGreaterEqual(stats.critical_path_time, 0.29)
+        self.assertGreaterEqual(stats.elapsed, stats.critical_path_time)
+        self.assertGreaterEqual(stats.runtime, 0.3)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+import eventlet
+import testscenarios
+
+import futurist
+from futurist import hedging
+from futurist.tests import base
+
+
+class SlowFirst(object):
+    """Callable whose first call is slow (and later ones are fast)."""
+
+    def __init__(self, delay, use_eventlet_sleep=False):
+        self.delay = delay
+        self.use_eventlet_sleep = use_eventlet_sleep
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            if self.use_eventlet_sleep:
+                eventlet.sleep(self.delay)
+            else:
+                time.sleep(self.delay)
+        return (call, value)
+
+
+class FailsFirst(object):
+    """Callable whose first call fails (before a slower second succeeds)."""
+
+    def __init__(self, use_eventlet_sleep=False):
+        self.sleep = eventlet.sleep if use_eventlet_sleep else time.sleep
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            self.sleep(0.1)
+            raise RuntimeError("Broken")
+        self.sleep(0.2)
+        return call
+
+
+def returns(value):
+    return value
+
+
+def blows_up():
+    raise RuntimeError("Broken")
+
+
+class TestHedging(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'future_cls': futurist.GreenFuture,
+                   'use_eventlet_sleep': True}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'future_cls': futurist.Future,
+                    'use_eventlet_sleep': False}),
+    ]
+
+    def setUp(self):
+        super(TestHedging, self).setUp()
+        self.executor = self.executor_cls(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_hedge_wins(self):
+        hedger = hedging.Hedger(self.executor, hedge_after=0.01)
+        fn = SlowFirst(0.2, use_eventlet_sleep=self.use_eventlet_sleep)
+        fut = hedger.submit(fn, 'a')
+        self.assertIsInstance(fut, self.future_cls)
+        self.assertEqual((2, 'a'), fut.result(timeout=5))
+        stats = hedger.statistics
+        self.assertEqual((1, 1, 1), stats[0:3])
+
+    def test_not_hedged(self):
+        hedger = hedging.Hedger(self.executor, hedge_after=5)
+        self.assertEqual(1, hedger.submit(returns, 1).result(timeout=5))
+        self.assertEqual((1, 0, 0), hedger.statistics[0:3])
+
+    def test_hedged_submit(self):
+        fn = SlowFirst(0.2, use_eventlet_sleep=self.use_eventlet_sleep)
+        fut = hedging.hedged_submit(self.executor, fn, 'b', hedge_after=0.01)
+        self.assertEqual((2, 'b'), fut.result(timeout=5))
+
+    def test_hedged_submit_adapts(self):
+        for i in range(0, 20):
+            fut = hedging.hedged_submit(self.executor, returns, i)
+            self.assertEqual(i, fut.result(timeout=5))
+        self.executor.shutdown()
+        hedger = hedging._shared_hedger(self.executor, returns)
+        self.assertEqual(20, hedger.statistics.submitted)
+        self.assertLess(hedger.hedge_after, 0.1)
+        # Other callables get their own.
+        self.assertIsNot(hedger,
+                         hedging._shared_hedger(self.executor, blows_up))
+
+    def test_failure_waits_for_hedge(self):
+        hedger = hedging.Hedger(self.executor, hedge_after=0.01)
+        fn = FailsFirst(use_eventlet_sleep=self.use_eventlet_sleep)
+        self.assertEqual(2, hedger.submit(fn).result(timeout=5))
+        self.assertEqual((1, 1, 1), hedger.statistics[0:3])
+
+    def test_failure(self):
+        hedger = hedging.Hedger(self.executor, hedge_after=5)
+        fut = hedger.submit(blows_up)
+        self.assertRaises(RuntimeError, fut.result, timeout=5)
+
+    def test_adaptive_delay(self):
+        hedger = hedging.Hedger(self.executor, percentile=50, window=10,
+                                initial_hedge_after=5, min_samples=5)
+        self.assertEqual(5, hedger.hedge_after)
+        for i in range(0, 5):
+            hedger.submit(returns, i).result(timeout=5)
+        # Latencies are observed by callbacks (that may run just after the
+        # results are available).
+        self.executor.shutdown()
+        self.assertLess(hedger.hedge_after, 5)
+        self.assertEqual((5, 0, 0), hedger.statistics[0:3])
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, hedging.Hedger, self.executor,
+                          hedge_after=-1)
+        self.assertRaises(ValueError, hedging.Hedger, self.executor,
+                          percentile=0)
+        self.assertRaises(ValueError, hedging.Hedger, self.executor,
+                          window=0)
@@ -23,6 +23,7 @@ import mock
 import testscenarios
 
 import futurist
+from futurist import _asyncio
 from futurist import periodics
 from futurist.tests import base
 
@@ -86,6 +87,14 @@ class TestPeriodics(testscenarios.TestWithScenarios, base.TestCase):
                    'worker_kwargs': {'cond_cls': green_threading.Condition,
                                      'event_cls': green_threading.Event}}),
     ]
+    if _asyncio.ASYNCIO_AVAILABLE:
+        scenarios.append(
+            ('asyncio', {'executor_cls': futurist.AsyncioExecutor,
+                         'executor_kwargs': {'max_loops': 2},
+                         'create_destroy': create_destroy_thread,
+                         'sleep': time.sleep,
+                         'event_cls': threading.Event,
+                         'worker_kwargs': {}}))
 
     def _test_strategy(self, schedule_strategy, nows,
                        last_now, expected_next):
@@ -587,3 +596,32 @@ class TestRetrySubmission(base.TestCase):
 
         am_called = sum(called)
         self.assertGreaterEqual(am_called, 4)
+
+
+class TestWatchdog(base.TestCase):
+    def test_stuck_callback_reported(self):
+        ev = threading.Event()
+        self.addCleanup(ev.set)
+        reports = []
+        reported = threading.Event()
+
+        def on_stuck(stuck):
+            reports.append(stuck)
+            reported.set()
+
+        @periodics.periodic(0.01, run_immediately=True)
+        def hangs():
+            ev.wait()
+
+        watchdog = futurist.Watchdog(0.05, on_stuck=on_stuck)
+        self.addCleanup(watchdog.stop)
+        w = periodics.PeriodicWorker([(hangs, None, None)],
+                                     watchdog=watchdog)
+        with create_destroy_thread(w.start):
+            self.assertTrue(reported.wait(5))
+            ev.set()
+            w.stop()
+        self.assertEqual(1, len(reports))
+        self.assertEqual(futurist._utils.get_callback_name(hangs),
+                         reports[0].name)
+        self.assertIn('ev.wait()', reports[0].stack)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import testscenarios
+
+import futurist
+from futurist import retrying
+from futurist.tests import base
+
+
+class Flaky(object):
+    """Callable that fails (a given number of times) before working."""
+
+    def __init__(self, failures, exc_cls=IOError):
+        self.failures = failures
+        self.exc_cls = exc_cls
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc_cls("Broken (call %s)" % self.calls)
+        return value
+
+
+class TestRetryPolicy(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('sync', {'executor_cls': futurist.SynchronousExecutor,
+                  'future_cls': futurist.Future}),
+        ('green', {'executor_cls': futurist.GreenThreadPoolExecutor,
+                   'future_cls': futurist.GreenFuture}),
+        ('thread', {'executor_cls': futurist.ThreadPoolExecutor,
+                    'future_cls': futurist.Future}),
+    ]
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.executor = self.executor_cls()
+        self.addCleanup(self.executor.shutdown)
+
+    def test_retries_until_success(self):
+        policy = retrying.RetryPolicy(max_attempts=3, backoff=0.001)
+        fn = Flaky(2)
+        fut = policy.submit(self.executor, fn, 'ok')
+        self.assertIsInstance(fut, self.future_cls)
+        self.assertEqual('ok', fut.result(timeout=5))
+        self.assertEqual(3, fn.calls)
+        # Ensure the callbacks (that count) have finished running.
+        self.executor.shutdown()
+        self.assertEqual(retrying.RetryStatistics(
+            attempts=3, retries=2, succeeded=1, failed=0, cancelled=0,
+            succeeded_retries=2, failed_retries=0), policy.statistics)
+
+    def test_gives_up(self):
+        policy = retrying.RetryPolicy(max_attempts=2, backoff=0.001)
+        fn = Flaky(5)
+        fut = policy.submit(self.executor, fn, 'ok')
+        self.assertRaises(IOError, fut.result, timeout=5)
+        self.assertEqual(2, fn.calls)
+        self.executor.shutdown()
+        stats = policy.statistics
+        self.assertEqual((1, 1), (stats.failed, stats.failed_retries))
+        self.assertEqual(2, self.executor.statistics.failures)
+
+    def test_not_retried(self):
+        policy = retrying.RetryPolicy(backoff=0.001, retry_on=IOError)
+        fn = Flaky(1, exc_cls=ValueError)
+        fut = policy.submit(self.executor, fn, 'ok')
+        self.assertRaises(ValueError, fut.result, timeout=5)
+        self.assertEqual(1, fn.calls)
+        self.assertEqual(0, policy.statistics.retries)
+
+    def test_cancel_while_waiting(self):
+        policy = retrying.RetryPolicy(backoff=60)
+        fn = Flaky(1)
+        fut = policy.submit(self.executor, fn, 'ok')
+        self.assertTrue(fut.cancel())
+        self.assertTrue(fut.cancelled())
+        self.assertEqual(1, policy.statistics.cancelled)
+
+    def test_delay(self):
+        policy = retrying.RetryPolicy(backoff=1, max_backoff=3)
+        self.assertEqual([1, 2, 3, 3],
+                         [policy.delay(retry) for retry in range(1, 5)])
+        policy = retrying.RetryPolicy(backoff=1, jitter=0.5)
+        for _i in range(0, 10):
+            self.assertTrue(0.5 <= policy.delay(1) <= 1)
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, retrying.RetryPolicy, max_attempts=0)
+        self.assertRaises(ValueError, retrying.RetryPolicy, backoff=-1)
+        self.assertRaises(ValueError, retrying.RetryPolicy, jitter=2)
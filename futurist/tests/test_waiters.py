@@ -12,12 +12,27 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import gc
+import subprocess
+import sys
+import textwrap
+import threading
 import time
+import weakref
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from concurrent import futures
 import eventlet
+import mock
 import testscenarios
+import testtools
 
 import futurist
+from futurist import _asyncio
 from futurist.tests import base
 from futurist import waiters
 
@@ -80,10 +95,281 @@ class TestWaiters(testscenarios.TestWithScenarios, base.TestCase):
         self.assertEqual(len(fs), sum(f.result() for f in done_fs))
         self.assertEqual(0, len(not_done_fs))
 
-    def test_no_mixed_wait_for_any(self):
+    def test_wait_for_n(self):
+        fs = []
+        for _i in range(0, 10):
+            fs.append(self.executor.submit(
+                mini_delay, use_eventlet_sleep=self.use_eventlet_sleep))
+        done_fs, not_done_fs = waiters.wait_for_n(fs, 3)
+        self.assertGreaterEqual(len(done_fs), 3)
+        self.assertEqual(len(fs), len(done_fs) + len(not_done_fs))
+
+    def test_as_completed(self):
+        fs = []
+        for _i in range(0, 10):
+            fs.append(self.executor.submit(
+                mini_delay, use_eventlet_sleep=self.use_eventlet_sleep))
+        completed = list(waiters.as_completed(fs))
+        self.assertEqual(set(fs), set(completed))
+        self.assertEqual(len(fs), len(completed))
+        self.assertEqual(len(fs), sum(f.result() for f in completed))
+
+
+class TestLatchWaiters(testscenarios.TestWithScenarios, base.TestCase):
+    scenarios = [
+        ('green', {'future_cls': futurist.GreenFuture}),
+        ('native', {'future_cls': futurist.Future}),
+    ]
+
+    def test_timeout_removes_waiter(self):
+        fs = [self.future_cls() for _i in range(0, 3)]
+        fs[0].set_result(1)
+        done, not_done = waiters.wait_for_all(fs, timeout=0.01)
+        self.assertEqual(set(fs[0:1]), done)
+        self.assertEqual(set(fs[1:]), not_done)
+        for f in fs[1:]:
+            self.assertEqual([], f._waiters)
+
+    def test_already_done(self):
+        fs = [self.future_cls() for _i in range(0, 3)]
+        for f in fs:
+            f.set_result(1)
+        self.assertEqual(set(fs), waiters.wait_for_all(fs).done)
+        self.assertEqual(set(fs), waiters.wait_for_any(fs).done)
+
+    def test_many(self):
+        fs = [self.future_cls() for _i in range(0, 10000)]
+
+        def finish():
+            for f in fs:
+                f.set_result(1)
+
+        if self.future_cls is futurist.GreenFuture:
+            finisher = eventlet.spawn(finish)
+        else:
+            finisher = threading.Thread(target=finish)
+            finisher.start()
+        try:
+            done, not_done = waiters.wait_for_all(fs)
+            self.assertEqual(len(fs), len(done))
+            self.assertEqual(0, len(not_done))
+        finally:
+            if self.future_cls is futurist.GreenFuture:
+                finisher.wait()
+            else:
+                finisher.join()
+
+    def test_wait_for_n_bad_n(self):
+        fs = [self.future_cls() for _i in range(0, 2)]
+        self.assertRaises(ValueError, waiters.wait_for_n, fs, 3)
+        self.assertRaises(ValueError, waiters.wait_for_n, fs, -1)
+
+    def test_wait_for_n_timeout(self):
+        fs = [self.future_cls() for _i in range(0, 3)]
+        fs[0].set_result(1)
+        done, not_done = waiters.wait_for_n(fs, 2, timeout=0.01)
+        self.assertEqual(set(fs[0:1]), done)
+        self.assertEqual(set(fs[1:]), not_done)
+
+    def test_as_completed_order(self):
+        fs = [self.future_cls() for _i in range(0, 3)]
+        fs[2].set_result(2)
+        completed = waiters.as_completed(fs)
+        self.assertIs(fs[2], next(completed))
+        fs[0].set_result(0)
+        self.assertIs(fs[0], next(completed))
+        fs[1].cancel()
+        fs[1].set_running_or_notify_cancel()
+        self.assertIs(fs[1], next(completed))
+        self.assertRaises(StopIteration, next, completed)
+
+    def test_as_completed_timeout(self):
+        fs = [self.future_cls() for _i in range(0, 2)]
+        fs[0].set_result(1)
+        completed = waiters.as_completed(fs, timeout=0.01)
+        self.assertIs(fs[0], next(completed))
+        self.assertRaises(futures.TimeoutError, next, completed)
+        self.assertEqual([], fs[1]._waiters)
+
+    def test_any_with_cancelled(self):
+        fs = [self.future_cls() for _i in range(0, 2)]
+        fs[1].cancel()
+        fs[1].set_running_or_notify_cancel()
+        done, not_done = waiters.wait_for_any(fs)
+        self.assertEqual(set(fs[1:]), done)
+        self.assertEqual(set(fs[0:1]), not_done)
+
+
+def finish_mixed(green_fut, native_fut, delay):
+    # The green future is finished by a green thread and the native one by
+    # a native thread (neither of which can run if the waiter blocks the
+    # green thread hub).
+    def finish_green():
+        eventlet.sleep(delay)
+        green_fut.set_result('green')
+
+    def finish_native():
+        time.sleep(delay)
+        native_fut.set_result('native')
+
+    eventlet.spawn(finish_green)
+    native = threading.Thread(target=finish_native)
+    native.start()
+    return native
+
+
+class TestMixedWaiters(base.TestCase):
+    def test_wait_for_all(self):
+        fs = [futurist.GreenFuture(), futurist.Future()]
+        native = finish_mixed(fs[0], fs[1], 0.05)
+        done, not_done = waiters.wait_for_all(fs, timeout=5)
+        native.join()
+        self.assertEqual(set(fs), done)
+        self.assertEqual(set(), not_done)
+
+    def test_wait_for_any(self):
+        fs = [futurist.GreenFuture(), futurist.Future()]
+        native = finish_mixed(fs[0], fs[1], 0.05)
+        done, not_done = waiters.wait_for_any(fs, timeout=5)
+        self.assertGreaterEqual(len(done), 1)
+        native.join()
+
+    def test_wait_for_any_native_first(self):
         fs = [futurist.GreenFuture(), futurist.Future()]
-        self.assertRaises(RuntimeError, waiters.wait_for_any, fs)
+        native = threading.Thread(target=fs[1].set_result, args=(1,))
+        native.start()
+        done, not_done = waiters.wait_for_any(fs, timeout=5)
+        native.join()
+        self.assertEqual(set(fs[1:]), done)
+        self.assertEqual(set(fs[0:1]), not_done)
 
-    def test_no_mixed_wait_for_all(self):
+    def test_as_completed(self):
         fs = [futurist.GreenFuture(), futurist.Future()]
-        self.assertRaises(RuntimeError, waiters.wait_for_all, fs)
+        native = finish_mixed(fs[0], fs[1], 0.05)
+        completed = list(waiters.as_completed(fs, timeout=5))
+        native.join()
+        self.assertEqual(set(fs), set(completed))
+
+    def test_timeout(self):
+        fs = [futurist.GreenFuture(), futurist.Future()]
+        done, not_done = waiters.wait_for_all(fs, timeout=0.01)
+        self.assertEqual(set(), done)
+        self.assertEqual(set(fs), not_done)
+        for f in fs:
+            self.assertEqual([], f._waiters)
+
+    def test_monkey_patched(self):
+        script = textwrap.dedent("""
+            import eventlet
+            eventlet.monkey_patch()
+
+            import futurist
+            from futurist import waiters
+
+            green = futurist.GreenThreadPoolExecutor()
+            native = futurist.ThreadPoolExecutor()
+            fs = [green.submit(eventlet.sleep, 0.05),
+                  native.submit(eventlet.sleep, 0.05)]
+            done, not_done = waiters.wait_for_all(fs, timeout=5)
+            print(len(done), len(not_done))
+            green.shutdown()
+            native.shutdown()
+        """)
+        output = subprocess.check_output([sys.executable, '-W', 'ignore',
+                                          '-c', script])
+        self.assertEqual(b'2 0', output.strip())
+
+
+@testtools.skipIf(asyncio is None, "asyncio is not available")
+class TestAsyncWaiters(base.TestCase):
+    def setUp(self):
+        super(TestAsyncWaiters, self).setUp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self.addCleanup(self.loop.close)
+        self.executor = futurist.ThreadPoolExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    def test_wait_for_all(self):
+        fs = [self.executor.submit(mini_delay) for _i in range(0, 10)]
+        done, not_done = self.loop.run_until_complete(
+            waiters.async_wait_for_all(fs))
+        self.assertEqual(set(fs), done)
+        self.assertEqual(set(), not_done)
+
+    def test_wait_for_any(self):
+        fs = [self.executor.submit(mini_delay), futurist.Future()]
+        done, not_done = self.loop.run_until_complete(
+            waiters.async_wait_for_any(fs))
+        self.assertEqual(set(fs[0:1]), done)
+        self.assertEqual(set(fs[1:]), not_done)
+
+    def test_wait_mixed(self):
+        green_fut = futurist.GreenFuture()
+        green_fut.set_result(1)
+        fs = [green_fut, self.executor.submit(mini_delay)]
+        done, not_done = self.loop.run_until_complete(
+            waiters.async_wait_for_all(fs))
+        self.assertEqual(set(fs), done)
+
+    def test_wait_timeout(self):
+        fs = [futurist.Future()]
+        done, not_done = self.loop.run_until_complete(
+            waiters.async_wait_for_all(fs, timeout=0.01))
+        self.assertEqual(set(), done)
+        self.assertEqual(set(fs), not_done)
+        self.assertEqual([], fs[0]._waiters)
+
+    def test_wait_cancelled(self):
+        fs = [futurist.Future()]
+        waited = waiters.async_wait_for_all(fs)
+        waited.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual([], fs[0]._waiters)
+
+    def test_submit(self):
+        fut = waiters.async_submit(self.executor, mini_delay)
+        self.assertEqual(1, self.loop.run_until_complete(fut))
+
+    def test_submit_to_loop(self):
+        # Not the current event loop (it is given explicitly).
+        asyncio.set_event_loop(None)
+        fut = waiters.async_submit(self.executor, mini_delay, loop=self.loop)
+        self.assertEqual(1, self.loop.run_until_complete(fut))
+
+    def test_submit_blows_up(self):
+        fut = waiters.async_submit(self.executor, int, 'not-a-number')
+        self.assertRaises(ValueError, self.loop.run_until_complete, fut)
+
+    def test_wrap_cancel(self):
+        fut = futurist.Future()
+        wrapped = waiters.wrap_future(fut)
+        wrapped.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(fut.cancelled())
+
+    def test_batched_completions(self):
+        fs = []
+        for i in range(0, 100):
+            fut = futurist.Future()
+            fut.set_result(i)
+            fs.append(fut)
+        with mock.patch.object(self.loop, 'call_soon_threadsafe',
+                               wraps=self.loop.call_soon_threadsafe) as m:
+            wrapped = [waiters.wrap_future(f) for f in fs]
+            results = self.loop.run_until_complete(asyncio.gather(*wrapped))
+        self.assertEqual(list(range(0, 100)), results)
+        self.assertEqual(1, m.call_count)
+
+    def test_bridge_not_kept(self):
+        loop = asyncio.new_event_loop()
+        bridge = _asyncio.get_bridge(loop)
+        loop_ref = weakref.ref(loop)
+        loop.close()
+        del loop
+        gc.collect()
+        self.assertIsNone(loop_ref())
+        self.assertNotIn(bridge, list(_asyncio._bridges.values()))
+        # Posting to it once the loop is gone is harmless.
+        bridge.post(self.fail)
@@ -14,26 +14,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-try:
-    from contextlib import ExitStack
-except ImportError:
-    from contextlib2 import ExitStack
-
 import collections
-import contextlib
 
 from concurrent import futures
 from concurrent.futures import _base
 import six
 
 import futurist
+from futurist import _asyncio
+from futurist import _green
+from futurist import _thread
 from futurist import _utils
 
-try:
-    from eventlet.green import threading as greenthreading
-except ImportError:
-    greenthreading = None
-
 
 #: Named tuple returned from ``wait_for*`` calls.
 DoneAndNotDoneFutures = collections.namedtuple(
@@ -45,114 +37,226 @@ _DONE_STATES = frozenset([
 ])
 
 
-@contextlib.contextmanager
-def _acquire_and_release_futures(fs):
-    # Do this to ensure that we always get the futures in the same order (aka
-    # always acquire the conditions in the same order, no matter what; a way
-    # to avoid dead-lock).
-    fs = sorted(fs, key=id)
-    with ExitStack() as stack:
-        for fut in fs:
-            stack.enter_context(fut._condition)
-        yield
-
-
 def _ensure_eventlet(func):
     """Decorator that verifies we have the needed eventlet components."""
 
     @six.wraps(func)
     def wrapper(*args, **kwargs):
-        if not _utils.EVENTLET_AVAILABLE or greenthreading is None:
+        if not _utils.EVENTLET_AVAILABLE or _green.threading is None:
             raise RuntimeError('Eventlet is needed to wait on green futures')
         return func(*args, **kwargs)
 
     return wrapper
 
 
-def _wait_for(fs, no_green_return_when, on_all_green_cb,
-              caller_name, timeout=None):
-    green_fs = sum(1 for f in fs if isinstance(f, futurist.GreenFuture))
-    if not green_fs:
-        done, not_done = futures.wait(fs, timeout=timeout,
-                                      return_when=no_green_return_when)
-        return DoneAndNotDoneFutures(done, not_done)
-    else:
-        non_green_fs = len(fs) - green_fs
-        if non_green_fs:
-            raise RuntimeError("Can not wait on %s green futures and %s"
-                               " non-green futures in the same"
-                               " `%s` call" % (green_fs, non_green_fs,
-                                               caller_name))
-        else:
-            return on_all_green_cb(fs, timeout=timeout)
-
-
 def wait_for_all(fs, timeout=None):
     """Wait for all of the futures to complete.
 
-    Works correctly with both green and non-green futures (but not both
-    together, since this can't be guaranteed to avoid dead-lock due to how
-    the waiting implementations are different when green threads are being
-    used).
+    Works correctly with green and non-green futures (and sets that mix
+    both of them, which are waited on without blocking the green thread
+    hub, at the cost of checking for completion periodically when the
+    current process is not monkey patched).
 
     Returns pair (done futures, not done futures).
     """
-    return _wait_for(fs, futures.ALL_COMPLETED, _wait_for_all_green,
-                     'wait_for_all', timeout=timeout)
+    return _wait_for_needed(fs, len(fs), timeout=timeout)
 
 
 def wait_for_any(fs, timeout=None):
     """Wait for one (**any**) of the futures to complete.
 
-    Works correctly with both green and non-green futures (but not both
-    together, since this can't be guaranteed to avoid dead-lock due to how
-    the waiting implementations are different when green threads are being
-    used).
+    Works correctly with green and non-green futures (and sets that mix
+    both of them, which are waited on without blocking the green thread
+    hub, at the cost of checking for completion periodically when the
+    current process is not monkey patched).
+
+    Returns pair (done futures, not done futures).
+    """
+    return _wait_for_needed(fs, 1, timeout=timeout)
+
+
+def wait_for_n(fs, n, timeout=None):
+    """Wait for (at least) ``n`` of the futures to complete.
+
+    Useful for quorum style waits; works with the same kinds of futures
+    that :py:func:`.wait_for_all` does.
 
     Returns pair (done futures, not done futures).
     """
-    return _wait_for(fs, futures.FIRST_COMPLETED, _wait_for_any_green,
-                     'wait_for_any', timeout=timeout)
+    if n < 0 or n > len(fs):
+        raise ValueError("Can not wait for %s of %s futures"
+                         % (n, len(fs)))
+    return _wait_for_needed(fs, n, timeout=timeout)
+
+
+def as_completed(fs, timeout=None):
+    """Yields the futures as they complete (finished or cancelled).
+
+    Futures that are already done are yielded first; works with the same
+    kinds of futures that :py:func:`.wait_for_all` does (and only ever adds
+    a single waiter to each future, no matter how many futures are
+    consumed).
+
+    :raises: :py:class:`concurrent.futures.TimeoutError` if not all of
+             the futures have completed ``timeout`` seconds after this
+             was called
+    """
+    if timeout is not None:
+        deadline = _utils.now() + timeout
+    fs = set(fs)
+    threading, wait_func = _select_waiting(fs)
+    waiter = _CompletionQueue(threading)
+    done, waiting_on = _install_waiter(fs, waiter)
+    try:
+        for f in done:
+            yield f
+        remaining = len(waiting_on)
+        while remaining:
+            if timeout is None:
+                wait_func(waiter.event)
+            else:
+                leftover = deadline - _utils.now()
+                if leftover <= 0 or not wait_func(waiter.event,
+                                                  timeout=leftover):
+                    raise futures.TimeoutError(
+                        "%s (of %s) futures unfinished"
+                        % (remaining, len(fs)))
+            for f in waiter.take():
+                remaining -= 1
+                yield f
+    finally:
+        _uninstall_waiter(waiting_on, waiter)
+
+
+def async_wait_for_all(fs, timeout=None, loop=None):
+    """Wait (in an asyncio event loop) for all of the futures to complete.
+
+    Works with the same kinds of futures that :py:func:`.wait_for_all` does
+    and must be called from the thread running the loop (which defaults to
+    the current event loop); no thread is blocked while waiting.
+
+    Returns an asyncio future that resolves to a pair (done futures, not
+    done futures).
+    """
+    return _async_wait_for_needed(fs, len(fs), timeout=timeout, loop=loop)
+
+
+def async_wait_for_any(fs, timeout=None, loop=None):
+    """Wait (in an asyncio event loop) for one (**any**) of the futures.
+
+    Works with the same kinds of futures that :py:func:`.wait_for_all` does
+    and must be called from the thread running the loop (which defaults to
+    the current event loop); no thread is blocked while waiting.
+
+    Returns an asyncio future that resolves to a pair (done futures, not
+    done futures).
+    """
+    return _async_wait_for_needed(fs, 1, timeout=timeout, loop=loop)
+
+
+def wrap_future(fut, loop=None):
+    """Wraps a (green or non-green) future so that it can be awaited.
+
+    Completions of futures wrapped for the same loop (and of the asyncio
+    waiters) that happen before the loop gets to them are delivered in a
+    single batch (instead of waking up the loop for each one of them).
+    Cancelling the returned asyncio future cancels the wrapped future.
+
+    Must be called from the thread running the loop (which defaults to the
+    current event loop).
+    """
+    return _asyncio.wrap_future(fut, loop=loop)
 
 
-class _AllGreenWaiter(object):
-    """Provides the event that ``_wait_for_all_green`` blocks on."""
+def async_submit(executor, fn, *args, **kwargs):
+    """Submits to an executor and returns an awaitable asyncio future.
 
-    def __init__(self, pending):
-        self.event = greenthreading.Event()
-        self.lock = greenthreading.Lock()
-        self.pending = pending
+    Must be called from the thread running the loop (which defaults to the
+    current event loop).
 
-    def _decrement_pending(self):
+    :param loop: event loop the returned future belongs to (passed as a
+                 keyword argument, it is **not** passed to ``fn``)
+    """
+    loop = kwargs.pop('loop', None)
+    return wrap_future(executor.submit(fn, *args, **kwargs), loop=loop)
+
+
+_NATIVE_THREADING = _thread.Threading()
+
+# Bounds on how long to sleep between checks when waiting on a mix of green
+# and non-green futures (without monkey patching); the longest one is the
+# worst case latency of noticing that the wait is over.
+_MIN_POLL_DELAY = 0.001
+_MAX_POLL_DELAY = 0.05
+
+
+class _CountingLatch(object):
+    """Counts completions until enough have happened to release a waiter.
+
+    It gets added to (the ``_waiters`` of) each future that is not yet done
+    and is told when each of those futures finishes; its target is only
+    known (and set via ``arm``) once it has been added to all of them.
+    """
+
+    def __init__(self, threading, event=None):
+        if event is None:
+            event = threading.event_object()
+        self.event = event
+        self.lock = threading.lock_object()
+        self.completed = 0
+        self.target = None
+
+    def arm(self, target):
+        with self.lock:
+            self.target = target
+            if self.completed >= target:
+                self.event.set()
+
+    def _count(self, future):
         with self.lock:
-            self.pending -= 1
-            if self.pending <= 0:
+            self.completed += 1
+            if self.target is not None and self.completed >= self.target:
                 self.event.set()
 
-    def add_result(self, future):
-        self._decrement_pending()
+    add_result = _count
+    add_exception = _count
+    add_cancelled = _count
+
 
-    def add_exception(self, future):
-        self._decrement_pending()
+class _CompletionQueue(object):
+    """Queues up futures as they complete (for ``as_completed``)."""
 
-    def add_cancelled(self, future):
-        self._decrement_pending()
+    def __init__(self, threading):
+        self.event = threading.event_object()
+        self.lock = threading.lock_object()
+        self.completed = collections.deque()
 
+    def take(self):
+        with self.lock:
+            completed = self.completed
+            self.completed = collections.deque()
+            self.event.clear()
+        return completed
 
-class _AnyGreenWaiter(object):
-    """Provides the event that ``_wait_for_any_green`` blocks on."""
+    def _add(self, future):
+        with self.lock:
+            self.completed.append(future)
+            self.event.set()
 
-    def __init__(self):
-        self.event = greenthreading.Event()
+    add_result = _add
+    add_exception = _add
+    add_cancelled = _add
 
-    def add_result(self, future):
-        self.event.set()
 
-    def add_exception(self, future):
-        self.event.set()
+class _LoopEvent(object):
+    """Event that (when set) runs a callback in an event loop."""
 
-    def add_cancelled(self, future):
-        self.event.set()
+    def __init__(self, bridge, callback):
+        self._bridge = bridge
+        self._callback = callback
+
+    def set(self):
+        self._bridge.post(self._callback)
 
 
 def _partition_futures(fs):
@@ -166,49 +270,123 @@ def _partition_futures(fs):
     return done, not_done
 
 
-def _create_and_install_waiters(fs, waiter_cls, *args, **kwargs):
-    waiter = waiter_cls(*args, **kwargs)
+def _install_waiter(fs, waiter):
+    # Each future is checked (and has the waiter added) while holding only
+    # its own condition; that is enough to never miss its completion and
+    # avoids holding the conditions of all of the futures at once.
+    done = []
+    waiting_on = []
     for f in fs:
-        f._waiters.append(waiter)
-    return waiter
+        with f._condition:
+            if f._state in _DONE_STATES:
+                done.append(f)
+            else:
+                f._waiters.append(waiter)
+                waiting_on.append(f)
+    return done, waiting_on
+
+
+def _uninstall_waiter(waiting_on, waiter):
+    # Futures that have finished will never notify their waiters again, so
+    # the waiter is only (and lazily) taken out of the ones still pending.
+    for f in waiting_on:
+        if f._state not in _DONE_STATES:
+            with f._condition:
+                try:
+                    f._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+
+def _event_wait(event, timeout=None):
+    return event.wait(timeout)
+
+
+def _poll_wait(event, timeout=None):
+    # Native threads can not safely wake up a green thread (and a green
+    # thread that blocks on a native event stops its whole hub, and any
+    # green threads that would finish the green futures along with it), so
+    # instead the native event gets checked while green sleeping.
+    if timeout is not None:
+        deadline = _utils.now() + timeout
+    else:
+        deadline = None
+    delay = _MIN_POLL_DELAY
+    while not event.is_set():
+        if deadline is None:
+            _green.sleep(delay)
+        else:
+            leftover = deadline - _utils.now()
+            if leftover <= 0:
+                break
+            _green.sleep(min(delay, leftover))
+        delay = min(delay * 2, _MAX_POLL_DELAY)
+    return event.is_set()
 
 
-@_ensure_eventlet
-def _wait_for_all_green(fs, timeout=None):
-    if not fs:
-        return DoneAndNotDoneFutures(set(), set())
+def _select_waiting(fs):
+    """Picks the primitives (and how to wait on them) to wait on futures."""
+    green_fs = sum(1 for f in fs if isinstance(f, futurist.GreenFuture))
+    if not green_fs:
+        return _NATIVE_THREADING, _event_wait
+    return _select_green_waiting(green_fs != len(fs))
 
-    with _acquire_and_release_futures(fs):
-        done, not_done = _partition_futures(fs)
-        if len(done) == len(fs):
-            return DoneAndNotDoneFutures(done, not_done)
-        waiter = _create_and_install_waiters(not_done,
-                                             _AllGreenWaiter,
-                                             len(not_done))
-    waiter.event.wait(timeout)
-    for f in not_done:
-        f._waiters.remove(waiter)
 
-    with _acquire_and_release_futures(fs):
-        done, not_done = _partition_futures(fs)
-        return DoneAndNotDoneFutures(done, not_done)
+@_ensure_eventlet
+def _select_green_waiting(mixed):
+    if not mixed or _green.is_monkey_patched('thread'):
+        # Everything is green already (when monkey patched the conditions
+        # of the non-green futures included), so no bridging is needed.
+        return _green.threading, _event_wait
+    return _NATIVE_THREADING, _poll_wait
 
 
-@_ensure_eventlet
-def _wait_for_any_green(fs, timeout=None):
+def _wait_for_needed(fs, needed, timeout=None):
     if not fs:
         return DoneAndNotDoneFutures(set(), set())
+    threading, wait_func = _select_waiting(fs)
+    latch = _CountingLatch(threading)
+    done, waiting_on = _install_waiter(fs, latch)
+    try:
+        if len(done) < needed:
+            latch.arm(needed - len(done))
+            wait_func(latch.event, timeout=timeout)
+    finally:
+        _uninstall_waiter(waiting_on, latch)
+    done, not_done = _partition_futures(fs)
+    return DoneAndNotDoneFutures(done, not_done)
+
+
+def _async_wait_for_needed(fs, needed, timeout=None, loop=None):
+    loop = _asyncio.get_loop(loop)
+    waited = loop.create_future()
+    if not fs:
+        waited.set_result(DoneAndNotDoneFutures(set(), set()))
+        return waited
+
+    def finish():
+        if not waited.done():
+            done, not_done = _partition_futures(fs)
+            waited.set_result(DoneAndNotDoneFutures(done, not_done))
+
+    latch = _CountingLatch(_NATIVE_THREADING,
+                           event=_LoopEvent(_asyncio.get_bridge(loop),
+                                            finish))
+    done, waiting_on = _install_waiter(fs, latch)
+    if len(done) >= needed:
+        finish()
+        timer = None
+    else:
+        latch.arm(needed - len(done))
+        if timeout is not None:
+            timer = loop.call_later(timeout, finish)
+        else:
+            timer = None
 
-    with _acquire_and_release_futures(fs):
-        done, not_done = _partition_futures(fs)
-        if done:
-            return DoneAndNotDoneFutures(done, not_done)
-        waiter = _create_and_install_waiters(fs, _AnyGreenWaiter)
-
-    waiter.event.wait(timeout)
-    for f in fs:
-        f._waiters.remove(waiter)
+    def on_waited(waited):
+        if timer is not None:
+            timer.cancel()
+        _uninstall_waiter(waiting_on, latch)
 
-    with _acquire_and_release_futures(fs):
-        done, not_done = _partition_futures(fs)
-        return DoneAndNotDoneFutures(done, not_done)
+    waited.add_done_callback(on_waited)
+    return waited
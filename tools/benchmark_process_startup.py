@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measures process pool time-to-first-result and worker respawn latency.
+
+For example (to see the effect of preloading a heavy module)::
+
+    $ python tools/benchmark_process_startup.py --preload xml.dom.minidom
+"""
+
+import argparse
+import multiprocessing
+import os
+
+import prettytable
+
+import futurist
+from futurist import _utils
+from futurist import waiters
+
+
+def _noop():
+    return os.getpid()
+
+
+def _die():
+    os._exit(1)
+
+
+def _time_to_first_result(mp_context, preload, prestart, workers):
+    started_at = _utils.now()
+    executor = futurist.ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=mp_context,
+                                            preload_modules=preload,
+                                            prestart=prestart)
+    try:
+        executor.submit(_noop).result()
+        return _utils.now() - started_at
+    finally:
+        executor.shutdown()
+
+
+def _respawn_latency(mp_context, preload, workers, rounds):
+    executor = futurist.ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=mp_context,
+                                            preload_modules=preload,
+                                            prestart=True)
+    elapsed = []
+    try:
+        waiters.wait_for_all([executor.submit(_noop)
+                              for _i in range(0, workers)])
+        for _i in range(0, rounds):
+            # Kill every worker, then time how long until all of the
+            # replacements have produced a result.
+            waiters.wait_for_all([executor.submit(_die)
+                                  for _i in range(0, workers)])
+            started_at = _utils.now()
+            waiters.wait_for_all([executor.submit(_noop)
+                                  for _i in range(0, workers)])
+            elapsed.append(_utils.now() - started_at)
+    finally:
+        executor.shutdown()
+    return sum(elapsed) / len(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int,
+                        default=_utils.get_optimal_process_count())
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--preload', action='append', default=[],
+                        help='module to preload (may be repeated)')
+    parser.add_argument('--method', action='append', default=[],
+                        help='start method to test (may be repeated)')
+    args = parser.parse_args()
+    methods = args.method or multiprocessing.get_all_start_methods()
+    table = prettytable.PrettyTable(['Method', 'Prestart',
+                                     'Time to first result (s)',
+                                     'Respawn latency (s)'])
+    for method in methods:
+        for prestart in (False, True):
+            first = _time_to_first_result(method, args.preload,
+                                          prestart, args.workers)
+            if prestart:
+                respawn = "%0.4f" % _respawn_latency(method, args.preload,
+                                                     args.workers,
+                                                     args.rounds)
+            else:
+                respawn = '-'
+            table.add_row([method, prestart, "%0.4f" % first, respawn])
+    print(table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measures how long scheduling (and cancelling) delayed work takes.
+
+For example (to stop at 100k pending submissions)::
+
+    $ python tools/benchmark_timers.py --max-count 100000
+"""
+
+import argparse
+
+import prettytable
+
+import futurist
+from futurist import _utils
+
+
+def _noop():
+    pass
+
+
+def _time_schedule(count):
+    executor = futurist.ScheduledExecutor(futurist.SynchronousExecutor())
+    started_at = _utils.now()
+    fs = [executor.submit_delayed(3600, _noop) for _i in range(0, count)]
+    scheduled = _utils.now() - started_at
+    started_at = _utils.now()
+    for fut in fs:
+        fut.cancel()
+    cancelled = _utils.now() - started_at
+    executor.shutdown()
+    return scheduled, cancelled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-count', type=int, default=1000000)
+    args = parser.parse_args()
+    table = prettytable.PrettyTable(['Submissions', 'Schedule (s)',
+                                     'Cancel (s)', 'Cancel each (us)'])
+    count = 10
+    while count <= args.max_count:
+        scheduled, cancelled = _time_schedule(count)
+        table.add_row([count, "%0.4f" % scheduled, "%0.4f" % cancelled,
+                       "%0.2f" % (cancelled / count * 1000000)])
+        count *= 10
+    print(table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measures how long waiting on (increasingly) large sets of futures takes.
+
+For example (to stop at 100k futures)::
+
+    $ python tools/benchmark_waiters.py --max-count 100000
+"""
+
+import argparse
+import threading
+
+import eventlet
+import prettytable
+
+import futurist
+from futurist import _utils
+from futurist import waiters
+
+
+def _finish_in_thread(fs):
+    finisher = threading.Thread(target=lambda: [f.set_result(None)
+                                                for f in fs])
+    finisher.start()
+    return finisher.join
+
+
+def _finish_in_green_thread(fs):
+    finisher = eventlet.spawn(lambda: [f.set_result(None) for f in fs])
+    return finisher.wait
+
+
+def _time_wait(future_cls, finisher, wait_func, count):
+    fs = [future_cls() for _i in range(0, count)]
+    join = finisher(fs)
+    started_at = _utils.now()
+    wait_func(fs)
+    elapsed = _utils.now() - started_at
+    join()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-count', type=int, default=1000000)
+    args = parser.parse_args()
+    kinds = [
+        ('green', futurist.GreenFuture, _finish_in_green_thread),
+        ('native', futurist.Future, _finish_in_thread),
+    ]
+    table = prettytable.PrettyTable(['Futures', 'Kind',
+                                     'wait_for_all (s)', 'wait_for_any (s)'])
+    count = 10
+    while count <= args.max_count:
+        for kind, future_cls, finisher in kinds:
+            wait_all = _time_wait(future_cls, finisher,
+                                  waiters.wait_for_all, count)
+            wait_any = _time_wait(future_cls, finisher,
+                                  waiters.wait_for_any, count)
+            table.add_row([count, kind, "%0.4f" % wait_all,
+                           "%0.4f" % wait_any])
+        count *= 10
+    print(table)
+
+
+if __name__ == '__main__':
+    main()